@@ -44,6 +44,7 @@ _services: dict[str, tuple] = {
   "longitudinalPlan": (True, 20., 10),
   "driverAssistance": (True, 20., 20),
   "procLog": (True, 0.5, 15),
+  "procLogDelta": (True, 5.),
   "gpsLocationExternal": (True, 10., 10),
   "gpsLocation": (True, 1., 1),
   "ubloxGnss": (True, 10.),
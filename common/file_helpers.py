@@ -2,9 +2,12 @@ import io
 import os
 import tempfile
 import contextlib
+from typing import cast
 import zstandard as zstd
 
 LOG_COMPRESSION_LEVEL = 10 # little benefit up to level 15. level ~17 is a small step change
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_SPOOL_SIZE = 8 * 1024 * 1024 # compressed uploads larger than this are spooled to disk
 
 
 class CallbackReader:
@@ -47,12 +50,18 @@ def get_upload_stream(filepath: str, should_compress: bool) -> tuple[io.Buffered
     file_stream = open(filepath, "rb")
     return file_stream, file_size
 
-  # Compress the file on the fly
-  compressed_stream = io.BytesIO()
+  # Compress the file on the fly, chunk by chunk. The upload endpoints need a Content-Length,
+  # so the output is spooled to a temp file once it gets large to keep memory use flat
+  compressed_stream = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
   compressor = zstd.ZstdCompressor(level=LOG_COMPRESSION_LEVEL)
 
-  with open(filepath, "rb") as f:
-    compressor.copy_stream(f, compressed_stream)
-    compressed_size = compressed_stream.tell()
-    compressed_stream.seek(0)
-    return compressed_stream, compressed_size
+  try:
+    with open(filepath, "rb") as f:
+      compressor.copy_stream(f, compressed_stream, read_size=UPLOAD_CHUNK_SIZE, write_size=UPLOAD_CHUNK_SIZE)
+  except Exception:
+    compressed_stream.close()
+    raise
+
+  compressed_size = compressed_stream.tell()
+  compressed_stream.seek(0)
+  return cast(io.BufferedIOBase, compressed_stream), compressed_size
@@ -7,6 +7,7 @@ import time
 import uuid
 import socket
 import logging
+import itertools
 import traceback
 import numpy as np
 from threading import local
@@ -36,22 +37,28 @@ class SwagFormatter(logging.Formatter):
     self.swaglogger = swaglogger
     self.host = socket.gethostname()
 
+  @staticmethod
+  def format_msg(record):
+    if isinstance(record.msg, dict):
+      return record.msg
+    try:
+      return record.getMessage()
+    except (ValueError, TypeError):
+      return [record.msg]+record.args
+
   def format_dict(self, record):
     record_dict = NiceOrderedDict()
 
-    if isinstance(record.msg, dict):
-      record_dict['msg'] = record.msg
-    else:
-      try:
-        record_dict['msg'] = record.getMessage()
-      except (ValueError, TypeError):
-        record_dict['msg'] = [record.msg]+record.args
-
+    record_dict['msg'] = self.format_msg(record)
     record_dict['ctx'] = self.swaglogger.get_ctx()
 
     if record.exc_info:
       record_dict['exc_info'] = self.formatException(record.exc_info)
 
+    self.add_fields(record_dict, record)
+    return record_dict
+
+  def add_fields(self, record_dict, record):
     record_dict['level'] = record.levelname
     record_dict['levelnum'] = record.levelno
     record_dict['name'] = record.name
@@ -66,12 +73,19 @@ class SwagFormatter(logging.Formatter):
     record_dict['threadName'] = record.threadName
     record_dict['created'] = record.created
 
-    return record_dict
-
   def format(self, record):
     if self.swaglogger is None:
       raise Exception("must set swaglogger before calling format()")
-    return json_robust_dumps(self.format_dict(record))
+
+    # fast path: same document as format_dict, but the bound context is
+    # serialized once per change instead of once per record
+    tail = {}
+    if record.exc_info:
+      tail['exc_info'] = self.formatException(record.exc_info)
+    self.add_fields(tail, record)
+    return ''.join(('{"msg": ', json_robust_dumps(self.format_msg(record)),
+                    ', "ctx": ', self.swaglogger.get_ctx_json(),
+                    ', ', json_robust_dumps(tail)[1:]))
 
 class SwagLogFileFormatter(SwagFormatter):
   def fix_kv(self, k, v):
@@ -121,40 +135,60 @@ def _tmpfunc():
 def _srcfile():
   return os.path.normcase(_tmpfunc.__code__.co_filename)
 
+# every change to a bound context gets a new generation, used to key the serialized context cache
+_ctx_generation = itertools.count(1)
+
 class SwagLogger(logging.Logger):
   def __init__(self):
     logging.Logger.__init__(self, "swaglog")
 
     self.global_ctx = {}
+    self.global_gen = next(_ctx_generation)
 
     self.log_local = local()
     self.log_local.ctx = {}
+    self.log_local.gen = next(_ctx_generation)
 
   def local_ctx(self):
     try:
       return self.log_local.ctx
     except AttributeError:
       self.log_local.ctx = {}
+      self.log_local.gen = next(_ctx_generation)
       return self.log_local.ctx
 
   def get_ctx(self):
     return dict(self.local_ctx(), **self.global_ctx)
 
+  def get_ctx_json(self):
+    ctx = self.local_ctx()
+    key = (self.log_local.gen, self.global_gen)
+    cached = getattr(self.log_local, 'ctx_json', None)
+    if cached is None or cached[0] != key:
+      cached = (key, json_robust_dumps(dict(ctx, **self.global_ctx)))
+      self.log_local.ctx_json = cached
+    return cached[1]
+
   @contextmanager
   def ctx(self, **kwargs):
     old_ctx = self.local_ctx()
+    old_gen = self.log_local.gen
     self.log_local.ctx = copy.copy(old_ctx) or {}
     self.log_local.ctx.update(kwargs)
+    self.log_local.gen = next(_ctx_generation)
     try:
       yield
     finally:
       self.log_local.ctx = old_ctx
+      self.log_local.gen = old_gen
 
   def bind(self, **kwargs):
     self.local_ctx().update(kwargs)
+    self.log_local.gen = next(_ctx_generation)
 
   def bind_global(self, **kwargs):
     self.global_ctx.update(kwargs)
+    self.global_gen = next(_ctx_generation)
 
   def event(self, event, *args, **kwargs):
     evt = NiceOrderedDict()
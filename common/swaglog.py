@@ -1,5 +1,7 @@
+import atexit
 import logging
 import os
+import threading
 import time
 import warnings
 from pathlib import Path
@@ -10,6 +12,14 @@ import zmq
 from openpilot.common.logging_extra import SwagLogger, SwagFormatter, SwagLogFileFormatter
 from openpilot.system.hardware.hw import Paths
 
+# records are sent to logmessaged either one per message (level byte + JSON),
+# or coalesced into a multipart message whose first frame is BATCH_MAGIC and
+# each following frame is one record in the same level byte + JSON encoding.
+# 0xff is never a valid first byte of a UTF-8 encoded record.
+BATCH_MAGIC = b'\xff'
+BATCH_INTERVAL = float(os.getenv("SWAGLOG_BATCH_INTERVAL", "0.05"))  # seconds
+BATCH_MAX_RECORDS = 256
+
 
 def get_file_handler():
   Path(Paths.swaglog_root()).mkdir(parents=True, exist_ok=True)
@@ -104,6 +114,74 @@ class UnixDomainSocketHandler(logging.Handler):
       pass
 
 
+class BatchedUnixDomainSocketHandler(UnixDomainSocketHandler):
+  """
+  Coalesces records into one multipart message every BATCH_INTERVAL seconds,
+  instead of one zmq send per record. Errors are flushed immediately.
+  """
+  def __init__(self, formatter, interval=BATCH_INTERVAL, max_records=BATCH_MAX_RECORDS):
+    super().__init__(formatter)
+    self.interval = interval
+    self.max_records = max_records
+    self.pending = [BATCH_MAGIC]
+    self.flush_event = threading.Event()
+    self.flush_thread = None
+    atexit.register(self.flush)
+
+  def connect(self):
+    super().connect()
+    self.pending = [BATCH_MAGIC]
+    self.flush_event = threading.Event()
+    self.flush_thread = threading.Thread(target=self.flush_loop, args=(self.flush_event,), daemon=True)
+    self.flush_thread.start()
+
+  def close(self):
+    with self.lock:
+      if self.sock is not None:
+        self.flush()
+      self.flush_event.set()
+      super().close()
+      self.sock = None
+      self.zctx = None
+
+  def flush_loop(self, stop_event):
+    while not stop_event.wait(self.interval):
+      self.flush()
+
+  def flush(self):
+    with self.lock:
+      if len(self.pending) == 1 or self.sock is None or os.getpid() != self.pid:
+        return
+      batch, self.pending = self.pending, [BATCH_MAGIC]
+      try:
+        self.sock.send_multipart(batch, zmq.NOBLOCK)
+      except zmq.error.Again:
+        # drop :/
+        pass
+
+  def emit(self, record):
+    if os.getpid() != self.pid:
+      warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed.*<zmq.*>")
+      self.connect()
+
+    msg = self.format(record).rstrip('\n')
+    self.pending.append((chr(record.levelno)+msg).encode('utf8'))
+    if record.levelno >= logging.ERROR or len(self.pending) > self.max_records:
+      self.flush()
+
+
+def decode_messages(frames):
+  """
+  Returns the (level, record) pairs contained in a message received from the
+  swaglog socket, in either the batched or the single record encoding.
+  """
+  if frames[0] == BATCH_MAGIC:
+    dats = frames[1:]
+  else:
+    dats = [b''.join(frames)]
+  return [(dat[0], dat[1:].decode("utf-8")) for dat in dats]
+
+
 class ForwardingHandler(logging.Handler):
   def __init__(self, target_logger):
     super().__init__()
@@ -137,7 +215,10 @@ elif print_level == 'info':
 elif print_level == 'warning':
   outhandler.setLevel(logging.WARNING)
 
-ipchandler = UnixDomainSocketHandler(SwagFormatter(log))
+if os.getenv("SWAGLOG_BATCH") is not None:
+  ipchandler = BatchedUnixDomainSocketHandler(SwagFormatter(log))
+else:
+  ipchandler = UnixDomainSocketHandler(SwagFormatter(log))
 
 log.addHandler(outhandler)
 # logs are sent through IPC before writing to disk to prevent disk I/O blocking
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+import json
+import logging
+import multiprocessing
+import time
+import zmq
+
+from openpilot.common.logging_extra import SwagFormatter, SwagLogger, json_robust_dumps
+from openpilot.common.swaglog import BatchedUnixDomainSocketHandler, UnixDomainSocketHandler, decode_messages
+from openpilot.system.hardware.hw import Paths
+
+N = 50000
+CTX = {"dongle_id": "0123456789abcdef", "version": "0.9.9", "branch": "master", "commit": "0"*40, "dirty": False, "device": "pc"}
+
+
+class LegacyFormatter(SwagFormatter):
+  def format(self, record):
+    return json_robust_dumps(self.format_dict(record))
+
+
+def _receiver(ready, n):
+  ctx = zmq.Context()
+  sock = ctx.socket(zmq.PULL)
+  sock.bind(Paths.swaglog_ipc())
+  ready.set()
+  received = 0
+  while received < n:
+    received += len(decode_messages(sock.recv_multipart()))
+  sock.close()
+  ctx.term()
+
+
+def _benchmark(name, handler_cls, formatter_cls):
+  log = SwagLogger()
+  log.setLevel(logging.DEBUG)
+  log.bind_global(**CTX)
+  handler = handler_cls(formatter_cls(log))
+  log.addHandler(handler)
+
+  ready = multiprocessing.Event()
+  proc = multiprocessing.Process(target=_receiver, args=(ready, N))
+  proc.start()
+  ready.wait()
+  time.sleep(0.2)
+
+  t1, c1 = time.monotonic(), time.process_time_ns()
+  for i in range(N):
+    log.event("benchmark_event", i=i, path="2024-01-01--00-00-00--0/rlog.zst", retry=False)
+    if i % 1000 == 0:
+      # avoid dropping records on a full socket
+      time.sleep(0.001)
+  c2 = time.process_time_ns()
+  proc.join()
+  t2 = time.monotonic()
+  handler.close()
+
+  print(f"[{name}] {N/(t2-t1):.0f} records/s, {(c2-c1)/N/1e3:.1f}us CPU per record")
+
+
+def _benchmark_format():
+  log = SwagLogger()
+  log.bind_global(**CTX)
+  record = log.makeRecord(log.name, logging.INFO, __file__, 1, {"event": "benchmark_event", "i": 0}, (), None)
+  for formatter in (LegacyFormatter(log), SwagFormatter(log)):
+    assert json.loads(formatter.format(record)) == json.loads(LegacyFormatter(log).format(record))
+    t1 = time.process_time_ns()
+    for _ in range(N):
+      formatter.format(record)
+    t2 = time.process_time_ns()
+    print(f"[format {type(formatter).__name__}] {(t2-t1)/N/1e3:.1f}us per record")
+
+
+if __name__ == "__main__":
+  _benchmark_format()
+  _benchmark("unbatched, legacy format", UnixDomainSocketHandler, LegacyFormatter)
+  _benchmark("unbatched", UnixDomainSocketHandler, SwagFormatter)
+  _benchmark("batched", BatchedUnixDomainSocketHandler, SwagFormatter)
@@ -1,7 +1,8 @@
 import os
+import zstandard as zstd
 from uuid import uuid4
 
-from openpilot.common.file_helpers import atomic_write_in_dir
+from openpilot.common.file_helpers import atomic_write_in_dir, get_upload_stream
 
 
 class TestFileHelpers:
@@ -17,3 +18,23 @@ class TestFileHelpers:
 
   def test_atomic_write_in_dir(self):
     self.run_atomic_write_func(atomic_write_in_dir)
+
+  def test_get_upload_stream_compressed(self):
+    path = f"/tmp/tmp{uuid4()}"
+    data = os.urandom(1024) * 4 * 1024  # 4 MiB of compressible data, spans multiple chunks
+    with open(path, "wb") as f:
+      f.write(data)
+
+    try:
+      stream, size = get_upload_stream(path, False)
+      with stream:
+        assert size == len(data)
+        assert stream.read() == data
+
+      stream, size = get_upload_stream(path, True)
+      with stream:
+        compressed = stream.read()
+        assert size == len(compressed)
+        assert zstd.ZstdDecompressor().decompressobj().decompress(compressed) == data
+    finally:
+      os.remove(path)
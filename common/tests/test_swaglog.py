@@ -0,0 +1,108 @@
+import json
+import logging
+import sys
+import time
+import zmq
+
+from openpilot.common.logging_extra import SwagFormatter, SwagLogger, json_robust_dumps
+from openpilot.common.swaglog import BATCH_MAGIC, BatchedUnixDomainSocketHandler, UnixDomainSocketHandler, decode_messages
+from openpilot.system.hardware.hw import Paths
+
+
+def make_record(log, msg, level=logging.INFO):
+  return log.makeRecord(log.name, level, __file__, 1, msg, (), None)
+
+
+class TestSwagFormatter:
+  def setup_method(self):
+    self.log = SwagLogger()
+    self.formatter = SwagFormatter(self.log)
+
+  def _check(self, record):
+    assert json.loads(self.formatter.format(record)) == json.loads(json_robust_dumps(self.formatter.format_dict(record)))
+
+  def test_fast_path_matches_format_dict(self):
+    self.log.bind_global(dongle_id="abc", dirty=True)
+    self._check(make_record(self.log, "hello %s"))
+    self._check(make_record(self.log, {"event": "test", "x": [1, 2]}))
+    try:
+      raise ValueError("boom")
+    except ValueError:
+      record = self.log.makeRecord(self.log.name, logging.ERROR, __file__, 1, "err", (), sys.exc_info())
+    self._check(record)
+
+  def test_ctx_cache_invalidation(self):
+    def ctx():
+      return json.loads(self.formatter.format(make_record(self.log, "x")))['ctx']
+
+    assert ctx() == {}
+    self.log.bind_global(a=1)
+    assert ctx() == {'a': 1}
+    self.log.bind(b=2)
+    assert ctx() == {'a': 1, 'b': 2}
+    with self.log.ctx(c=3):
+      assert ctx() == {'a': 1, 'b': 2, 'c': 3}
+      self.log.bind(d=4)
+      assert ctx() == {'a': 1, 'b': 2, 'c': 3, 'd': 4}
+    assert ctx() == {'a': 1, 'b': 2}
+
+
+class TestBatchedHandler:
+  def setup_method(self):
+    self.zctx = zmq.Context()
+    self.sock = self.zctx.socket(zmq.PULL)
+    self.sock.setsockopt(zmq.RCVTIMEO, 1000)
+    self.sock.bind(Paths.swaglog_ipc())
+    self.log = SwagLogger()
+
+  def teardown_method(self):
+    self.sock.close()
+    self.zctx.term()
+
+  def _recv_all(self):
+    records = []
+    try:
+      while True:
+        records += decode_messages(self.sock.recv_multipart(zmq.NOBLOCK))
+    except zmq.error.Again:
+      pass
+    return records
+
+  def test_decode_single(self):
+    handler = UnixDomainSocketHandler(SwagFormatter(self.log))
+    handler.handle(make_record(self.log, "single", logging.WARNING))
+    frames = self.sock.recv_multipart()
+    handler.close()
+
+    assert frames[0] != BATCH_MAGIC
+    (level, record), = decode_messages(frames)
+    assert level == logging.WARNING
+    assert json.loads(record)['msg'] == "single"
+
+  def test_batching(self):
+    handler = BatchedUnixDomainSocketHandler(SwagFormatter(self.log), interval=0.1)
+    for i in range(10):
+      handler.handle(make_record(self.log, f"msg {i}"))
+
+    # coalesced into one message on the flush interval
+    frames = self.sock.recv_multipart()
+    assert frames[0] == BATCH_MAGIC
+    assert len(frames) == 11
+    records = decode_messages(frames)
+    assert [json.loads(r)['msg'] for _, r in records] == [f"msg {i}" for i in range(10)]
+
+    # errors are sent right away
+    t = time.monotonic()
+    handler.handle(make_record(self.log, "err", logging.ERROR))
+    (level, record), = decode_messages(self.sock.recv_multipart())
+    assert level == logging.ERROR
+    assert time.monotonic() - t < handler.interval
+
+    handler.close()
+
+  def test_flush_on_close(self):
+    handler = BatchedUnixDomainSocketHandler(SwagFormatter(self.log), interval=100)
+    handler.handle(make_record(self.log, "last"))
+    handler.close()
+    time.sleep(0.1)
+    assert [json.loads(r)['msg'] for _, r in self._recv_all()] == ["last"]
@@ -1,18 +1,80 @@
-from openpilot.common.transformations.orientation import numpy_wrap
+import numpy as np
+from functools import cached_property
+
+from openpilot.common.transformations.orientation import batch_wrap
 from openpilot.common.transformations.transformations import (ecef2geodetic_single,
                                                     geodetic2ecef_single)
 from openpilot.common.transformations.transformations import LocalCoord as LocalCoord_single
 
+# WGS84 ellipsoid, same constants as coordinates.cc
+A = 6378137
+B = 6356752.3142
+ESQ = 6.69437999014 * 0.001
+E1SQ = 6.73949674228 * 0.001
+
+
+def _geodetic2ecef(geodetic):
+  lat, lon, alt = np.radians(geodetic[..., 0]), np.radians(geodetic[..., 1]), geodetic[..., 2]
+  xi = np.sqrt(1.0 - ESQ * np.sin(lat)**2)
+  return np.stack([(A / xi + alt) * np.cos(lat) * np.cos(lon),
+                   (A / xi + alt) * np.cos(lat) * np.sin(lon),
+                   (A / xi * (1.0 - ESQ) + alt) * np.sin(lat)], axis=-1)
+
+
+def _ecef2geodetic(ecef):
+  # Ferrari's solution, see coordinates.cc
+  x, y, z = ecef[..., 0], ecef[..., 1], ecef[..., 2]
+  r = np.sqrt(x * x + y * y)
+  Esq = A * A - B * B
+  F = 54 * B * B * z * z
+  G = r * r + (1 - ESQ) * z * z - ESQ * Esq
+  C = (ESQ * ESQ * F * r * r) / G**3
+  S = np.cbrt(1 + C + np.sqrt(C * C + 2 * C))
+  P = F / (3 * (S + 1 / S + 1)**2 * G * G)
+  Q = np.sqrt(1 + 2 * ESQ * ESQ * P)
+  r_0 = -(P * ESQ * r) / (1 + Q) + np.sqrt(0.5 * A * A * (1 + 1.0 / Q) - P * (1 - ESQ) * z * z / (Q * (1 + Q)) - 0.5 * P * r * r)
+  U = np.sqrt((r - ESQ * r_0)**2 + z * z)
+  V = np.sqrt((r - ESQ * r_0)**2 + (1 - ESQ) * z * z)
+  Z_0 = B * B * z / (A * V)
+  h = U * (1 - B * B / (A * V))
+  with np.errstate(divide='ignore'):
+    lat = np.arctan((z + E1SQ * Z_0) / r)
+  return np.stack([np.degrees(lat), np.degrees(np.arctan2(y, x)), h], axis=-1)
+
 
 class LocalCoord(LocalCoord_single):
-  ecef2ned = numpy_wrap(LocalCoord_single.ecef2ned_single, (3,), (3,))
-  ned2ecef = numpy_wrap(LocalCoord_single.ned2ecef_single, (3,), (3,))
-  geodetic2ned = numpy_wrap(LocalCoord_single.geodetic2ned_single, (3,), (3,))
-  ned2geodetic = numpy_wrap(LocalCoord_single.ned2geodetic_single, (3,), (3,))
+  @cached_property
+  def _init_ecef(self):
+    return np.asarray(self.ned2ecef_single([0, 0, 0]))
+
+  @cached_property
+  def _ecef2ned_matrix(self):
+    return self.ecef2ned_matrix
+
+  @cached_property
+  def _ned2ecef_matrix(self):
+    return self.ned2ecef_matrix
+
+  def _ecef2ned(self, ecef):
+    return (ecef - self._init_ecef) @ self._ecef2ned_matrix.T
+
+  def _ned2ecef(self, ned):
+    return ned @ self._ned2ecef_matrix.T + self._init_ecef
+
+  def _geodetic2ned(self, geodetic):
+    return self._ecef2ned(_geodetic2ecef(geodetic))
+
+  def _ned2geodetic(self, ned):
+    return _ecef2geodetic(self._ned2ecef(ned))
+
+  ecef2ned = batch_wrap(LocalCoord_single.ecef2ned_single, _ecef2ned, (3,))
+  ned2ecef = batch_wrap(LocalCoord_single.ned2ecef_single, _ned2ecef, (3,))
+  geodetic2ned = batch_wrap(LocalCoord_single.geodetic2ned_single, _geodetic2ned, (3,))
+  ned2geodetic = batch_wrap(LocalCoord_single.ned2geodetic_single, _ned2geodetic, (3,))
 
 
-geodetic2ecef = numpy_wrap(geodetic2ecef_single, (3,), (3,))
-ecef2geodetic = numpy_wrap(ecef2geodetic_single, (3,), (3,))
+geodetic2ecef = batch_wrap(geodetic2ecef_single, _geodetic2ecef, (3,))
+ecef2geodetic = batch_wrap(ecef2geodetic_single, _ecef2geodetic, (3,))
 
 geodetic_from_ecef = ecef2geodetic
 ecef_from_geodetic = geodetic2ecef
@@ -1,6 +1,7 @@
 import numpy as np
 from collections.abc import Callable
 
+from openpilot.common.transformations.transformations import LocalCoord as LocalCoord_single
 from openpilot.common.transformations.transformations import (ecef_euler_from_ned_single,
                                                     euler2quat_single,
                                                     euler2rot_single,
@@ -33,14 +34,127 @@ def numpy_wrap(function, input_shape, output_shape) -> Callable[..., np.ndarray]
   return f
 
 
-euler2quat = numpy_wrap(euler2quat_single, (3,), (4,))
-quat2euler = numpy_wrap(quat2euler_single, (4,), (3,))
-quat2rot = numpy_wrap(quat2rot_single, (4,), (3, 3))
-rot2quat = numpy_wrap(rot2quat_single, (3, 3), (4,))
-euler2rot = numpy_wrap(euler2rot_single, (3,), (3, 3))
-rot2euler = numpy_wrap(rot2euler_single, (3, 3), (3,))
-ecef_euler_from_ned = numpy_wrap(ecef_euler_from_ned_single, (3,), (3,))
-ned_euler_from_ecef = numpy_wrap(ned_euler_from_ecef_single, (3,), (3,))
+def batch_wrap(single_function, batch_function, input_shape) -> Callable[..., np.ndarray]:
+  """Like numpy_wrap, but lists of inputs are transformed in one vectorized call instead of per element"""
+  def f(*inps):
+    *args, inp = inps
+    inp = np.asarray(inp, dtype=np.float64)
+    if inp.ndim == len(input_shape):
+      return np.asarray(single_function(*args, inp))
+    return batch_function(*args, inp)
+  return f
+
+
+def _ensure_unique(quats):
+  return np.where(quats[..., :1] > 0, quats, -quats)
+
+
+def _euler2quat(eulers):
+  half = eulers / 2
+  cr, cp, cy = np.cos(half[..., 0]), np.cos(half[..., 1]), np.cos(half[..., 2])
+  sr, sp, sy = np.sin(half[..., 0]), np.sin(half[..., 1]), np.sin(half[..., 2])
+  quats = np.stack([cr * cp * cy + sr * sp * sy,
+                    sr * cp * cy - cr * sp * sy,
+                    cr * sp * cy + sr * cp * sy,
+                    cr * cp * sy - sr * sp * cy], axis=-1)
+  return _ensure_unique(quats)
+
+
+def _quat2euler(quats):
+  w, x, y, z = quats[..., 0], quats[..., 1], quats[..., 2], quats[..., 3]
+  gamma = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+  theta = np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0))
+  psi = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+  return np.stack([gamma, theta, psi], axis=-1)
+
+
+def _quat2rot(quats):
+  w, x, y, z = quats[..., 0], quats[..., 1], quats[..., 2], quats[..., 3]
+  tx, ty, tz = 2 * x, 2 * y, 2 * z
+  twx, twy, twz = tx * w, ty * w, tz * w
+  txx, txy, txz = tx * x, ty * x, tz * x
+  tyy, tyz, tzz = ty * y, tz * y, tz * z
+  rots = np.empty(quats.shape[:-1] + (3, 3))
+  rots[..., 0, 0], rots[..., 0, 1], rots[..., 0, 2] = 1 - (tyy + tzz), txy - twz, txz + twy
+  rots[..., 1, 0], rots[..., 1, 1], rots[..., 1, 2] = txy + twz, 1 - (txx + tzz), tyz - twx
+  rots[..., 2, 0], rots[..., 2, 1], rots[..., 2, 2] = txz - twy, tyz + twx, 1 - (txx + tyy)
+  return rots
+
+
+def _rot2quat(rots):
+  # Shepperd's method as in Eigen: use the trace if positive, otherwise the largest diagonal element
+  trace = np.trace(rots, axis1=-2, axis2=-1)
+  diag = np.diagonal(rots, axis1=-2, axis2=-1)
+  largest = np.where(trace > 0, 3, np.where(diag[..., 1] > diag[..., 0],
+                                            np.where(diag[..., 2] > diag[..., 1], 2, 1),
+                                            np.where(diag[..., 2] > diag[..., 0], 2, 0)))
+
+  quats = np.empty(rots.shape[:-2] + (4,))
+  t = np.sqrt(np.maximum(trace + 1.0, 0.0))
+  with np.errstate(divide='ignore', invalid='ignore'):
+    quats[...] = np.stack([0.5 * t,
+                           (rots[..., 2, 1] - rots[..., 1, 2]) * 0.5 / t,
+                           (rots[..., 0, 2] - rots[..., 2, 0]) * 0.5 / t,
+                           (rots[..., 1, 0] - rots[..., 0, 1]) * 0.5 / t], axis=-1)
+    for i in range(3):
+      mask = largest == i
+      if not np.any(mask):
+        continue
+      j, k = (i + 1) % 3, (i + 2) % 3
+      r = rots[mask]
+      t = np.sqrt(np.maximum(r[:, i, i] - r[:, j, j] - r[:, k, k] + 1.0, 0.0))
+      q = np.empty((len(r), 4))
+      q[:, 1 + i] = 0.5 * t
+      q[:, 0] = (r[:, k, j] - r[:, j, k]) * 0.5 / t
+      q[:, 1 + j] = (r[:, j, i] + r[:, i, j]) * 0.5 / t
+      q[:, 1 + k] = (r[:, k, i] + r[:, i, k]) * 0.5 / t
+      quats[mask] = q
+  return _ensure_unique(quats)
+
+
+def _euler2rot(eulers):
+  return _quat2rot(_euler2quat(eulers))
+
+
+def _rot2euler(rots):
+  return _quat2euler(_rot2quat(rots))
+
+
+def _euler_from_frame(rots):
+  """
+  Euler angles of the frame whose axes are the columns of rots. Closed form of the
+  axis construction in ecef_euler_from_ned/ned_euler_from_ecef in orientation.cc
+  """
+  r00, r10, r20 = rots[..., 0, 0], rots[..., 1, 0], rots[..., 2, 0]
+  r01, r11, r21 = rots[..., 0, 1], rots[..., 1, 1], rots[..., 2, 1]
+  psi = np.arctan2(r10, r00)
+  theta = np.arctan2(-r20, np.sqrt(r00**2 + r10**2))
+
+  # y2 = (-sin(psi), cos(psi), 0) and z2 = (cos(psi) sin(theta), sin(psi) sin(theta), cos(theta))
+  cos_psi, sin_psi = np.cos(psi), np.sin(psi)
+  y3_z2 = (r01 * cos_psi + r11 * sin_psi) * np.sin(theta) + r21 * np.cos(theta)
+  y3_y2 = r11 * cos_psi - r01 * sin_psi
+  return np.stack([np.arctan2(y3_z2, y3_y2), theta, psi], axis=-1)
+
+
+def _ecef_euler_from_ned(ecef_init, ned_poses):
+  ned2ecef = LocalCoord_single.from_ecef(ecef_init).ned2ecef_matrix
+  return _euler_from_frame(ned2ecef @ _euler2rot(ned_poses))
+
+
+def _ned_euler_from_ecef(ecef_init, ecef_poses):
+  ecef2ned = LocalCoord_single.from_ecef(ecef_init).ecef2ned_matrix
+  return _euler_from_frame(ecef2ned @ _euler2rot(ecef_poses))
+
+
+euler2quat = batch_wrap(euler2quat_single, _euler2quat, (3,))
+quat2euler = batch_wrap(quat2euler_single, _quat2euler, (4,))
+quat2rot = batch_wrap(quat2rot_single, _quat2rot, (4,))
+rot2quat = batch_wrap(rot2quat_single, _rot2quat, (3, 3))
+euler2rot = batch_wrap(euler2rot_single, _euler2rot, (3,))
+rot2euler = batch_wrap(rot2euler_single, _rot2euler, (3, 3))
+ecef_euler_from_ned = batch_wrap(ecef_euler_from_ned_single, _ecef_euler_from_ned, (3,))
+ned_euler_from_ecef = batch_wrap(ned_euler_from_ecef_single, _ned_euler_from_ecef, (3,))
 
 quats_from_rotations = rot2quat
 quat_from_rot = rot2quat
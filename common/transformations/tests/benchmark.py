@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import time
+import numpy as np
+
+import openpilot.common.transformations.coordinates as coord
+import openpilot.common.transformations.orientation as orient
+from openpilot.common.transformations.orientation import numpy_wrap
+from openpilot.common.transformations.transformations import LocalCoord as LocalCoord_single
+
+N = 100000
+
+
+def _benchmark(name, batch_fn, looped_fn, inp):
+  t1 = time.process_time_ns()
+  batch_fn(inp)
+  t2 = time.process_time_ns()
+  looped_fn(inp)
+  t3 = time.process_time_ns()
+  print(f"[{name}] {N} samples: batched {(t2 - t1) / 1e6:.1f}ms, looped {(t3 - t2) / 1e6:.1f}ms, {(t3 - t2) / max(t2 - t1, 1):.0f}x")
+
+
+if __name__ == "__main__":
+  rng = np.random.default_rng(0)
+  eulers = rng.uniform(-np.pi, np.pi, (N, 3))
+  quats = orient.euler2quat(eulers)
+  rots = orient.euler2rot(eulers)
+  geodetic = np.column_stack([rng.uniform(-89, 89, N), rng.uniform(-180, 180, N), rng.uniform(0, 1000, N)])
+  ecef = coord.geodetic2ecef(geodetic)
+  local = coord.LocalCoord.from_geodetic(geodetic[0])
+
+  for name, fn, inp in [("euler2quat", orient.euler2quat, eulers), ("quat2euler", orient.quat2euler, quats),
+                        ("quat2rot", orient.quat2rot, quats), ("rot2quat", orient.rot2quat, rots),
+                        ("euler2rot", orient.euler2rot, eulers), ("rot2euler", orient.rot2euler, rots)]:
+    single_fn = getattr(orient, f"{name}_single")
+    _benchmark(name, fn, numpy_wrap(single_fn, inp.shape[1:], fn(inp[0]).shape), inp)
+
+  _benchmark("geodetic2ecef", coord.geodetic2ecef, numpy_wrap(coord.geodetic2ecef_single, (3,), (3,)), geodetic)
+  _benchmark("ecef2geodetic", coord.ecef2geodetic, numpy_wrap(coord.ecef2geodetic_single, (3,), (3,)), ecef)
+  _benchmark("LocalCoord.ecef2ned", local.ecef2ned, lambda x: numpy_wrap(LocalCoord_single.ecef2ned_single, (3,), (3,))(local, x), ecef)
+  _benchmark("ned_euler_from_ecef", lambda x: orient.ned_euler_from_ecef(ecef[0], x),
+             lambda x: numpy_wrap(orient.ned_euler_from_ecef_single, (3,), (3,))(ecef[0], x), eulers)
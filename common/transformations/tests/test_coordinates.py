@@ -1,6 +1,7 @@
 import numpy as np
 
 import openpilot.common.transformations.coordinates as coord
+from openpilot.common.transformations.transformations import ecef2geodetic_single, geodetic2ecef_single
 
 geodetic_positions = np.array([[37.7610403, -122.4778699, 115],
                                  [27.4840915, -68.5867592, 2380],
@@ -102,3 +103,21 @@ class TestNED:
     np.testing.assert_allclose(converter.ned2ecef(ned_offsets_batch),
                                                            ecef_positions_offset_batch,
                                                            rtol=1e-9, atol=1e-7)
+
+  def test_batch_matches_single(self):
+    rng = np.random.default_rng(0)
+    geodetic = np.column_stack([rng.uniform(-89, 89, 1000), rng.uniform(-180, 180, 1000), rng.uniform(-100, 5000, 1000)])
+    ecef = np.array([geodetic2ecef_single(g) for g in geodetic])
+
+    np.testing.assert_allclose(coord.geodetic2ecef(geodetic), ecef, rtol=1e-12)
+    np.testing.assert_allclose(coord.ecef2geodetic(ecef), np.array([ecef2geodetic_single(e) for e in ecef]), rtol=1e-12, atol=1e-6)
+
+    converter = coord.LocalCoord.from_geodetic(geodetic[0])
+    ned = ecef[:100] - ecef[0]
+    for batch_fn, single_fn, inputs in [(converter.ecef2ned, converter.ecef2ned_single, ecef[:100]),
+                                        (converter.ned2ecef, converter.ned2ecef_single, ned),
+                                        (converter.geodetic2ned, converter.geodetic2ned_single, geodetic[:100]),
+                                        (converter.ned2geodetic, converter.ned2geodetic_single, ned)]:
+      expected = np.array([single_fn(x) for x in inputs])
+      np.testing.assert_allclose(batch_fn(inputs), expected, rtol=1e-9, atol=1e-6)
+      np.testing.assert_allclose(batch_fn(inputs[0]), expected[0], rtol=1e-9, atol=1e-6)
@@ -2,7 +2,10 @@ import numpy as np
 
 from openpilot.common.transformations.orientation import euler2quat, quat2euler, euler2rot, rot2euler, \
                                                rot2quat, quat2rot, \
-                                               ned_euler_from_ecef
+                                               ned_euler_from_ecef, ecef_euler_from_ned
+from openpilot.common.transformations.transformations import euler2quat_single, quat2euler_single, euler2rot_single, \
+                                               rot2euler_single, rot2quat_single, quat2rot_single, \
+                                               ned_euler_from_ecef_single, ecef_euler_from_ned_single
 
 eulers = np.array([[ 1.46520501,  2.78688383,  2.92780854],
        [ 4.86909526,  3.60618161,  4.30648981],
@@ -59,3 +62,28 @@ class TestOrientation:
       np.testing.assert_allclose(ned_eulers[i], ned_euler_from_ecef(ecef_positions[i], eulers[i]), rtol=1e-7)
       #np.testing.assert_allclose(eulers[i], ecef_euler_from_ned(ecef_positions[i], ned_eulers[i]), rtol=1e-7)
     # np.testing.assert_allclose(ned_eulers, ned_euler_from_ecef(ecef_positions, eulers), rtol=1e-7)
+
+  def test_batch_matches_single(self):
+    rng = np.random.default_rng(0)
+    rand_eulers = np.concatenate([rng.uniform(-np.pi, np.pi, (1000, 3)), eulers,
+                                  [[0, 0, 0], [np.pi, 0, 0], [0, np.pi, 0], [0, 0, np.pi], [np.pi, np.pi / 2, 0]]])
+    rand_quats = np.array([euler2quat_single(e) for e in rand_eulers])
+    rand_rots = np.array([euler2rot_single(e) for e in rand_eulers])
+
+    for batch_fn, single_fn, inputs in [(euler2quat, euler2quat_single, rand_eulers),
+                                        (quat2euler, quat2euler_single, rand_quats),
+                                        (quat2rot, quat2rot_single, rand_quats),
+                                        (rot2quat, rot2quat_single, rand_rots),
+                                        (euler2rot, euler2rot_single, rand_eulers),
+                                        (rot2euler, rot2euler_single, rand_rots)]:
+      expected = np.array([single_fn(x) for x in inputs])
+      np.testing.assert_allclose(batch_fn(inputs), expected, rtol=1e-9, atol=1e-9, err_msg=batch_fn.__name__)
+      # a single input still returns a single output
+      np.testing.assert_allclose(batch_fn(inputs[0]), expected[0], rtol=1e-9, atol=1e-9)
+      assert batch_fn(inputs[:0]).shape == (0,) + expected.shape[1:]
+
+    for ecef_init in ecef_positions:
+      for batch_fn, single_fn in [(ned_euler_from_ecef, ned_euler_from_ecef_single), (ecef_euler_from_ned, ecef_euler_from_ned_single)]:
+        expected = np.array([single_fn(ecef_init, e) for e in rand_eulers[:100]])
+        # the single versions get the local axes by differencing ecef positions, which costs some precision
+        np.testing.assert_allclose(batch_fn(ecef_init, rand_eulers[:100]), expected, rtol=1e-7, atol=1e-7)
@@ -2,6 +2,7 @@
 import bisect
 import math
 import os
+import numpy as np
 from enum import IntEnum
 from collections.abc import Callable
 
@@ -47,55 +48,86 @@ class ET:
 
 # get event name from enum
 EVENT_NAME = {v: k for k, v in EventName.schema.enumerants.items()}
+NUM_EVENTS = max(EVENT_NAME) + 1
 
 
 class Events:
   def __init__(self):
     self.events: list[int] = []
     self.static_events: list[int] = []
-    self.event_counters = dict.fromkeys(EVENTS.keys(), 0)
+
+    # active events as a bitset and mask indexed by EventName, kept in sync with self.events
+    self._bits = 0
+    self._static_bits = 0
+    self._mask = np.zeros(NUM_EVENTS, dtype=bool)
+    self._static_mask = np.zeros(NUM_EVENTS, dtype=bool)
+    self._counters = np.zeros(NUM_EVENTS, dtype=np.int64)
 
   @property
   def names(self) -> list[int]:
     return self.events
 
+  @property
+  def event_counters(self) -> dict[int, int]:
+    return {k: int(self._counters[k]) for k in EVENTS}
+
   def __len__(self) -> int:
     return len(self.events)
 
   def add(self, event_name: int, static: bool=False) -> None:
     if static:
       bisect.insort(self.static_events, event_name)
+      self._static_bits |= 1 << event_name
+      self._static_mask[event_name] = True
     bisect.insort(self.events, event_name)
+    self._bits |= 1 << event_name
+    self._mask[event_name] = True
 
   def clear(self) -> None:
-    self.event_counters = {k: (v + 1 if k in self.events else 0) for k, v in self.event_counters.items()}
+    # increment counters of active events, reset all others
+    self._counters += 1
+    self._counters *= self._mask
+
     self.events = self.static_events.copy()
+    self._bits = self._static_bits
+    np.copyto(self._mask, self._static_mask)
 
   def contains(self, event_type: str) -> bool:
-    return any(event_type in EVENTS.get(e, {}) for e in self.events)
+    return bool(self._bits & EVENT_TYPE_BITS.get(event_type, 0))
 
   def create_alerts(self, event_types: list[str], callback_args=None):
     if callback_args is None:
       callback_args = []
 
     ret = []
+    requested_bits = 0
+    for et in event_types:
+      requested_bits |= EVENT_TYPE_BITS.get(et, 0)
+    if not self._bits & requested_bits:
+      return ret
+
     for e in self.events:
-      types = EVENTS[e].keys()
+      if not requested_bits & (1 << e):
+        continue
+
+      alerts = EVENTS[e]
       for et in event_types:
-        if et in types:
-          alert = EVENTS[e][et]
-          if not isinstance(alert, Alert):
-            alert = alert(*callback_args)
-
-          if DT_CTRL * (self.event_counters[e] + 1) >= alert.creation_delay:
-            alert.alert_type = f"{EVENT_NAME[e]}/{et}"
-            alert.event_type = et
-            ret.append(alert)
+        alert = alerts.get(et)
+        if alert is None:
+          continue
+
+        if not isinstance(alert, Alert):
+          alert = alert(*callback_args)
+
+        if DT_CTRL * (self._counters[e] + 1) >= alert.creation_delay:
+          alert.alert_type = ALERT_TYPES[(e, et)]
+          alert.event_type = et
+          ret.append(alert)
     return ret
 
   def add_from_msg(self, events):
     for e in events:
-      bisect.insort(self.events, e.name.raw)
+      self.add(e.name.raw)
 
   def to_msg(self):
     ret = []
@@ -1012,6 +1044,23 @@ EVENTS: dict[int, dict[str, Alert | AlertCallbackType]] = {
   },
 }
 
+# lookup tables derived from EVENTS, used by Events to avoid scanning EVENTS every cycle
+EVENT_TYPE_BITS: dict[str, int] = {}
+ALERT_TYPES: dict[tuple[int, str], str] = {}
+
+
+def build_event_tables() -> None:
+  """Rebuild the EVENTS lookup tables. Must be called after modifying EVENTS."""
+  EVENT_TYPE_BITS.clear()
+  ALERT_TYPES.clear()
+  for e, alerts in EVENTS.items():
+    for et in alerts:
+      EVENT_TYPE_BITS[et] = EVENT_TYPE_BITS.get(et, 0) | (1 << e)
+      ALERT_TYPES[(e, et)] = f"{EVENT_NAME[e]}/{et}"
+
+
+build_event_tables()
+
 
 if __name__ == '__main__':
   # print all alerts by type and priority
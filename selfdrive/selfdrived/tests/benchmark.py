@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+import random
+import time
+
+from cereal import log
+from openpilot.selfdrive.selfdrived.events import Alert, Events, ET, EVENTS
+from openpilot.selfdrive.selfdrived.state import StateMachine
+
+EventName = log.OnroadEvent.EventName
+
+
+def _benchmark(n_events, cycles=20000):
+  # only static alerts, callback alerts need a full SubMaster
+  candidates = [e for e, alerts in EVENTS.items() if all(isinstance(a, Alert) for a in alerts.values())]
+  cycle_events = [random.sample(candidates, n_events) for _ in range(100)]
+
+  events = Events()
+  events.add(EventName.dashcamMode, static=True)
+  state_machine = StateMachine()
+
+  t1 = time.process_time_ns()
+  for i in range(cycles):
+    # what selfdrived does every step: clear, add, run the state machine and create alerts
+    events.clear()
+    for e in cycle_events[i % len(cycle_events)]:
+      events.add(e)
+    state_machine.update(events)
+    events.create_alerts(state_machine.current_alert_types)
+    events.contains(ET.NO_ENTRY)
+  t2 = time.process_time_ns()
+
+  print(f'[{n_events} events] {(t2 - t1) / cycles / 1e3:.2f}us per cycle over {cycles} cycles')
+
+
+if __name__ == "__main__":
+  # python -m cProfile -s cumulative benchmark.py
+  for n in (0, 1, 3, 10):
+    _benchmark(n)
@@ -0,0 +1,72 @@
+import random
+
+from cereal import log
+from openpilot.common.realtime import DT_CTRL
+from openpilot.selfdrive.selfdrived.events import Alert, Events, ET, EVENTS, EVENT_NAME
+
+EventName = log.OnroadEvent.EventName
+ALL_EVENT_TYPES = (ET.ENABLE, ET.PRE_ENABLE, ET.OVERRIDE_LATERAL, ET.OVERRIDE_LONGITUDINAL, ET.NO_ENTRY, ET.WARNING,
+                   ET.USER_DISABLE, ET.SOFT_DISABLE, ET.IMMEDIATE_DISABLE, ET.PERMANENT)
+STATIC_EVENTS = [e for e, alerts in EVENTS.items() if all(isinstance(a, Alert) for a in alerts.values())]
+
+
+class TestEvents:
+  def test_contains(self):
+    for _ in range(100):
+      events = Events()
+      names = random.sample(list(EVENTS), random.randint(0, 5))
+      for e in names:
+        events.add(e)
+
+      assert events.names == sorted(names)
+      for et in ALL_EVENT_TYPES:
+        assert events.contains(et) == any(et in EVENTS[e] for e in names)
+      assert not events.contains("unknownType")
+
+  def test_static_events(self):
+    events = Events()
+    events.add(EventName.dashcamMode, static=True)
+    events.add(EventName.pedalPressed)
+    events.clear()
+    assert events.names == [EventName.dashcamMode]
+    assert events.contains(ET.PERMANENT)
+    assert not events.contains(ET.IMMEDIATE_DISABLE)
+
+  def test_event_counters(self):
+    events = Events()
+    for i in range(10):
+      events.add(EventName.pedalPressed)
+      if i % 2 == 0:
+        events.add(EventName.doorOpen)
+      events.clear()
+
+      assert events.event_counters[EventName.pedalPressed] == i + 1
+      assert events.event_counters[EventName.doorOpen] == (1 if i % 2 == 0 else 0)
+      assert events.event_counters[EventName.seatbeltNotLatched] == 0
+
+  def test_create_alerts(self):
+    # reference implementation scanning EVENTS for every active event
+    def expected_alerts(names, counters, event_types):
+      ret = []
+      for e in names:
+        for et in event_types:
+          alert = EVENTS[e].get(et)
+          if alert is not None and DT_CTRL * (counters[e] + 1) >= alert.creation_delay:
+            ret.append(f"{EVENT_NAME[e]}/{et}")
+      return ret
+
+    events = Events()
+    for _ in range(200):
+      names = random.sample(STATIC_EVENTS, random.randint(0, 5))
+      for e in names:
+        events.add(e)
+      event_types = random.sample(ALL_EVENT_TYPES, random.randint(1, 3))
+
+      alerts = events.create_alerts(event_types)
+      assert [a.alert_type for a in alerts] == expected_alerts(events.names, events.event_counters, event_types)
+      assert all(a.event_type in event_types for a in alerts)
+
+      # keep some events active across cycles so creation_delay is exercised
+      events.clear()
+      for e in names[:2]:
+        events.add(e)
@@ -1,7 +1,7 @@
 from cereal import log
 from openpilot.common.realtime import DT_CTRL
 from openpilot.selfdrive.selfdrived.state import StateMachine, SOFT_DISABLE_TIME
-from openpilot.selfdrive.selfdrived.events import Events, ET, EVENTS, NormalPermanentAlert
+from openpilot.selfdrive.selfdrived.events import Events, ET, EVENTS, NormalPermanentAlert, build_event_tables
 
 State = log.SelfdriveState.OpenpilotState
 
@@ -18,6 +18,7 @@ def make_event(event_types):
   for ev in event_types:
     event[ev] = NormalPermanentAlert("alert")
   EVENTS[0] = event
+  build_event_tables()
   return 0
 
 
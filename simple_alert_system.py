@@ -11,21 +11,427 @@ import threading
 import sys
 import os
 import argparse
-from typing import Union
+import json
+import math
+import multiprocessing as mp
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Optional, Union
 from datetime import datetime
 
 # Add current directory to Python path
 sys.path.insert(0, '.')
 
+class DropOldestQueue:
+    """Bounded queue between pipeline stages, a full queue drops its oldest item instead of blocking"""
+
+    def __init__(self, maxsize: int = 1):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        """Return the oldest item, or None on timeout or once the queue is closed"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self.closed, timeout)
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """Rolling latency and throughput of one pipeline stage"""
+
+    def __init__(self, name: str, window: int = 300):
+        self.name = name
+        self._latencies = deque(maxlen=window)
+        self._timestamps = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self._timestamps.append(time.monotonic())
+
+    def fps(self) -> float:
+        with self._lock:
+            if len(self._timestamps) < 2:
+                return 0.0
+            return (len(self._timestamps) - 1) / max(self._timestamps[-1] - self._timestamps[0], 1e-6)
+
+    def summary(self) -> str:
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+        if len(latencies) == 0:
+            return f"{self.name:>10}: no frames"
+        avg, p95 = np.mean(latencies), np.percentile(latencies, 95)
+        return f"{self.name:>10}: {self.fps():5.1f} fps | {avg:6.1f} ms avg | {p95:6.1f} ms p95"
+
+
+class RegionOfInterest:
+    """Trapezoid at the bottom of the image where lanes can appear, in fractions of the frame size"""
+
+    def __init__(self, top: float = 0.55, top_width: float = 0.3, bottom_width: float = 1.0):
+        self.top = top
+        self.top_width = top_width
+        self.bottom_width = bottom_width
+        self._masks = {}
+
+    @staticmethod
+    def parse(spec: str) -> "RegionOfInterest":
+        """Parse 'TOP,TOP_WIDTH,BOTTOM_WIDTH', e.g. '0.55,0.3,1.0'"""
+        top, top_width, bottom_width = (float(v) for v in spec.split(","))
+        return RegionOfInterest(top, top_width, bottom_width)
+
+    def top_row(self, height: int) -> int:
+        return int(height * self.top)
+
+    def mask(self, height: int, width: int) -> np.ndarray:
+        """Mask of the trapezoid, cropped to the rows from top_row() down"""
+        if (height, width) not in self._masks:
+            top = self.top_row(height)
+            mask = np.zeros((height - top, width), dtype=np.uint8)
+            cx = width / 2
+            points = np.array([
+                (cx - width * self.bottom_width / 2, height - top),
+                (cx - width * self.top_width / 2, 0),
+                (cx + width * self.top_width / 2, 0),
+                (cx + width * self.bottom_width / 2, height - top),
+            ], dtype=np.int32)
+            cv2.fillConvexPoly(mask, points, 255)
+            self._masks[(height, width)] = mask
+        return self._masks[(height, width)]
+
+
+class FrameFeatures:
+    """Image features of one frame, computed once on first use and shared by the detectors and the overlay
+
+    Features are computed on a copy of the frame downscaled by `scale`, and edges only inside the region
+    of interest. Lines are returned in full resolution frame coordinates.
+    """
+
+    def __init__(self, frame: np.ndarray, scale: float = 1.0, roi: Optional[RegionOfInterest] = None):
+        self.frame = frame
+        self.scale = scale
+        self.roi = roi
+
+    @cached_property
+    def small(self) -> np.ndarray:
+        if self.scale == 1.0:
+            return self.frame
+        # INTER_AREA is much slower for non-integer factors, and the edge detector blurs anyway
+        return cv2.resize(self.frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_LINEAR)
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        return cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def edge_offset(self) -> int:
+        """First row of `gray` covered by `blurred` and `edges`"""
+        return 0 if self.roi is None else self.roi.top_row(self.gray.shape[0])
+
+    @cached_property
+    def blurred(self) -> np.ndarray:
+        return cv2.GaussianBlur(self.gray[self.edge_offset:], (5, 5), 0)
+
+    @cached_property
+    def edges(self) -> np.ndarray:
+        edges = cv2.Canny(self.blurred, 50, 150)
+        if self.roi is not None:
+            cv2.bitwise_and(edges, self.roi.mask(*self.gray.shape), dst=edges)
+        return edges
+
+    @cached_property
+    def lines(self) -> np.ndarray:
+        """Hough line segments as an (N, 4) array of x1, y1, x2, y2"""
+        lines = cv2.HoughLinesP(self.edges, 1, np.pi/180, threshold=max(1, round(50 * self.scale)),
+                                minLineLength=50 * self.scale, maxLineGap=10 * self.scale)
+        if lines is None:
+            return np.empty((0, 4), dtype=np.int32)
+        lines = lines.reshape(-1, 4) + np.array([0, self.edge_offset, 0, self.edge_offset], dtype=np.int32)
+        if self.scale != 1.0:
+            lines = np.round(lines / self.scale).astype(np.int32)
+        return lines
+
+    @cached_property
+    def lane_lines(self) -> tuple[np.ndarray, np.ndarray]:
+        """Split the Hough segments into left and right lane candidates by slope"""
+        x1, y1, x2, y2 = self.lines.T.astype(np.float32)
+        dx = x2 - x1
+        slope = np.divide(y2 - y1, dx, out=np.zeros_like(dx), where=dx != 0)
+        return self.lines[slope < -0.3], self.lines[slope > 0.3]
+
+    @cached_property
+    def edge_points(self) -> tuple[np.ndarray, np.ndarray]:
+        """x and y of all edge pixels, normalized to [0, 1] of the frame width and height"""
+        # cv2.findNonZero is several times faster than np.nonzero on large sparse images
+        points = cv2.findNonZero(self.edges)
+        points = np.empty((0, 2), dtype=np.float32) if points is None else points.reshape(-1, 2).astype(np.float32)
+        height, width = self.gray.shape
+        return points[:, 0] / width, (points[:, 1] + self.edge_offset) / height
+
+
+class LaneLineTracker:
+    """Kalman filtered polynomial x = f(y) of one lane line
+
+    Coordinates are normalized to the frame size and y is relative to eval_row, so the last
+    coefficient is the line's x position at eval_row. Each update only fits the edge pixels
+    within search_margin of the previous estimate.
+    """
+
+    MIN_POINTS = 20
+    MIN_SPREAD = 0.1
+
+    def __init__(self, degree: int = 2, eval_row: float = 0.9, search_margin: float = 0.05, max_missed: int = 10):
+        self.degree = degree
+        self.eval_row = eval_row
+        self.search_margin = search_margin
+        self.max_missed = max_missed
+        # Per frame drift of curvature, slope and position
+        self.process_noise = np.diag([2.5e-3, 4e-4, 1e-4][-(degree + 1):])
+        self.initial_cov = np.diag([1e-2, 1e-2, 1e-3][-(degree + 1):])
+        self.state: Optional[np.ndarray] = None
+        self.cov: Optional[np.ndarray] = None
+        self.missed = 0
+
+    @property
+    def tracking(self) -> bool:
+        return self.state is not None
+
+    def x_at(self, y):
+        return np.polyval(self.state, np.asarray(y) - self.eval_row)
+
+    def reset(self, segments: np.ndarray):
+        """(Re)acquire the line from (N, 4) normalized line segments"""
+        if len(segments) == 0:
+            return
+        xs = segments[:, [0, 2]].ravel()
+        ys = segments[:, [1, 3]].ravel()
+        self.state = np.zeros(self.degree + 1)
+        self.state[-2:] = np.polyfit(ys - self.eval_row, xs, 1)
+        self.cov = self.initial_cov.copy()
+        self.missed = 0
+
+    def update(self, xs: np.ndarray, ys: np.ndarray) -> bool:
+        """Predict, then correct with the edge pixels near the predicted line, returns False on a miss"""
+        self.cov = self.cov + self.process_noise
+
+        near = np.abs(xs - self.x_at(ys)) < self.search_margin
+        xs, ys = xs[near], ys[near]
+        if len(xs) < max(self.MIN_POINTS, self.degree + 3) or np.ptp(ys) < self.MIN_SPREAD:
+            self.missed += 1
+            if self.missed > self.max_missed:
+                self.state = self.cov = None
+            return False
+
+        measurement, measurement_cov = np.polyfit(ys - self.eval_row, xs, self.degree, cov=True)
+        gain = self.cov @ np.linalg.inv(self.cov + measurement_cov + np.eye(self.degree + 1) * 1e-8)
+        self.state = self.state + gain @ (measurement - self.state)
+        self.cov = (np.eye(self.degree + 1) - gain) @ self.cov
+        self.missed = 0
+        return True
+
+
+class LaneTracker:
+    """Tracks the left and right lane lines from frame to frame, Hough is only used to (re)acquire a lost line"""
+
+    def __init__(self, **kwargs):
+        self.left = LaneLineTracker(**kwargs)
+        self.right = LaneLineTracker(**kwargs)
+
+    @property
+    def acquired(self) -> bool:
+        return self.left.tracking and self.right.tracking
+
+    def update(self, edge_points: tuple[np.ndarray, np.ndarray], lane_lines: Optional[tuple[np.ndarray, np.ndarray]],
+               width: int, height: int):
+        """Update the filters from FrameFeatures.edge_points, lane_lines are only used to reacquire a lost line
+
+        Takes the features rather than a FrameFeatures so none of them are computed while the caller holds a lock.
+        """
+        if lane_lines is not None and not self.acquired:
+            norm = np.array([width, height, width, height], dtype=np.float32)
+            left_lines, right_lines = lane_lines
+            if not self.left.tracking:
+                self.left.reset(left_lines / norm)
+            if not self.right.tracking:
+                self.right.reset(right_lines / norm)
+
+        xs, ys = edge_points
+        for line in (self.left, self.right):
+            if line.tracking:
+                line.update(xs, ys)
+
+    def positions(self, width: int) -> tuple[Optional[float], Optional[float]]:
+        """x of the left and right lines at the evaluation row, in pixels"""
+        return tuple(float(line.x_at(line.eval_row)) * width if line.tracking else None for line in (self.left, self.right))
+
+    def polylines(self, width: int, height: int, y_top: float) -> list[np.ndarray]:
+        """Points along each tracked line from y_top to the bottom of the frame, for drawing"""
+        ys = np.linspace(y_top, 1.0, 12)
+        return [np.stack([line.x_at(ys) * width, ys * height], axis=1).round().astype(np.int32)
+                for line in (self.left, self.right) if line.tracking]
+
+
+class MotionDetector:
+    """Background subtraction on a downscaled grayscale image, with a persistence filter on the moving blobs
+
+    The background is either an exponential running average or OpenCV's MOG2 model. A blob only counts
+    once it has been seen near the same place for `persistence` consecutive frames, which rejects
+    single-frame flicker and compression noise.
+    """
+
+    def __init__(self, model: str = "average", width: int = 160, learning_rate: float = 0.05, threshold: int = 30,
+                 min_area: float = 1000, persistence: int = 3, match_radius: float = 0.1):
+        self.model = model
+        self.width = width
+        self.learning_rate = learning_rate
+        self.threshold = threshold
+        self.min_area = min_area  # in full resolution pixels
+        self.persistence = persistence
+        self.match_radius = match_radius  # fraction of the image width
+        self._background: Optional[np.ndarray] = None
+        self._mog2 = cv2.createBackgroundSubtractorMOG2(history=int(2 / learning_rate), varThreshold=threshold,
+                                                        detectShadows=False) if model == "mog2" else None
+        self._kernel = np.ones((3, 3), dtype=np.uint8)
+        # Centroids and ages of the blobs in the previous frame
+        self._blobs = np.empty((0, 2), dtype=np.float32)
+        self._ages = np.empty(0, dtype=np.int32)
+
+    def foreground(self, small: np.ndarray) -> Optional[np.ndarray]:
+        """Update the background model and return the foreground mask, None while the model is empty"""
+        if self._mog2 is not None:
+            # MOG2 adapts to new modes quickly, let it learn at its own 1 / history rate
+            mask = self._mog2.apply(small, learningRate=-1)
+        else:
+            if self._background is None:
+                self._background = small.astype(np.float32)
+                return None
+            diff = cv2.absdiff(small, cv2.convertScaleAbs(self._background))
+            mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)[1]
+            cv2.accumulateWeighted(small, self._background, self.learning_rate)
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel)
+
+    def prepare(self, gray: np.ndarray) -> np.ndarray:
+        """Downscale and blur a grayscale frame for update(), touches no state so it can run outside a lock"""
+        height, width = gray.shape
+        scale = self.width / width
+        small = cv2.resize(gray, (self.width, max(1, round(height * scale))), interpolation=cv2.INTER_LINEAR)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def update(self, small: np.ndarray, full_width: int) -> bool:
+        """Feed the next frame from prepare(), returns True when a large blob has persisted long enough"""
+        mask = self.foreground(small)
+        if mask is None:
+            return False
+
+        _, _, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        # Label 0 is the background
+        min_area = self.min_area * (self.width / full_width) ** 2
+        blobs = centroids[1:][stats[1:, cv2.CC_STAT_AREA] >= min_area].astype(np.float32)
+
+        # Each blob inherits the age of the nearest blob from the previous frame, if it's close enough
+        ages = np.ones(len(blobs), dtype=np.int32)
+        if len(blobs) and len(self._blobs):
+            dist = np.linalg.norm(blobs[:, None, :] - self._blobs[None, :, :], axis=2)
+            nearest = dist.argmin(axis=1)
+            matched = dist[np.arange(len(blobs)), nearest] < self.match_radius * self.width
+            ages[matched] += self._ages[nearest[matched]]
+        self._blobs, self._ages = blobs, ages
+        return bool(len(ages)) and int(ages.max()) >= self.persistence
+
+
+class AlertBus:
+    """Shared alert cooldown: an alert only fires when the previous accepted alert is old enough"""
+
+    def __init__(self):
+        self.alerts = []
+        # Nothing fired yet, so the first alert is accepted whatever time it comes at, e.g. 0 s into a video
+        self._last_alert_time = float("-inf")
+
+    def accept(self, alert: str, current_time: float) -> bool:
+        cooldown = 1 if alert == "MOTION_DETECTED" else 2
+        if current_time - self._last_alert_time > cooldown:
+            self.alerts.append(alert)
+            self._last_alert_time = current_time
+            return True
+        return False
+
+
+@dataclass
+class FramePacket:
+    """A captured frame and the detection results that travel with it through the pipeline"""
+    frame_id: int
+    frame: np.ndarray
+    t_capture: float
+    t_dequeued: float = 0.0
+    t_processed: float = 0.0
+    alerts: list = field(default_factory=list)
+    lane_lines: Optional[list] = None
+    lane_offset: Optional[float] = None
+    timings: dict = field(default_factory=dict)
+
+
+@dataclass
+class CameraUpdate:
+    """What a camera worker process sends to the supervisor: a processed, display sized frame or a status change"""
+    camera: int
+    status: str
+    frame_id: int = 0
+    frame: Optional[np.ndarray] = None
+    alerts: list = field(default_factory=list)
+    lane_offset: Optional[float] = None
+    t_capture: float = 0.0
+    dropped: int = 0
+
+
 class SimpleAlertSystem:
-    def __init__(self, source: Union[int, str] = 0, draw_lanes: bool = True, detect_motion: bool = True):
+    def __init__(self, source: Union[int, str] = 0, draw_lanes: bool = True, detect_motion: bool = True,
+                 workers: int = 2, stats_interval: float = 5.0, process_scale: float = 1.0,
+                 roi: Optional[RegionOfInterest] = None, motion_model: str = "average", motion_persistence: int = 3):
         self.camera = None
         self.running = False
-        self.alerts = []
+        self.alert_bus = AlertBus()
+        self.alerts = self.alert_bus.alerts
         self.frame_count = 0
         self.source: Union[int, str] = source
         self.draw_lanes: bool = draw_lanes
         self.detect_motion: bool = detect_motion
+        self.workers: int = max(1, workers)
+        self.stats_interval: float = stats_interval
+        # Detectors run at their own resolution, independent of the camera and display resolution
+        self.process_scale: float = process_scale
+        self.roi: Optional[RegionOfInterest] = roi
+
+        # Pipeline: capture thread -> processing workers -> display/alert stage (main thread)
+        self.capture_queue = DropOldestQueue(maxsize=1)
+        self.result_queue = DropOldestQueue(maxsize=2)
+        self.stats = {name: StageStats(name) for name in ("capture", "queue", "process", "display", "end-to-end")}
+        self.motion_detector = MotionDetector(model=motion_model, persistence=motion_persistence)
+        self._motion_lock = threading.Lock()
+        self._motion_frame_id = 0
+        # Lane tracking is stateful, workers update it in frame order and skip frames older than the last update
+        self.lane_tracker = LaneTracker()
+        self._lane_lock = threading.Lock()
+        self._lane_frame_id = 0
+        self._last_displayed_id = 0
 
     def connect_camera(self, source: Union[int, str, None] = None):
         """Connect to camera (0 for webcam, or IP for phone camera)"""
@@ -63,114 +469,87 @@ class SimpleAlertSystem:
             print(f"❌ Camera connection failed: {e}")
             return False
 
-    def _compute_lane_lines(self, frame):
-        """Compute lane lines using Canny + Hough and return segmented lines."""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        edges = cv2.Canny(blurred, 50, 150)
-        lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=50,
-                                minLineLength=50, maxLineGap=10)
-        return lines
+    def make_features(self, frame) -> FrameFeatures:
+        return FrameFeatures(frame, self.process_scale, self.roi)
 
-    def detect_lane_departure(self, frame):
-        """Simple lane departure detection"""
+    def detect_lane_departure(self, frame, features: Optional[FrameFeatures] = None, frame_id: Optional[int] = None):
+        """Lane departure detection from the tracked lane lines, returns (alert, lane offset of this frame)"""
         try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-            # Apply Gaussian blur
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+            if features is None:
+                features = self.make_features(frame)
 
-            # Edge detection
-            edges = cv2.Canny(blurred, 50, 150)
+            height, width = frame.shape[:2]
+            center_x = width // 2
+            # Extract the features before taking the lock, it only guards the filter update. Hough lines are only
+            # needed to reacquire a lost line, one lost after this check is reacquired on the next frame
+            lane_lines = None if self.lane_tracker.acquired else features.lane_lines
+            edge_points = features.edge_points
+            with self._lane_lock:
+                if frame_id is None or frame_id > self._lane_frame_id:
+                    self.lane_tracker.update(edge_points, lane_lines, width, height)
+                    self._lane_frame_id = frame_id or self._lane_frame_id
+                left_x, right_x = self.lane_tracker.positions(width)
 
-            # Detect lines using Hough transform
-            lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=50,
-                                  minLineLength=50, maxLineGap=10)
+            # Smoothed lateral offset of the car from the lane center, positive when right of center
+            if left_x is None or right_x is None:
+                return None, None
+            lane_offset = center_x - (left_x + right_x) / 2
 
-            if lines is not None:
-                left_lines = []
-                right_lines = []
-
-                for line in lines:
-                    x1, y1, x2, y2 = line[0]
-                    slope = (y2 - y1) / (x2 - x1) if (x2 - x1) != 0 else 0
-
-                    # Classify lines as left or right based on slope
-                    if slope < -0.3:  # Left lane
-                        left_lines.append(line[0])
-                    elif slope > 0.3:  # Right lane
-                        right_lines.append(line[0])
-
-                # Check for lane departure
-                height, width = frame.shape[:2]
-                center_x = width // 2
-
-                # Simple alert logic
-                if len(left_lines) > 0 and len(right_lines) > 0:
-                    # Calculate average line positions
-                    left_avg = np.mean([line[0] + line[2] for line in left_lines]) / 2
-                    right_avg = np.mean([line[0] + line[2] for line in right_lines]) / 2
-
-                    # Check if car is drifting
-                    if center_x - left_avg < 50:  # Too close to left lane
-                        return "LEFT_LANE_DEPARTURE"
-                    elif right_avg - center_x < 50:  # Too close to right lane
-                        return "RIGHT_LANE_DEPARTURE"
-
-            return None
+            # Check if car is drifting
+            if center_x - left_x < 50:  # Too close to left lane
+                return "LEFT_LANE_DEPARTURE", lane_offset
+            elif right_x - center_x < 50:  # Too close to right lane
+                return "RIGHT_LANE_DEPARTURE", lane_offset
+            return None, lane_offset
         except Exception as e:
             print(f"Lane detection error: {e}")
-            return None
+            return None, None
+
+    def lane_polylines(self, frame) -> list:
+        """Tracked lane lines as point arrays for the overlay"""
+        height, width = frame.shape[:2]
+        y_top = self.roi.top if self.roi is not None else 0.5
+        with self._lane_lock:
+            return self.lane_tracker.polylines(width, height, y_top)
 
-    def draw_lane_overlay(self, frame):
+    def draw_lane_overlay(self, frame, lines=None):
         """Draw lane line overlays if detected."""
         if not self.draw_lanes:
             return
         try:
-            lines = self._compute_lane_lines(frame)
             if lines is None:
+                lines = self.lane_polylines(frame)
+            if len(lines) == 0:
                 return
             overlay = frame.copy()
-            for line in lines:
-                x1, y1, x2, y2 = line[0]
-                cv2.line(overlay, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.polylines(overlay, lines, False, (0, 255, 0), 2)
             # Blend overlay
             cv2.addWeighted(overlay, 0.4, frame, 0.6, 0, frame)
         except Exception:
             pass
 
-    def detect_objects(self, frame):
+    def detect_objects(self, frame, features: Optional[FrameFeatures] = None, frame_id: Optional[int] = None):
         """Simple object detection for basic alerts"""
         try:
-            # Convert to grayscale for motion detection
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-            # Simple motion detection using frame differencing
-            if not hasattr(self, 'prev_frame'):
-                self.prev_frame = gray
-                return None
-
-            # Calculate frame difference
-            diff = cv2.absdiff(self.prev_frame, gray)
-            thresh = cv2.threshold(diff, 30, 255, cv2.THRESH_BINARY)[1]
+            # Grayscale for motion detection
+            if features is None:
+                features = self.make_features(frame)
 
-            # Find contours
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-            # Check for significant motion (potential obstacles)
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                if area > 1000:  # Threshold for significant motion
+            # The background model is stateful, feed it in frame order. Only the model update needs the lock
+            small = self.motion_detector.prepare(features.gray)
+            with self._motion_lock:
+                if frame_id is not None and frame_id <= self._motion_frame_id:
+                    return None
+                self._motion_frame_id = frame_id or self._motion_frame_id
+                if self.motion_detector.update(small, frame.shape[1]):
                     return "MOTION_DETECTED"
-
-            self.prev_frame = gray
             return None
         except Exception as e:
             print(f"Object detection error: {e}")
             return None
 
-    def play_alert_sound(self, alert_type):
+    @staticmethod
+    def play_alert_sound(alert_type):
         """Play alert sound (simple beep)"""
         try:
             import winsound
@@ -189,7 +568,8 @@ class SimpleAlertSystem:
         except ImportError:
             print("🔊 BEEP! Alert detected")
 
-    def show_alert_info(self, frame, alert_type):
+    @staticmethod
+    def show_alert_info(frame, alert_type):
         """Display alert information on frame"""
         height, width = frame.shape[:2]
 
@@ -218,6 +598,119 @@ class SimpleAlertSystem:
         timestamp = datetime.now().strftime("%H:%M:%S")
         cv2.putText(frame, timestamp, (20, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
+    def process_frame(self, packet: FramePacket) -> FramePacket:
+        """Run the detectors on one frame, alerts are only candidates until the alert stage applies cooldowns"""
+        features = self.make_features(packet.frame)
+
+        # Lane tracking runs every frame, alert spam is handled by the cooldown in the alert stage
+        t_start = time.monotonic()
+        lane_alert, packet.lane_offset = self.detect_lane_departure(packet.frame, features, packet.frame_id)
+        if lane_alert:
+            packet.alerts.append(lane_alert)
+        packet.timings["lanes"] = time.monotonic() - t_start
+
+        if self.detect_motion:
+            t_start = time.monotonic()
+            object_alert = self.detect_objects(packet.frame, features, packet.frame_id)
+            if object_alert:
+                packet.alerts.append(object_alert)
+            packet.timings["motion"] = time.monotonic() - t_start
+
+        if self.draw_lanes:
+            packet.lane_lines = self.lane_polylines(packet.frame)
+        return packet
+
+    def _capture_loop(self):
+        """Keep reading the camera so the stream never backs up, only the freshest frame is queued"""
+        frame_id = 0
+        while self.running:
+            t_start = time.monotonic()
+            ret, frame = self.camera.read()
+            if not ret:
+                print("❌ Cannot read from camera")
+                self.running = False
+                break
+
+            frame_id += 1
+            t_capture = time.monotonic()
+            self.stats["capture"].record(t_capture - t_start)
+            self.capture_queue.put(FramePacket(frame_id, frame, t_capture))
+        self.capture_queue.close()
+
+    def _process_loop(self):
+        while self.running or not self.capture_queue.closed:
+            packet = self.capture_queue.get(timeout=0.1)
+            if packet is None:
+                if self.capture_queue.closed:
+                    break
+                continue
+
+            packet.t_dequeued = time.monotonic()
+            self.stats["queue"].record(packet.t_dequeued - packet.t_capture)
+            try:
+                self.process_frame(packet)
+            except Exception as e:
+                print(f"Processing error: {e}")
+                continue
+            packet.t_processed = time.monotonic()
+            self.stats["process"].record(packet.t_processed - packet.t_dequeued)
+            self.result_queue.put(packet)
+
+    def accept_alert(self, alert: str, current_time: float) -> bool:
+        """Apply the shared alert cooldown, returns True if the alert should fire"""
+        return self.alert_bus.accept(alert, current_time)
+
+    def _handle_alerts(self, packet: FramePacket, current_time: float):
+        """Alert stage: apply the shared cooldown, then beep, draw and log"""
+        for alert in packet.alerts:
+            if self.accept_alert(alert, current_time):
+                self.play_alert_sound(alert)
+                self.show_alert_info(packet.frame, alert)
+                print(f"🚨 {alert} detected!")
+
+    def _display(self, packet: FramePacket) -> bool:
+        """Draw and show one processed frame, returns False when the user quits"""
+        frame = packet.frame
+        self._handle_alerts(packet, time.monotonic())
+
+        # Optionally draw lanes on the frame
+        self.draw_lane_overlay(frame, packet.lane_lines)
+
+        # Show frame info
+        height, width = frame.shape[:2]
+        cv2.putText(frame, f"Frame: {self.frame_count}", (10, height - 50),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        cv2.putText(frame, f"Alerts: {len(self.alerts)}", (10, height - 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        if packet.lane_offset is not None:
+            cv2.putText(frame, f"Lane offset: {packet.lane_offset:+.0f}px", (10, height - 70),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+        # Display frame
+        # Resize for stability/perf on some Windows setups
+        try:
+            display = cv2.resize(frame, (960, int(960 * height / max(width, 1))))
+        except Exception:
+            display = frame
+        cv2.imshow('Simple Alert System', display)
+
+        # Handle key presses
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'):
+            return False
+        elif key == ord('s'):
+            # Save screenshot
+            filename = f"alert_screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+            cv2.imwrite(filename, frame)
+            print(f"📸 Screenshot saved: {filename}")
+        return True
+
+    def print_stats(self):
+        """Print per-stage latency and achieved FPS"""
+        print(f"📈 Pipeline stats (dropped: {self.capture_queue.dropped} captured, {self.result_queue.dropped} processed)")
+        for stats in self.stats.values():
+            print("   " + stats.summary())
+
     def run(self):
         """Main loop"""
         print("🚗 Starting Simple Alert System...")
@@ -229,7 +722,8 @@ class SimpleAlertSystem:
             return
 
         self.running = True
-        last_alert_time = 0
+        threads = [threading.Thread(target=self._capture_loop, name="capture", daemon=True)]
+        threads += [threading.Thread(target=self._process_loop, name=f"process{i}", daemon=True) for i in range(self.workers)]
 
         try:
             # Improve window handling on Windows
@@ -239,78 +733,397 @@ class SimpleAlertSystem:
                 pass
             cv2.namedWindow('Simple Alert System', cv2.WINDOW_NORMAL)
 
-            while self.running:
-                ret, frame = self.camera.read()
-                if not ret:
-                    print("❌ Cannot read from camera")
-                    break
+            for t in threads:
+                t.start()
 
-                self.frame_count += 1
-                current_time = time.time()
-
-                # Detect alerts every few frames to avoid spam
-                if self.frame_count % 10 == 0:
-                    # Lane departure detection
-                    lane_alert = self.detect_lane_departure(frame)
-                    if lane_alert and (current_time - last_alert_time) > 2:  # 2 second cooldown
-                        self.alerts.append(lane_alert)
-                        self.play_alert_sound(lane_alert)
-                        self.show_alert_info(frame, lane_alert)
-                        last_alert_time = current_time
-                        print(f"🚨 {lane_alert} detected!")
-
-                # Object detection
-                if self.detect_motion:
-                    object_alert = self.detect_objects(frame)
-                    if object_alert and (current_time - last_alert_time) > 1:  # 1 second cooldown
-                        self.alerts.append(object_alert)
-                        self.play_alert_sound(object_alert)
-                        self.show_alert_info(frame, object_alert)
-                        last_alert_time = current_time
-                        print(f"🚨 {object_alert} detected!")
-
-                # Optionally draw lanes on the frame
-                self.draw_lane_overlay(frame)
-
-                # Show frame info
-                height, width = frame.shape[:2]
-                cv2.putText(frame, f"Frame: {self.frame_count}", (10, height - 50),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                cv2.putText(frame, f"Alerts: {len(self.alerts)}", (10, height - 30),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-
-                # Display frame
-                # Resize for stability/perf on some Windows setups
-                try:
-                    display = cv2.resize(frame, (960, int(960 * height / max(width, 1))))
-                except Exception:
-                    display = frame
-                cv2.imshow('Simple Alert System', display)
+            last_stats_time = time.monotonic()
+            while self.running or any(t.is_alive() for t in threads[1:]):
+                packet = self.result_queue.get(timeout=0.1)
+                if packet is not None and packet.frame_id > self._last_displayed_id:
+                    # Workers can finish out of order, never show an older frame after a newer one
+                    self._last_displayed_id = packet.frame_id
+                    self.frame_count += 1
+                    t_display = time.monotonic()
+                    if not self._display(packet):
+                        break
+                    t_done = time.monotonic()
+                    self.stats["display"].record(t_done - t_display)
+                    self.stats["end-to-end"].record(t_done - packet.t_capture)
+                else:
+                    # Keep the window responsive while waiting for frames
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
 
-                # Handle key presses
-                key = cv2.waitKey(1) & 0xFF
-                if key == ord('q'):
-                    break
-                elif key == ord('s'):
-                    # Save screenshot
-                    filename = f"alert_screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-                    cv2.imwrite(filename, frame)
-                    print(f"📸 Screenshot saved: {filename}")
+                if self.stats_interval > 0 and time.monotonic() - last_stats_time > self.stats_interval:
+                    self.print_stats()
+                    last_stats_time = time.monotonic()
 
         except KeyboardInterrupt:
             print("\n⏹️ Stopping system...")
         finally:
+            self.running = False
+            for t in threads:
+                if t.is_alive():
+                    t.join(timeout=1.0)
             self.cleanup()
 
+    def cleanup_camera(self):
+        if self.camera:
+            self.camera.release()
+            self.camera = None
+
     def cleanup(self):
         """Clean up resources"""
         self.running = False
-        if self.camera:
-            self.camera.release()
+        self.cleanup_camera()
         cv2.destroyAllWindows()
+        if self.frame_count:
+            self.print_stats()
         print(f"📊 Total alerts detected: {len(self.alerts)}")
         print("👋 Simple Alert System stopped")
 
+def camera_worker(camera: int, source: str, options: dict, updates, stop_event, tile_width: int = 640,
+                  backoff: tuple[float, float] = (1.0, 30.0)):
+    """Capture and detection for one camera, in its own process so a stalled stream never blocks the others
+
+    A stream that can't be opened or stops delivering frames is reconnected with exponential backoff.
+    Video files are played once.
+    """
+    try:
+        cv2.setNumThreads(1)
+    except Exception:
+        pass
+    is_file = os.path.isfile(source)
+    delay = backoff[0]
+    dropped = 0
+    carried_alerts = []
+
+    def send(update: CameraUpdate, timeout: Optional[float] = None):
+        # Bounded queue: drop the oldest update so the supervisor always gets the freshest frame,
+        # but keep the alerts of dropped updates. Final updates wait for room instead.
+        nonlocal dropped, carried_alerts
+        update.alerts = carried_alerts + update.alerts
+        carried_alerts = []
+        if timeout is not None:
+            try:
+                updates.put(update, timeout=timeout)
+            except queue.Full:
+                pass
+            return
+        try:
+            updates.put_nowait(update)
+            return
+        except queue.Full:
+            pass
+        try:
+            update.alerts = updates.get_nowait().alerts + update.alerts
+        except queue.Empty:
+            pass
+        dropped += 1
+        update.dropped = dropped
+        try:
+            updates.put_nowait(update)
+        except queue.Full:
+            carried_alerts = update.alerts
+
+    def wait_backoff(reason: str):
+        nonlocal delay
+        print(f"⚠️ Camera {camera} ({source}): {reason}, reconnecting in {delay:.0f}s")
+        send(CameraUpdate(camera, f"{reason}, retry in {delay:.0f}s"))
+        stop_event.wait(delay)
+        delay = min(delay * 2, backoff[1])
+
+    system = None
+    frame_id = 0
+    try:
+        while not stop_event.is_set():
+            if system is None:
+                # Fresh detectors after a reconnect, the old background and lane state is stale
+                system = SimpleAlertSystem(source=source, stats_interval=0, **options)
+                send(CameraUpdate(camera, "connecting"))
+                if not system.connect_camera():
+                    system.cleanup_camera()
+                    system = None
+                    wait_backoff("cannot connect")
+                    continue
+
+            ret, frame = system.camera.read()
+            if not ret:
+                system.cleanup_camera()
+                system = None
+                if is_file:
+                    send(CameraUpdate(camera, "ended"), timeout=1.0)
+                    break
+                wait_backoff("stream lost")
+                continue
+            delay = backoff[0]
+
+            frame_id += 1
+            packet = system.process_frame(FramePacket(frame_id, frame, time.monotonic()))
+            system.draw_lane_overlay(frame, packet.lane_lines)
+            # Only ship a display sized frame across the process boundary
+            height, width = frame.shape[:2]
+            if width > tile_width:
+                frame = cv2.resize(frame, (tile_width, round(height * tile_width / width)), interpolation=cv2.INTER_LINEAR)
+            send(CameraUpdate(camera, "live", frame_id, frame, packet.alerts, packet.lane_offset, packet.t_capture, dropped))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if system is not None:
+            system.cleanup_camera()
+        if stop_event.is_set():
+            # The supervisor stopped reading, don't block exit on updates it will never get
+            updates.cancel_join_thread()
+
+
+class MultiCameraSupervisor:
+    """Runs capture and detection for each camera in a worker process, with one alert bus and one tiled display
+
+    The cooldown is shared by all cameras, so the driver never gets alerts faster than from a single camera.
+    """
+
+    WINDOW = 'Simple Alert System'
+
+    def __init__(self, sources: list[str], options: dict, stats_interval: float = 5.0,
+                 tile_size: tuple[int, int] = (640, 360), queue_size: int = 2, banner_time: float = 1.0):
+        self.sources = sources
+        self.options = options
+        self.stats_interval = stats_interval
+        self.tile_size = tile_size
+        self.queue_size = queue_size
+        self.banner_time = banner_time
+        self.alert_bus = AlertBus()
+        count = len(sources)
+        self.cols = math.ceil(math.sqrt(count))
+        self.rows = math.ceil(count / self.cols)
+        self.tiles: list[Optional[np.ndarray]] = [None] * count
+        self.status = ["starting"] * count
+        self.lane_offsets: list[Optional[float]] = [None] * count
+        self.dropped = [0] * count
+        # Latest accepted alert per camera and when it was accepted, shown as a banner on that tile
+        self.banners: list[Optional[tuple[str, float]]] = [None] * count
+        self.stats = [StageStats(f"camera {i} end-to-end") for i in range(count)]
+
+    def handle_update(self, update: CameraUpdate, current_time: float):
+        i = update.camera
+        self.status[i] = update.status
+        self.dropped[i] = max(self.dropped[i], update.dropped)
+        for alert in update.alerts:
+            if self.alert_bus.accept(alert, current_time):
+                SimpleAlertSystem.play_alert_sound(alert)
+                self.banners[i] = (alert, current_time)
+                print(f"🚨 Camera {i}: {alert} detected!")
+        if update.frame is not None:
+            self.tiles[i] = update.frame
+            self.lane_offsets[i] = update.lane_offset
+            self.stats[i].record(current_time - update.t_capture)
+
+    def compose(self, current_time: float) -> np.ndarray:
+        """Tile the latest frame of every camera into one image"""
+        tile_w, tile_h = self.tile_size
+        mosaic = np.zeros((self.rows * tile_h, self.cols * tile_w, 3), dtype=np.uint8)
+        for i, tile in enumerate(self.tiles):
+            y, x = (i // self.cols) * tile_h, (i % self.cols) * tile_w
+            view = mosaic[y:y + tile_h, x:x + tile_w]
+            if tile is not None:
+                view[:] = cv2.resize(tile, (tile_w, tile_h), interpolation=cv2.INTER_LINEAR)
+            banner = self.banners[i]
+            if banner is not None and current_time - banner[1] < self.banner_time:
+                SimpleAlertSystem.show_alert_info(view, banner[0])
+
+            cv2.putText(view, f"Cam {i}: {self.sources[i]}", (10, tile_h - 50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            info = f"{self.stats[i].fps():.1f} fps"
+            if self.lane_offsets[i] is not None:
+                info += f" | Lane offset: {self.lane_offsets[i]:+.0f}px"
+            if self.status[i] != "live":
+                info = self.status[i]
+            cv2.putText(view, info, (10, tile_h - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            cv2.rectangle(view, (0, 0), (tile_w - 1, tile_h - 1), (80, 80, 80), 1)
+        return mosaic
+
+    def print_stats(self):
+        print(f"📈 Camera stats (alerts: {len(self.alert_bus.alerts)})")
+        for i, stats in enumerate(self.stats):
+            print(f"   [{self.status[i]}] {stats.summary()}, dropped {self.dropped[i]}")
+
+    def run(self):
+        print(f"🚗 Starting Simple Alert System with {len(self.sources)} cameras...")
+        print("💡 Press 'q' to quit, 's' to save screenshot")
+
+        ctx = mp.get_context("spawn")
+        stop_event = ctx.Event()
+        queues = [ctx.Queue(maxsize=self.queue_size) for _ in self.sources]
+        processes = [ctx.Process(target=camera_worker, args=(i, source, self.options, queues[i], stop_event),
+                                 name=f"camera{i}", daemon=True) for i, source in enumerate(self.sources)]
+        for p in processes:
+            p.start()
+
+        try:
+            cv2.namedWindow(self.WINDOW, cv2.WINDOW_NORMAL)
+            last_stats_time = time.monotonic()
+            while True:
+                updated = False
+                for q in queues:
+                    while True:
+                        try:
+                            update = q.get_nowait()
+                        except queue.Empty:
+                            break
+                        self.handle_update(update, time.monotonic())
+                        updated = True
+
+                if updated:
+                    cv2.imshow(self.WINDOW, self.compose(time.monotonic()))
+                elif not any(p.is_alive() for p in processes):
+                    print("⏹️ All cameras stopped")
+                    break
+
+                # Sleep a little longer while no camera has anything new
+                key = cv2.waitKey(1 if updated else 10) & 0xFF
+                if key == ord('q'):
+                    break
+                elif key == ord('s'):
+                    filename = f"alert_screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+                    cv2.imwrite(filename, self.compose(time.monotonic()))
+                    print(f"📸 Screenshot saved: {filename}")
+
+                if self.stats_interval > 0 and time.monotonic() - last_stats_time > self.stats_interval:
+                    self.print_stats()
+                    last_stats_time = time.monotonic()
+
+        except KeyboardInterrupt:
+            print("\n⏹️ Stopping system...")
+        finally:
+            stop_event.set()
+            for p in processes:
+                p.join(timeout=2.0)
+                if p.is_alive():
+                    p.terminate()
+            cv2.destroyAllWindows()
+            self.print_stats()
+            print(f"📊 Total alerts detected: {len(self.alert_bus.alerts)}")
+            print("👋 Simple Alert System stopped")
+
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".ts", ".hevc", ".h264", ".mjpeg")
+
+
+def find_videos(source: str) -> list[str]:
+    """A video file, or all video files under a directory"""
+    if not os.path.isdir(source):
+        return [source]
+    return sorted(os.path.join(root, fn) for root, _, files in os.walk(source)
+                  for fn in files if fn.lower().endswith(VIDEO_EXTENSIONS))
+
+
+def evaluate_video(path: str, options: dict) -> dict:
+    """Run the detectors on every frame of a recorded video as fast as possible, without display or sleeps
+
+    Cooldowns run on video time so accepted alerts match what a live run would show.
+    """
+    system = SimpleAlertSystem(source=path, draw_lanes=False, stats_interval=0, **options)
+    camera = cv2.VideoCapture(path)
+    if not camera.isOpened():
+        return {"file": path, "error": "Cannot open video"}
+    fps = camera.get(cv2.CAP_PROP_FPS) or 30.0
+
+    events = []
+    timings = {"decode": []}
+    frame_id = 0
+    t_start = time.monotonic()
+    while True:
+        t_read = time.monotonic()
+        ret, frame = camera.read()
+        if not ret:
+            break
+        timings["decode"].append(time.monotonic() - t_read)
+
+        frame_id += 1
+        video_time = (frame_id - 1) / fps
+        packet = system.process_frame(FramePacket(frame_id, frame, t_read))
+        for name, duration in packet.timings.items():
+            timings.setdefault(name, []).append(duration)
+        timings.setdefault("total", []).append(time.monotonic() - t_read)
+
+        for alert in packet.alerts:
+            events.append({"file": path, "frame": frame_id, "time": round(video_time, 3), "alert": alert,
+                           "accepted": system.accept_alert(alert, video_time),
+                           "lane_offset": None if packet.lane_offset is None else round(packet.lane_offset, 1)})
+    camera.release()
+
+    return {"file": path, "frames": frame_id, "duration": frame_id / fps, "wall": time.monotonic() - t_start,
+            "events": events, "timings": timings}
+
+
+def _init_eval_worker():
+    # One process per file already uses every core
+    cv2.setNumThreads(1)
+
+
+def print_benchmark_report(results: list[dict], elapsed: Optional[float] = None):
+    """FPS, per-detector latency percentiles and alert rates over all evaluated videos"""
+    results = [r for r in results if "error" not in r]
+    frames = sum(r["frames"] for r in results)
+    duration = sum(r["duration"] for r in results)
+    wall = sum(r["wall"] for r in results)
+
+    print("=" * 60)
+    print("📊 BENCHMARK REPORT")
+    print("=" * 60)
+    print(f"   Files: {len(results)} | Frames: {frames} | Video: {duration / 60:.1f} min")
+    if frames == 0:
+        return
+    print(f"   Throughput: {frames / max(wall, 1e-6):.1f} fps per process ({duration / max(wall, 1e-6):.1f}x realtime)")
+    if elapsed is not None:
+        print(f"   Batch: {frames / max(elapsed, 1e-6):.1f} fps overall in {elapsed:.1f} s")
+
+    names = sorted({name for r in results for name in r["timings"]}, key=lambda n: (n == "total", n))
+    for name in names:
+        ms = np.concatenate([r["timings"].get(name, []) for r in results]) * 1000
+        if len(ms):
+            print(f"   {name:>8}: {np.percentile(ms, 50):7.2f} ms p50 | {np.percentile(ms, 99):7.2f} ms p99")
+
+    accepted = [e["alert"] for r in results for e in r["events"] if e["accepted"]]
+    minutes = max(duration / 60, 1e-6)
+    print(f"   Alerts: {len(accepted)} ({len(accepted) / minutes:.2f} per minute)")
+    for alert in sorted(set(accepted)):
+        count = accepted.count(alert)
+        print(f"   {alert:>22}: {count} ({count / minutes:.2f} per minute)")
+
+
+def run_headless(sources: list[str], options: dict, events_path: str, jobs: int = 1) -> list[dict]:
+    """Evaluate video files or directories of clips, writing alert events to JSONL"""
+    videos = [path for source in sources for path in find_videos(source)]
+    print(f"🎞️ Evaluating {len(videos)} video(s) with {jobs} job(s)...")
+
+    results = []
+    t_start = time.monotonic()
+    with open(events_path, "w") as events_file:
+        def _collect(result):
+            if "error" in result:
+                print(f"❌ {result['file']}: {result['error']}")
+            else:
+                fps = result['frames'] / max(result['wall'], 1e-6)
+                print(f"✅ {result['file']}: {result['frames']} frames, {len(result['events'])} events, {fps:.1f} fps")
+                for event in result["events"]:
+                    events_file.write(json.dumps(event) + "\n")
+            results.append(result)
+
+        if jobs > 1 and len(videos) > 1:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_eval_worker) as pool:
+                futures = [pool.submit(evaluate_video, video, options) for video in videos]
+                for future in as_completed(futures):
+                    _collect(future.result())
+        else:
+            for video in videos:
+                _collect(evaluate_video(video, options))
+
+    print(f"📝 Events written to {events_path}")
+    print_benchmark_report(results, time.monotonic() - t_start)
+    return results
+
+
 def main():
     """Main function"""
     print("=" * 60)
@@ -326,9 +1139,24 @@ def main():
 
     # CLI arguments
     parser = argparse.ArgumentParser(description="Simple Alert System (no self-driving)")
-    parser.add_argument("--source", default="0", help="Camera source: 0 for webcam or http://IP:PORT/video for IP Webcam")
+    parser.add_argument("--source", nargs="+", default=["0"],
+                        help="Camera sources: 0 for webcam or http://IP:PORT/video for IP Webcam, several for multi-camera")
     parser.add_argument("--no-lanes", action="store_true", help="Disable lane overlay drawing")
     parser.add_argument("--no-motion", action="store_true", help="Disable motion alerts")
+    parser.add_argument("--motion-model", choices=["average", "mog2"], default="average",
+                        help="Background model for motion alerts")
+    parser.add_argument("--motion-persistence", type=int, default=3,
+                        help="Frames a moving blob has to persist before it triggers a motion alert")
+    parser.add_argument("--process-scale", type=float, default=1.0,
+                        help="Resolution scale for the detectors, independent of the display (e.g. 0.33 for 1080p input)")
+    parser.add_argument("--roi", type=RegionOfInterest.parse, default=None, metavar="TOP,TOP_WIDTH,BOTTOM_WIDTH",
+                        help="Only look for lanes in this trapezoid, as fractions of the frame size (e.g. 0.55,0.3,1.0)")
+    parser.add_argument("--workers", type=int, default=2, help="Number of frame processing threads (single camera)")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="Seconds between pipeline stats reports, 0 to disable")
+    parser.add_argument("--headless", action="store_true",
+                        help="Evaluate a video file or directory of clips as fast as possible, without display")
+    parser.add_argument("--events", default="alert_events.jsonl", help="Headless mode: JSONL file for per-frame alert events")
+    parser.add_argument("--jobs", type=int, default=1, help="Headless mode: number of videos to process in parallel")
     args = parser.parse_args()
 
     # Check if OpenCV is available
@@ -341,11 +1169,30 @@ def main():
         print("✅ OpenCV installed. Please restart the script.")
         return
 
+    options = {
+        "detect_motion": not args.no_motion,
+        "process_scale": args.process_scale,
+        "roi": args.roi,
+        "motion_model": args.motion_model,
+        "motion_persistence": args.motion_persistence,
+    }
+    if args.headless:
+        run_headless(args.source, options, args.events, args.jobs)
+        return
+
+    if len(args.source) > 1:
+        supervisor = MultiCameraSupervisor(args.source, {**options, "draw_lanes": not args.no_lanes},
+                                           stats_interval=args.stats_interval)
+        supervisor.run()
+        return
+
     # Create and run the alert system
     system = SimpleAlertSystem(
-        source=args.source,
+        source=args.source[0],
         draw_lanes=not args.no_lanes,
-        detect_motion=not args.no_motion,
+        workers=args.workers,
+        stats_interval=args.stats_interval,
+        **options,
     )
     system.run()
 
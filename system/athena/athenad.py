@@ -43,6 +43,7 @@ from openpilot.system.hardware.hw import Paths
 
 ATHENA_HOST = os.getenv('ATHENA_HOST', 'wss://athena.comma.ai')
 HANDLER_THREADS = int(os.getenv('HANDLER_THREADS', "4"))
+ASYNC_CORE = os.getenv('ATHENAD_ASYNC') is not None
 LOCAL_PORT_WHITELIST = {22, }  # SSH
 
 LOG_ATTR_NAME = 'user.upload'
@@ -219,7 +220,7 @@ def jsonrpc_handler(end_event: threading.Event) -> None:
       send_queue.put_nowait(json.dumps({"error": str(e)}))
 
 
-def retry_upload(tid: int, end_event: threading.Event, increase_count: bool = True) -> None:
+def requeue_upload(tid: int, increase_count: bool = True) -> bool:
   item = cur_upload_items[tid]
   if item is not None and item.retry_count < MAX_RETRY_COUNT:
     new_retry_count = item.retry_count + 1 if increase_count else item.retry_count
@@ -234,7 +235,12 @@ def retry_upload(tid: int, end_event: threading.Event, increase_count: bool = Tr
     UploadQueueCache.cache(upload_queue)
 
     cur_upload_items[tid] = None
+    return True
+  return False
+
 
+def retry_upload(tid: int, end_event: threading.Event, increase_count: bool = True) -> None:
+  if requeue_upload(tid, increase_count):
     for _ in range(RETRY_DELAY):
       time.sleep(1)
       if end_event.is_set():
@@ -778,6 +784,19 @@ def ws_send(ws: WebSocket, end_event: threading.Event) -> None:
       end_event.set()
 
 
+def set_ws_keepalive(sock: socket.socket, onroad: bool) -> None:
+  # While not sending data, onroad, we can expect to time out in 7 + (7 * 2) = 21s
+  #                         offroad, we can expect to time out in 30 + (10 * 3) = 60s
+  # FIXME: TCP_USER_TIMEOUT is effectively 2x for some reason (32s), so it's mostly unused
+  if sys.platform == 'linux':
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, 16000 if onroad else 0)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 7 if onroad else 30)
+  elif sys.platform == 'darwin':
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, 7 if onroad else 30)
+  sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 7 if onroad else 10)
+  sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 2 if onroad else 3)
+
+
 def ws_manage(ws: WebSocket, end_event: threading.Event) -> None:
   params = Params()
   onroad_prev = None
@@ -789,16 +808,7 @@ def ws_manage(ws: WebSocket, end_event: threading.Event) -> None:
       onroad_prev = onroad
 
       if sock is not None:
-        # While not sending data, onroad, we can expect to time out in 7 + (7 * 2) = 21s
-        #                         offroad, we can expect to time out in 30 + (10 * 3) = 60s
-        # FIXME: TCP_USER_TIMEOUT is effectively 2x for some reason (32s), so it's mostly unused
-        if sys.platform == 'linux':
-          sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, 16000 if onroad else 0)
-          sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 7 if onroad else 30)
-        elif sys.platform == 'darwin':
-          sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, 7 if onroad else 30)
-        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 7 if onroad else 10)
-        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 2 if onroad else 3)
+        set_ws_keepalive(sock, onroad)
 
     if end_event.wait(5):
       break
@@ -809,6 +819,10 @@ def backoff(retries: int) -> int:
 
 
 def main(exit_event: threading.Event = None):
+  if ASYNC_CORE:
+    from openpilot.system.athena.athenad_async import main as async_main
+    return async_main(exit_event)
+
   try:
     set_core_affinity([0, 1, 2, 3])
   except Exception:
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+import asyncio
+import itertools
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import datetime
+from collections.abc import AsyncIterator, Coroutine
+
+import aiohttp
+from aiohttp import WSMsgType
+from jsonrpc import Dispatcher, JSONRPCResponseManager, dispatcher
+
+import cereal.messaging as messaging
+from openpilot.common.file_helpers import get_upload_stream
+from openpilot.common.params import Params
+from openpilot.common.realtime import set_core_affinity
+from openpilot.common.swaglog import cloudlog
+from openpilot.system.athena import athenad
+from openpilot.system.athena.athenad import (DEVICE_STATE_UPDATE_INTERVAL, MAX_AGE, RECONNECT_TIMEOUT_S, RETRY_DELAY, SSH_TOS, UPLOAD_TOS,
+                                             AbortTransferException, UploadItem, strip_zst_extension)
+
+UPLOAD_CONCURRENCY = int(os.getenv('ATHENA_UPLOAD_CONCURRENCY', "4"))
+UPLOAD_BANDWIDTH = int(os.getenv('ATHENA_UPLOAD_BANDWIDTH', "0"))  # bytes/s shared by all uploads, 0 is unlimited
+UPLOAD_CHUNK_SIZE = 64 * 1024
+PROXY_CHUNK_SIZE = 4096
+WS_RECV_TIMEOUT = 30  # seconds
+QUEUE_POLL_INTERVAL = 0.1  # seconds
+
+HIGH_PRIORITY = 0
+LOW_PRIORITY = 1
+
+
+def upload_socket_factory(addr_info) -> socket.socket:
+  family, type_, proto, _, _ = addr_info
+  sock = socket.socket(family=family, type=type_, proto=proto)
+  sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, UPLOAD_TOS)
+  return sock
+
+
+class BandwidthBudget:
+  """Token bucket shared by all uploads, rate in bytes/s"""
+  def __init__(self, rate: float, burst: float = None):
+    self.rate = rate
+    self.capacity = burst if burst is not None else rate
+    self.tokens = self.capacity
+    self.last = time.monotonic()
+
+  async def consume(self, n: int) -> None:
+    if self.rate <= 0:
+      return
+
+    now = time.monotonic()
+    self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+    self.last = now
+
+    # go into debt and sleep it off, so chunks larger than the bucket still get through
+    self.tokens -= n
+    if self.tokens < 0:
+      await asyncio.sleep(-self.tokens / self.rate)
+
+
+class AthenadCore:
+  """Runs one websocket connection: JSON-RPC dispatch, websocket I/O, uploads and
+  local proxies are tasks on the running event loop. Blocking RPC methods run on
+  a pool of HANDLER_THREADS threads."""
+  def __init__(self, ws: aiohttp.ClientWebSocketResponse, session: aiohttp.ClientSession, upload_session: aiohttp.ClientSession,
+               upload_concurrency: int = None, upload_bandwidth: int = None):
+    self.ws = ws
+    self.session = session
+    self.upload_session = upload_session
+    self.upload_concurrency = upload_concurrency if upload_concurrency is not None else UPLOAD_CONCURRENCY
+    self.bandwidth = BandwidthBudget(upload_bandwidth if upload_bandwidth is not None else UPLOAD_BANDWIDTH)
+
+    self.loop = asyncio.get_running_loop()
+    self.end_event = threading.Event()
+    self.executor = ThreadPoolExecutor(max_workers=athenad.HANDLER_THREADS, thread_name_prefix="athena_rpc")
+    self.sm = messaging.SubMaster(['deviceState'])
+
+    self.send_queue: asyncio.PriorityQueue[tuple[int, int, str]] = asyncio.PriorityQueue()
+    self.send_seq = itertools.count()
+    self.tasks: set[asyncio.Task] = set()
+
+    # athenad's methods, with startLocalProxy bound to this connection. A copy, so the module's dispatcher is left as
+    # is for the sync athenad and other connections
+    self.dispatcher = Dispatcher(dispatcher.method_map)
+    self.dispatcher["startLocalProxy"] = self.start_local_proxy
+
+  def spawn(self, coro: Coroutine) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    self.tasks.add(task)
+    task.add_done_callback(self.tasks.discard)
+    return task
+
+  def send(self, data: str, priority: int = HIGH_PRIORITY) -> None:
+    self.send_queue.put_nowait((priority, next(self.send_seq), data))
+
+  async def run(self, exit_event: threading.Event | None = None) -> None:
+    self.spawn(self.ws_recv())
+    self.spawn(self.ws_send())
+    self.spawn(self.ws_manage())
+    self.spawn(self.low_priority_bridge())
+    for tid in range(self.upload_concurrency):
+      self.spawn(self.upload_worker(tid))
+    threads = [asyncio.create_task(asyncio.to_thread(handler, self.end_event)) for handler in (athenad.log_handler, athenad.stat_handler)]
+
+    try:
+      while not self.end_event.is_set():
+        if exit_event is not None and exit_event.is_set():
+          break
+        await asyncio.sleep(0.1)
+    finally:
+      self.end_event.set()
+      tasks = list(self.tasks)
+      for task in tasks:
+        task.cancel()
+      await asyncio.gather(*tasks, *threads, return_exceptions=True)
+      self.executor.shutdown(wait=False)
+
+  # *** websocket ***
+
+  async def ws_recv(self) -> None:
+    last_ping = time.monotonic()
+    params = Params()
+    try:
+      while not self.end_event.is_set():
+        try:
+          msg = await self.ws.receive(timeout=WS_RECV_TIMEOUT)
+        except TimeoutError:
+          if time.monotonic() - last_ping > RECONNECT_TIMEOUT_S:
+            cloudlog.event("athenad.ws_recv.timeout", error=True)
+            break
+          continue
+
+        if msg.type in (WSMsgType.TEXT, WSMsgType.BINARY):
+          data = msg.data if msg.type == WSMsgType.TEXT else msg.data.decode("utf-8")
+          self.spawn(self.handle_rpc(data))
+        elif msg.type == WSMsgType.PING:
+          await self.ws.pong(msg.data)
+          last_ping = time.monotonic()
+          params.put("LastAthenaPingTime", int(last_ping * 1e9))
+        elif msg.type in (WSMsgType.CLOSE, WSMsgType.CLOSING, WSMsgType.CLOSED, WSMsgType.ERROR):
+          cloudlog.event("athenad.ws_recv.closed", msg_type=str(msg.type))
+          break
+    except asyncio.CancelledError:
+      raise
+    except Exception:
+      cloudlog.exception("athenad.ws_recv.exception")
+    self.end_event.set()
+
+  async def ws_send(self) -> None:
+    try:
+      while not self.end_event.is_set():
+        _, _, data = await self.send_queue.get()
+        # waits for the transport to drain, so a slow link backs up into send_queue
+        await self.ws.send_str(data)
+    except asyncio.CancelledError:
+      raise
+    except Exception:
+      cloudlog.exception("athenad.ws_send.exception")
+    self.end_event.set()
+
+  async def ws_manage(self) -> None:
+    params = Params()
+    onroad_prev = None
+    sock = self.ws.get_extra_info('socket')
+
+    while not self.end_event.is_set():
+      onroad = params.get_bool("IsOnroad")
+      if onroad != onroad_prev:
+        onroad_prev = onroad
+        if sock is not None:
+          athenad.set_ws_keepalive(sock, onroad)
+      await asyncio.sleep(5)
+
+  async def low_priority_bridge(self) -> None:
+    # log_handler and stat_handler still run in threads and use the thread-safe queue
+    while not self.end_event.is_set():
+      try:
+        self.send(athenad.low_priority_send_queue.get_nowait(), LOW_PRIORITY)
+      except queue.Empty:
+        await asyncio.sleep(QUEUE_POLL_INTERVAL)
+
+  # *** JSON-RPC ***
+
+  async def handle_rpc(self, data: str) -> None:
+    try:
+      if "method" in data:
+        cloudlog.event("athena.jsonrpc_handler.call_method", data=data)
+        response = await self.loop.run_in_executor(self.executor, JSONRPCResponseManager.handle, data, self.dispatcher)
+        self.send(response.json)
+      elif "id" in data and ("result" in data or "error" in data):
+        athenad.log_recv_queue.put_nowait(data)
+      else:
+        raise Exception("not a valid request or response")
+    except Exception as e:
+      cloudlog.exception("athena jsonrpc handler failed")
+      self.send(json.dumps({"error": str(e)}))
+
+  # *** uploads ***
+
+  async def upload_worker(self, tid: int) -> None:
+    while not self.end_event.is_set():
+      athenad.cur_upload_items[tid] = None
+      try:
+        item = athenad.upload_queue.get_nowait()
+      except queue.Empty:
+        await asyncio.sleep(QUEUE_POLL_INTERVAL)
+        continue
+
+      athenad.cur_upload_items[tid] = item = replace(item, current=True)
+      try:
+        await self.upload(tid, item)
+      except asyncio.CancelledError:
+        athenad.requeue_upload(tid, False)
+        raise
+      except Exception:
+        cloudlog.exception("athena.upload_handler.exception")
+
+  async def retry_upload(self, tid: int, increase_count: bool = True) -> None:
+    if athenad.requeue_upload(tid, increase_count):
+      for _ in range(RETRY_DELAY):
+        if self.end_event.is_set():
+          break
+        await asyncio.sleep(1)
+
+  def check_abort(self, item: UploadItem) -> None:
+    # Abort transfer if connection changed to metered after starting upload
+    # or if athenad is shutting down to re-connect the websocket
+    if not item.allow_cellular:
+      if (time.monotonic() - self.sm.recv_time['deviceState']) > DEVICE_STATE_UPDATE_INTERVAL:
+        self.sm.update(0)
+        if self.sm['deviceState'].networkMetered:
+          raise AbortTransferException
+
+    if self.end_event.is_set():
+      raise AbortTransferException
+
+  async def upload(self, tid: int, item: UploadItem) -> None:
+    if item.id in athenad.cancelled_uploads:
+      athenad.cancelled_uploads.remove(item.id)
+      return
+
+    # Remove item if too old
+    age = datetime.now() - datetime.fromtimestamp(item.created_at / 1000)
+    if age.total_seconds() > MAX_AGE:
+      cloudlog.event("athena.upload_handler.expired", item=item, error=True)
+      return
+
+    # Check if uploading over metered connection is allowed
+    self.sm.update(0)
+    metered = self.sm['deviceState'].networkMetered
+    network_type = self.sm['deviceState'].networkType.raw
+    if metered and (not item.allow_cellular):
+      await self.retry_upload(tid, False)
+      return
+
+    fn = item.path
+    try:
+      sz = os.path.getsize(fn)
+    except OSError:
+      sz = -1
+
+    cloudlog.event("athena.upload_handler.upload_start", fn=fn, sz=sz, network_type=network_type, metered=metered, retry_count=item.retry_count)
+
+    try:
+      status_code = await self.do_upload(tid, item)
+      if status_code not in (200, 201, 401, 403, 412):
+        cloudlog.event("athena.upload_handler.retry", status_code=status_code, fn=fn, sz=sz, network_type=network_type, metered=metered)
+        await self.retry_upload(tid)
+      else:
+        cloudlog.event("athena.upload_handler.success", fn=fn, sz=sz, network_type=network_type, metered=metered)
+
+      athenad.UploadQueueCache.cache(athenad.upload_queue)
+    except AbortTransferException:
+      cloudlog.event("athena.upload_handler.abort", fn=fn, sz=sz, network_type=network_type, metered=metered)
+      await self.retry_upload(tid, False)
+    except (aiohttp.ClientError, TimeoutError, OSError):
+      cloudlog.event("athena.upload_handler.timeout", fn=fn, sz=sz, network_type=network_type, metered=metered)
+      await self.retry_upload(tid)
+
+  async def do_upload(self, tid: int, item: UploadItem) -> int:
+    path = item.path
+    compress = False
+
+    # If file does not exist, but does exist without the .zst extension we will compress on the fly
+    if not os.path.exists(path) and os.path.exists(strip_zst_extension(path)):
+      path = strip_zst_extension(path)
+      compress = True
+
+    stream, content_length = await asyncio.to_thread(get_upload_stream, path, compress)
+    aborted: list[AbortTransferException] = []
+
+    async def body() -> AsyncIterator[bytes]:
+      sent = 0
+      while chunk := await asyncio.to_thread(stream.read, UPLOAD_CHUNK_SIZE):
+        try:
+          self.check_abort(item)
+        except AbortTransferException as e:
+          aborted.append(e)
+          raise
+        await self.bandwidth.consume(len(chunk))
+        yield chunk
+
+        sent += len(chunk)
+        athenad.cur_upload_items[tid] = replace(item, progress=sent / content_length if content_length else 1)
+
+    try:
+      async with self.upload_session.put(item.url, data=body(), headers={**item.headers, 'Content-Length': str(content_length)},
+                                         timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30)) as response:
+        await response.read()
+        return response.status
+    except aiohttp.ClientError:
+      if len(aborted):
+        raise aborted[0] from None
+      raise
+    finally:
+      stream.close()
+
+  # *** local proxy ***
+
+  def start_local_proxy(self, remote_ws_uri: str, local_port: int) -> dict[str, int]:
+    # called from an RPC handler thread
+    return asyncio.run_coroutine_threadsafe(self.start_local_proxy_async(remote_ws_uri, local_port), self.loop).result()
+
+  async def start_local_proxy_async(self, remote_ws_uri: str, local_port: int) -> dict[str, int]:
+    try:
+      # migration, can be removed once 0.9.8 is out for a while
+      if local_port == 8022:
+        local_port = 22
+
+      if local_port not in athenad.LOCAL_PORT_WHITELIST:
+        raise Exception("Requested local port not whitelisted")
+
+      cloudlog.debug("athena.startLocalProxy.starting")
+
+      dongle_id = Params().get("DongleId")
+      identity_token = athenad.Api(dongle_id).get_token()
+      ws = await self.session.ws_connect(remote_ws_uri, headers={"Cookie": "jwt=" + identity_token}, max_msg_size=0)
+
+      # Set TOS to keep connection responsive while under load.
+      sock = ws.get_extra_info('socket')
+      if sock is not None:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, SSH_TOS)
+
+      try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', local_port)
+      except Exception:
+        await ws.close()
+        raise
+
+      self.spawn(self.proxy(ws, reader, writer))
+      cloudlog.debug("athena.startLocalProxy.started")
+      return {"success": 1}
+    except Exception as e:
+      cloudlog.exception("athenad.startLocalProxy.exception")
+      raise e
+
+  async def proxy(self, ws: aiohttp.ClientWebSocketResponse, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # both directions await the other side draining, so a slow peer stops us reading from the fast one
+    async def ws_to_local() -> None:
+      async for msg in ws:
+        if msg.type == WSMsgType.BINARY:
+          writer.write(msg.data)
+        elif msg.type == WSMsgType.TEXT:
+          writer.write(msg.data.encode("utf-8"))
+        else:
+          break
+        await writer.drain()
+
+    async def local_to_ws() -> None:
+      while data := await reader.read(PROXY_CHUNK_SIZE):
+        await ws.send_bytes(data)
+
+    tasks = [asyncio.create_task(ws_to_local()), asyncio.create_task(local_to_ws())]
+    try:
+      done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+      for task in done:
+        if task.exception() is not None:
+          cloudlog.error(f"athenad.proxy.exception {task.exception()!r}")
+    finally:
+      for task in tasks:
+        task.cancel()
+      await asyncio.gather(*tasks, return_exceptions=True)
+
+      cloudlog.debug("athena.proxy closing sockets")
+      writer.close()
+      await ws.close()
+      cloudlog.debug("athena.proxy done closing sockets")
+
+
+async def main_async(exit_event: threading.Event = None) -> None:
+  params = Params()
+  dongle_id = params.get("DongleId")
+  athenad.UploadQueueCache.initialize(athenad.upload_queue)
+
+  ws_uri = athenad.ATHENA_HOST + "/ws/v2/" + dongle_id
+  api = athenad.Api(dongle_id)
+
+  async with aiohttp.ClientSession() as session, \
+             aiohttp.ClientSession(connector=aiohttp.TCPConnector(socket_factory=upload_socket_factory)) as upload_session:
+    conn_start = None
+    conn_retries = 0
+    while exit_event is None or not exit_event.is_set():
+      try:
+        if conn_start is None:
+          conn_start = time.monotonic()
+
+        cloudlog.event("athenad.main.connecting_ws", ws_uri=ws_uri, retries=conn_retries)
+        async with asyncio.timeout(30.):
+          ws = await session.ws_connect(ws_uri, headers={"Cookie": "jwt=" + api.get_token()}, autoping=False, max_msg_size=0)
+        cloudlog.event("athenad.main.connected_ws", ws_uri=ws_uri, retries=conn_retries,
+                       duration=time.monotonic() - conn_start)
+        conn_start = None
+
+        conn_retries = 0
+        athenad.cur_upload_items.clear()
+
+        try:
+          await AthenadCore(ws, session, upload_session).run(exit_event)
+        finally:
+          await ws.close()
+      except (aiohttp.ClientError, ConnectionError, TimeoutError):
+        conn_retries += 1
+        params.remove("LastAthenaPingTime")
+      except Exception:
+        cloudlog.exception("athenad.main.exception")
+
+        conn_retries += 1
+        params.remove("LastAthenaPingTime")
+
+      await asyncio.sleep(athenad.backoff(conn_retries))
+
+
+def main(exit_event: threading.Event = None):
+  try:
+    set_core_affinity([0, 1, 2, 3])
+  except Exception:
+    cloudlog.exception("failed to set core affinity")
+
+  try:
+    asyncio.run(main_async(exit_event))
+  except (KeyboardInterrupt, SystemExit):
+    pass
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+from openpilot.common.params import Params
+from openpilot.system.athena import athenad, athenad_async
+from openpilot.system.athena.tests.helpers import MockApi, MockAthenaServer
+
+
+async def _benchmark(files: int, size: int, concurrency: int, bandwidth: int) -> None:
+  log_root = tempfile.mkdtemp()
+  os.environ['LOG_ROOT'] = log_root
+  for i in range(files):
+    fn = os.path.join(log_root, f"2024-01-01--00-00-00--{i}", "rlog")
+    os.makedirs(os.path.dirname(fn))
+    with open(fn, 'wb') as f:
+      f.write(os.urandom(size))
+
+  server = MockAthenaServer()
+  await server.start()
+  Params().put("DongleId", server.dongle_id)
+  athenad.Api = MockApi
+  athenad.ATHENA_HOST = server.host
+  athenad_async.UPLOAD_CONCURRENCY = concurrency
+  athenad_async.UPLOAD_BANDWIDTH = bandwidth
+
+  exit_event = threading.Event()
+  task = asyncio.create_task(athenad_async.main_async(exit_event))
+  try:
+    upload_files = [{"fn": f"2024-01-01--00-00-00--{i}/rlog", "url": server.upload_url(f"{i}/rlog"), "headers": {}} for i in range(files)]
+    t1 = time.monotonic()
+    resp = await server.call("uploadFilesToUrls", [upload_files], timeout=60)
+    assert resp["result"]["enqueued"] == files, resp
+
+    # the websocket should stay responsive while the uploads run
+    rpc_times = []
+    while len(server.uploads) < files:
+      t = time.monotonic()
+      await server.call("echo", ["ping"], timeout=60)
+      rpc_times.append(time.monotonic() - t)
+      await asyncio.sleep(0.1)
+    dt = time.monotonic() - t1
+
+    rpc_times.sort()
+    print(f'[{files} files x {size / 1e3:.0f}kB, {concurrency} uploads, ' +
+          (f'{bandwidth / 1e6:.1f}MB/s budget]' if bandwidth else 'no budget]'))
+    print(f'  {dt:.2f}s total, {files / dt:.1f} files/s, {server.upload_bytes / dt / 1e6:.1f}MB/s')
+    print(f'  rpc latency during uploads: p50 {rpc_times[len(rpc_times) // 2] * 1e3:.1f}ms, max {rpc_times[-1] * 1e3:.1f}ms')
+  finally:
+    exit_event.set()
+    await task
+    await server.stop()
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Load test athenad_async against a local stand-in server")
+  parser.add_argument("--files", type=int, default=500)
+  parser.add_argument("--size", type=int, default=256 * 1024, help="bytes per file")
+  parser.add_argument("--concurrency", type=int, default=athenad_async.UPLOAD_CONCURRENCY)
+  parser.add_argument("--bandwidth", type=int, default=0, help="upload budget in bytes/s, 0 is unlimited")
+  args = parser.parse_args()
+
+  asyncio.run(_benchmark(args.files, args.size, args.concurrency, args.bandwidth))
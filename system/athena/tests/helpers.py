@@ -1,5 +1,11 @@
+import asyncio
 import http.server
+import itertools
+import json
 import socket
+import time
+
+from aiohttp import web
 
 
 class MockResponse:
@@ -68,3 +74,87 @@ class HTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     self.rfile.read(length)
     self.send_response(201, "Created")
     self.end_headers()
+
+
+class MockAthenaServer:
+  """Local stand-in for athena: a websocket endpoint to drive JSON-RPC calls and an
+  upload endpoint that accepts PUTs, for testing and load testing athenad_async."""
+  def __init__(self, dongle_id: str = "0000000000000000"):
+    self.dongle_id = dongle_id
+    self.ws: web.WebSocketResponse | None = None
+    self.connected = asyncio.Event()
+    self.responses: dict[int, asyncio.Future] = {}
+    self.rpc_id = itertools.count()
+
+    # upload path -> (bytes received, time finished)
+    self.uploads: dict[str, tuple[int, float]] = {}
+    self.upload_bytes = 0
+
+    # data received on the /proxy websocket, which sends proxy_payload on connect
+    self.proxy_payload = b"ping"
+    self.proxy_received: asyncio.Queue[bytes] = asyncio.Queue()
+
+    self.app = web.Application()
+    self.app.router.add_get(f"/ws/v2/{dongle_id}", self.handle_ws)
+    self.app.router.add_get("/proxy", self.handle_proxy)
+    self.app.router.add_put("/upload/{path:.*}", self.handle_upload)
+    self.runner = web.AppRunner(self.app)
+
+    self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    self.sock.bind(("127.0.0.1", 0))
+    self.port = self.sock.getsockname()[1]
+
+  async def start(self) -> None:
+    await self.runner.setup()
+    await web.SockSite(self.runner, self.sock).start()
+
+  async def stop(self) -> None:
+    if self.ws is not None:
+      await self.ws.close()
+    await self.runner.cleanup()
+
+  @property
+  def host(self) -> str:
+    return f"ws://127.0.0.1:{self.port}"
+
+  def upload_url(self, path: str) -> str:
+    return f"http://127.0.0.1:{self.port}/upload/{path}"
+
+  async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+    ws = web.WebSocketResponse(max_msg_size=0)
+    await ws.prepare(request)
+    self.ws = ws
+    self.connected.set()
+
+    async for msg in ws:
+      data = json.loads(msg.data)
+      fut = self.responses.pop(data.get("id"), None)
+      if fut is not None and not fut.done():
+        fut.set_result(data)
+    return ws
+
+  async def handle_proxy(self, request: web.Request) -> web.WebSocketResponse:
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    await ws.send_bytes(self.proxy_payload)
+    async for msg in ws:
+      self.proxy_received.put_nowait(msg.data)
+    return ws
+
+  async def handle_upload(self, request: web.Request) -> web.Response:
+    size = 0
+    async for chunk in request.content.iter_any():
+      size += len(chunk)
+    self.upload_bytes += size
+    self.uploads[request.match_info["path"]] = (size, time.monotonic())
+    return web.Response(status=201)
+
+  async def call(self, method: str, params=None, timeout: float = 5.) -> dict:
+    await asyncio.wait_for(self.connected.wait(), timeout)
+    assert self.ws is not None
+
+    rpc_id = next(self.rpc_id)
+    fut = asyncio.get_running_loop().create_future()
+    self.responses[rpc_id] = fut
+    await self.ws.send_str(json.dumps({"method": method, "params": params or {}, "jsonrpc": "2.0", "id": rpc_id}))
+    return await asyncio.wait_for(fut, timeout)
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+import pytest
+import pytest_asyncio
+from jsonrpc import dispatcher
+
+from openpilot.common.params import Params
+from openpilot.system.athena import athenad, athenad_async
+from openpilot.system.athena.athenad_async import BandwidthBudget
+from openpilot.system.athena.tests.helpers import EchoSocket, MockApi, MockAthenaServer
+from openpilot.system.hardware.hw import Paths
+
+SOCKET_PORT = 45455
+
+
+@pytest.mark.asyncio
+class TestAthenadAsync:
+  @pytest_asyncio.fixture(autouse=True)
+  async def server(self, mocker):
+    Params().put("DongleId", "0000000000000000")
+    mocker.patch.object(athenad, "Api", MockApi)
+    mocker.patch.object(athenad, "LOCAL_PORT_WHITELIST", {SOCKET_PORT})
+    mocker.patch.object(athenad, "upload_queue", athenad.queue.PriorityQueue())
+    athenad.cur_upload_items.clear()
+    athenad.cancelled_uploads.clear()
+
+    for i in os.listdir(Paths.log_root()):
+      p = os.path.join(Paths.log_root(), i)
+      if os.path.isdir(p):
+        shutil.rmtree(p)
+      else:
+        os.unlink(p)
+
+    self.server = MockAthenaServer()
+    await self.server.start()
+    mocker.patch.object(athenad, "ATHENA_HOST", self.server.host)
+
+    self.exit_event = threading.Event()
+    task = asyncio.create_task(athenad_async.main_async(self.exit_event))
+    try:
+      yield self.server
+    finally:
+      self.exit_event.set()
+      await asyncio.wait_for(task, 10)
+      await self.server.stop()
+
+  @staticmethod
+  def _create_file(file: str, data: bytes = b'') -> str:
+    fn = os.path.join(Paths.log_root(), file)
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    with open(fn, 'wb') as f:
+      f.write(data)
+    return fn
+
+  async def _wait_for_uploads(self, count: int, timeout: float = 10.) -> None:
+    async with asyncio.timeout(timeout):
+      while len(self.server.uploads) < count or len(athenad.listUploadQueue()):
+        await asyncio.sleep(0.05)
+
+  async def test_echo(self):
+    resp = await self.server.call("echo", ["hello"])
+    assert resp == {'result': 'hello', 'id': 0, 'jsonrpc': '2.0'}
+
+  async def test_invalid_method(self):
+    resp = await self.server.call("doesNotExist")
+    assert resp["error"]["code"] == -32601
+
+  async def test_upload_files(self):
+    files = []
+    for i in range(50):
+      self._create_file(f"2024-01-01--00-00-00--{i}/qlog", os.urandom(16 * 1024))
+      files.append({"fn": f"2024-01-01--00-00-00--{i}/qlog", "url": self.server.upload_url(f"{i}/qlog"), "headers": {}})
+
+    resp = await self.server.call("uploadFilesToUrls", [files])
+    assert resp["result"]["enqueued"] == len(files)
+
+    await self._wait_for_uploads(len(files))
+    assert all(size == 16 * 1024 for size, _ in self.server.uploads.values())
+
+  async def test_upload_compressed(self):
+    self._create_file("2024-01-01--00-00-00--0/qlog", b"a" * 1024 * 1024)
+    files = [{"fn": "2024-01-01--00-00-00--0/qlog.zst", "url": self.server.upload_url("qlog.zst"), "headers": {}}]
+
+    resp = await self.server.call("uploadFilesToUrls", [files])
+    assert resp["result"]["enqueued"] == 1
+
+    await self._wait_for_uploads(1)
+    assert 0 < self.server.uploads["qlog.zst"][0] < 1024 * 1024
+
+  async def test_dispatcher_unchanged(self):
+    # the connection's startLocalProxy is only in its own dispatcher, not in athenad's
+    resp = await self.server.call("echo", ["hello"])
+    assert resp["result"] == "hello"
+    entry = dispatcher.method_map.get("startLocalProxy")
+    assert not isinstance(getattr(entry, "__self__", None), athenad_async.AthenadCore)
+
+  async def test_start_local_proxy(self):
+    echo_socket = EchoSocket(SOCKET_PORT)
+    socket_thread = threading.Thread(target=echo_socket.run)
+    socket_thread.start()
+    try:
+      resp = await self.server.call("startLocalProxy", {"remote_ws_uri": self.server.host + "/proxy", "local_port": SOCKET_PORT})
+      assert resp["result"] == {"success": 1}
+      assert await asyncio.wait_for(self.server.proxy_received.get(), 5) == b"ping"
+    finally:
+      self.exit_event.set()
+      await asyncio.to_thread(socket_thread.join)
+
+
+@pytest.mark.asyncio
+async def test_bandwidth_budget():
+  budget = BandwidthBudget(1e6)
+  start = time.monotonic()
+  for _ in range(20):
+    await budget.consume(100_000)
+  # first 1 MB is the burst, the second one is rate limited
+  assert 0.9 < time.monotonic() - start < 1.5
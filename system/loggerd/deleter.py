@@ -2,11 +2,14 @@
 import os
 import shutil
 import threading
+from collections.abc import Callable
+from dataclasses import dataclass
 from openpilot.system.hardware.hw import Paths
 from openpilot.common.swaglog import cloudlog
-from openpilot.system.loggerd.config import get_available_bytes, get_available_percent
+from openpilot.system.loggerd.config import get_available_bytes, get_available_percent, get_total_bytes
 from openpilot.system.loggerd.uploader import listdir_by_creation
 from openpilot.system.loggerd.xattr_cache import getxattr
+from openpilot.system.statsd import statlog
 
 MIN_BYTES = 5 * 1024 * 1024 * 1024
 MIN_PERCENT = 10
@@ -22,10 +25,10 @@ def has_preserve_xattr(d: str) -> bool:
   return getxattr(os.path.join(Paths.log_root(), d), PRESERVE_ATTR_NAME) == PRESERVE_ATTR_VALUE
 
 
-def get_preserved_segments(dirs_by_creation: list[str]) -> set[str]:
+def get_preserved_segments(dirs_by_creation: list[str], is_preserved: Callable[[str], bool] = has_preserve_xattr) -> set[str]:
   # skip deleting most recent N preserved segments (and their prior segment)
   preserved = set()
-  for n, d in enumerate(filter(has_preserve_xattr, reversed(dirs_by_creation))):
+  for n, d in enumerate(filter(is_preserved, reversed(dirs_by_creation))):
     if n == PRESERVE_COUNT:
       break
     date_str, _, seg_str = d.rpartition("--")
@@ -45,28 +48,128 @@ def get_preserved_segments(dirs_by_creation: list[str]) -> set[str]:
   return preserved
 
 
+def get_bytes_to_free() -> int:
+  available_bytes = get_available_bytes(default=MIN_BYTES + 1)
+  total_bytes = get_total_bytes(default=0)
+  return int(max(MIN_BYTES - available_bytes, total_bytes * MIN_PERCENT / 100 - available_bytes, 0))
+
+
+@dataclass
+class SegmentInfo:
+  ctime_ns: int
+  size: int
+  locked: bool
+  preserve: bool
+
+
+class SegmentIndex:
+  """Sizes, lock state and preserve flags of the log directories.
+
+  Entries are only refreshed when a directory's ctime changes (files added
+  or removed, lock released, xattr set), and the directory list is only
+  re-read when the log root changes, which happens on segment rotation."""
+  def __init__(self, root: str):
+    self.root = root
+    self.root_ctime_ns: int | None = None
+    self.dirs_by_creation: list[str] = []
+    self.segments: dict[str, SegmentInfo] = {}
+
+  def _scan_segment(self, path: str, ctime_ns: int) -> SegmentInfo:
+    size = 0
+    locked = False
+    try:
+      with os.scandir(path) as it:
+        for entry in it:
+          locked |= entry.name.endswith(".lock")
+          try:
+            size += entry.stat(follow_symlinks=False).st_size
+          except OSError:
+            pass
+    except OSError:
+      locked = True
+
+    try:
+      preserve = getxattr(path, PRESERVE_ATTR_NAME, cached=False) == PRESERVE_ATTR_VALUE
+    except OSError:
+      preserve = False
+    return SegmentInfo(ctime_ns, size, locked, preserve)
+
+  def update(self) -> None:
+    try:
+      root_ctime_ns = os.stat(self.root).st_ctime_ns
+    except OSError:
+      self.root_ctime_ns = None
+      self.dirs_by_creation = []
+      self.segments.clear()
+      return
+
+    if root_ctime_ns != self.root_ctime_ns:
+      self.root_ctime_ns = root_ctime_ns
+      self.dirs_by_creation = listdir_by_creation(self.root)
+      for d in set(self.segments) - set(self.dirs_by_creation):
+        del self.segments[d]
+
+    for d in self.dirs_by_creation:
+      path = os.path.join(self.root, d)
+      try:
+        ctime_ns = os.stat(path).st_ctime_ns
+      except OSError:
+        self.segments.pop(d, None)
+        continue
+
+      info = self.segments.get(d)
+      if info is None or info.ctime_ns != ctime_ns:
+        self.segments[d] = self._scan_segment(path, ctime_ns)
+
+  def plan_deletion(self, bytes_to_free: int) -> list[str]:
+    """Returns the directories to delete, in order, to free at least bytes_to_free"""
+    dirs = [d for d in self.dirs_by_creation if d in self.segments]
+    preserved_dirs = get_preserved_segments(dirs, lambda d: self.segments[d].preserve)
+
+    plan = []
+    planned_bytes = 0
+    for d in sorted(dirs, key=lambda d: (d in DELETE_LAST, d in preserved_dirs)):
+      if self.segments[d].locked:
+        continue
+
+      plan.append(d)
+      planned_bytes += self.segments[d].size
+      if planned_bytes >= bytes_to_free:
+        break
+    return plan
+
+
 def deleter_thread(exit_event: threading.Event):
+  index = SegmentIndex(Paths.log_root())
   while not exit_event.is_set():
     out_of_bytes = get_available_bytes(default=MIN_BYTES + 1) < MIN_BYTES
     out_of_percent = get_available_percent(default=MIN_PERCENT + 1) < MIN_PERCENT
 
     if out_of_percent or out_of_bytes:
-      dirs = listdir_by_creation(Paths.log_root())
-      preserved_dirs = get_preserved_segments(dirs)
-
-      # remove the earliest directory we can
-      for delete_dir in sorted(dirs, key=lambda d: (d in DELETE_LAST, d in preserved_dirs)):
+      index.update()
+      bytes_to_free = get_bytes_to_free()
+      plan = index.plan_deletion(bytes_to_free)
+      if not len(plan):
+        exit_event.wait(.1)
+        continue
+
+      planned_bytes = sum(index.segments[d].size for d in plan)
+      cloudlog.event("deleter_plan", bytes_to_free=bytes_to_free, planned_bytes=planned_bytes, dirs=plan)
+
+      reclaimed_bytes = 0
+      for delete_dir in plan:
         delete_path = os.path.join(Paths.log_root(), delete_dir)
-
-        if any(name.endswith(".lock") for name in os.listdir(delete_path)):
-          continue
-
         try:
           cloudlog.info(f"deleting {delete_path}")
           shutil.rmtree(delete_path)
-          break
+          reclaimed_bytes += index.segments.pop(delete_dir).size
         except OSError:
           cloudlog.exception(f"issue deleting {delete_path}")
+
+      statlog.gauge("deleter_bytes_to_free", bytes_to_free)
+      statlog.gauge("deleter_planned_bytes", planned_bytes)
+      statlog.gauge("deleter_reclaimed_bytes", reclaimed_bytes)
+      statlog.gauge("deleter_deleted_dirs", len(plan))
       exit_event.wait(.1)
     else:
       exit_event.wait(30)
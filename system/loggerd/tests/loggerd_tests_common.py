@@ -70,6 +70,7 @@ class UploaderTestCase:
     uploader.fake_upload = True
     uploader.force_wifi = True
     uploader.allow_sleep = False
+    uploader.concurrent_upload = False
     self.seg_num = random.randint(1, 300)
     self.seg_format = "00000004--0ac3964c96--{}"
     self.seg_format2 = "00000005--4c4e99b08b--{}"
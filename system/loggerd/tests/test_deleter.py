@@ -6,6 +6,7 @@ from collections.abc import Sequence
 
 import openpilot.system.loggerd.deleter as deleter
 from openpilot.common.timeout import Timeout, TimeoutException
+from openpilot.system.hardware.hw import Paths
 from openpilot.system.loggerd.tests.loggerd_tests_common import UploaderTestCase
 
 Stats = namedtuple("Stats", ['f_bavail', 'f_blocks', 'f_frsize'])
@@ -90,6 +91,24 @@ class TestDeleter(UploaderTestCase):
       self.make_file_with_data("crash", self.seg_format2[:-4]),
     ])
 
+  def test_plan_deletion(self):
+    f_paths = [self.make_file_with_data(self.seg_format.format(i), self.f_type, 1) for i in range(3)]
+    f_paths.append(self.make_file_with_data("boot", self.seg_format[:-4], 1))
+
+    index = deleter.SegmentIndex(Paths.log_root())
+    index.update()
+    assert all(index.segments[f.parent.name].size == 1024 * 1024 for f in f_paths)
+
+    # delete just enough, oldest first
+    assert index.plan_deletion(int(1.5 * 1024 * 1024)) == [f.parent.name for f in f_paths[:2]]
+    assert index.plan_deletion(10 * 1024 * 1024) == [f.parent.name for f in f_paths]
+
+    # picks up new segments and lock files
+    f_paths.append(self.make_file_with_data(self.seg_format2.format(0), self.f_type, 1, lock=True))
+    self.make_file_with_data(self.seg_format.format(0), "qlog", 1, lock=True)
+    index.update()
+    assert index.plan_deletion(10 * 1024 * 1024) == [f.parent.name for f in f_paths[1:4]]
+
   def test_no_delete_when_available_space(self):
     f_path = self.make_file_with_data(self.seg_dir, self.f_type)
 
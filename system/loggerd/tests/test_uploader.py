@@ -7,6 +7,7 @@ from pathlib import Path
 from openpilot.system.hardware.hw import Paths
 
 from openpilot.common.swaglog import cloudlog
+import openpilot.system.loggerd.uploader as uploader
 from openpilot.system.loggerd.uploader import main, UPLOAD_ATTR_NAME, UPLOAD_ATTR_VALUE
 
 from openpilot.system.loggerd.tests.loggerd_tests_common import UploaderTestCase
@@ -148,6 +149,29 @@ class TestUploader(UploaderTestCase):
 
     assert log_handler.upload_order == exp_order, "Files uploaded in wrong order"
 
+  def test_upload_concurrent(self):
+    uploader.concurrent_upload = True
+    seg_nums = [0, 1, 2, 10, 20]
+    for i in seg_nums:
+      self.seg_dir = self.seg_format.format(i)
+      self.gen_files()
+
+    exp_order = self.gen_order(seg_nums, [])
+
+    self.start_thread()
+    # allow enough time that files could upload twice if there is a bug in the logic
+    time.sleep(1)
+    self.join_thread()
+
+    assert len(log_handler.upload_ignored) == 0, "Some files were ignored"
+    assert not len(log_handler.upload_order) < len(exp_order), "Some files failed to upload"
+    assert not len(log_handler.upload_order) > len(exp_order), "Some files were uploaded twice"
+    for f_path in exp_order:
+      assert os.getxattr((Path(Paths.log_root()) / f_path).with_suffix(""), UPLOAD_ATTR_NAME) == UPLOAD_ATTR_VALUE, "All files not uploaded"
+
+    # uploads finish out of order, but boot logs are still started first
+    assert sorted(log_handler.upload_order) == sorted(exp_order), "Wrong files uploaded"
+
   def test_no_upload_with_lock_file(self):
     self.start_thread()
 
@@ -163,6 +187,35 @@ class TestUploader(UploaderTestCase):
       uploaded = UPLOAD_ATTR_NAME in os.listxattr(fn) and os.getxattr(fn, UPLOAD_ATTR_NAME) == UPLOAD_ATTR_VALUE
       assert not uploaded, "File upload when locked"
 
+  def test_index_lock_removed_in_same_mtime(self):
+    self.gen_files(lock=True, boot=False)
+    seg_path = Path(Paths.log_root()) / self.seg_dir
+    index = uploader.UploadIndex(Paths.log_root(), {})
+    assert list(index.update()) == []
+
+    # the locks go away within the same mtime tick as the listing
+    st = os.stat(seg_path)
+    for lock_path in seg_path.glob("*.lock"):
+      lock_path.unlink()
+    os.utime(seg_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert sorted(name for _, name, _ in index.update()) == sorted(os.listdir(seg_path))
+
+  def test_index_caches_settled_dirs(self):
+    self.gen_files(boot=False)
+    seg_path = Path(Paths.log_root()) / self.seg_dir
+    old_ns = time.time_ns() - 2 * uploader.MTIME_SETTLE_NS
+    os.utime(seg_path, ns=(old_ns, old_ns))
+    index = uploader.UploadIndex(Paths.log_root(), {})
+    names = sorted(name for _, name, _ in index.update())
+    assert len(names) == 4
+
+    # a settled directory isn't listed again until its mtime changes
+    self.make_file_with_data(self.seg_dir, "qcamera.ts")
+    os.utime(seg_path, ns=(old_ns, old_ns))
+    assert sorted(name for _, name, _ in index.update()) == names
+    os.utime(seg_path)
+    assert sorted(name for _, name, _ in index.update()) == sorted([*names, "qcamera.ts"])
+
   def test_no_upload_with_xattr(self):
     self.gen_files(lock=False, xattr=UPLOAD_ATTR_VALUE)
 
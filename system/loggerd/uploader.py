@@ -8,6 +8,8 @@ import time
 import traceback
 import datetime
 from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 
 from cereal import log
 import cereal.messaging as messaging
@@ -29,9 +31,19 @@ MAX_UPLOAD_SIZES = {
   "qcam": 5*1e6,
 }
 
+# max number of parallel uploads per network type in concurrent mode, defaults to 1
+MAX_CONCURRENT_UPLOADS = {
+  NetworkType.wifi: 4,
+  NetworkType.ethernet: 4,
+}
+
 allow_sleep = bool(os.getenv("UPLOADER_SLEEP", "1"))
+
+# A directory modified this recently may still change within the same mtime tick, so it's listed again on the next step
+MTIME_SETTLE_NS = 2_000_000_000
 force_wifi = os.getenv("FORCEWIFI") is not None
 fake_upload = os.getenv("FAKEUPLOAD") is not None
+concurrent_upload = os.getenv("UPLOADER_CONCURRENT") is not None
 
 
 class FakeRequest:
@@ -73,6 +85,101 @@ def clear_locks(root: str) -> None:
       cloudlog.exception("clear_locks failed")
 
 
+def settled_mtime_ns(mtime_ns: int) -> int:
+  """mtime to cache a listing under, -1 never matches so a directory that isn't settled yet is listed again"""
+  return -1 if time.time_ns() - mtime_ns < MTIME_SETTLE_NS else mtime_ns
+
+
+@dataclass
+class LogDirEntry:
+  mtime_ns: int
+  locked: bool
+  # name, ctime of files not yet uploaded, in upload priority order
+  pending: list[tuple[str, float]] = field(default_factory=list)
+
+
+class UploadIndex:
+  """Incrementally maintained view of the files waiting to be uploaded.
+
+  Log directories are only re-listed and their files re-stat'ed when the
+  directory mtime changes, so an idle or backlogged log root costs one
+  stat per directory per step instead of a full rescan. Directories
+  modified within MTIME_SETTLE_NS are re-listed every step, a change in
+  the same mtime tick as the last listing wouldn't change the mtime."""
+  def __init__(self, root: str, immediate_priority: dict[str, int]):
+    self.root = root
+    self.immediate_priority = immediate_priority
+    self.root_mtime_ns: int | None = None
+    self.logdirs: list[str] = []
+    self.dirs: dict[str, LogDirEntry] = {}
+
+  def _update_logdirs(self) -> None:
+    try:
+      mtime_ns = os.stat(self.root).st_mtime_ns
+    except OSError:
+      self.root_mtime_ns = None
+      self.logdirs = []
+      self.dirs.clear()
+      return
+
+    if mtime_ns != self.root_mtime_ns:
+      self.root_mtime_ns = settled_mtime_ns(mtime_ns)
+      self.logdirs = listdir_by_creation(self.root)
+      for logdir in set(self.dirs) - set(self.logdirs):
+        del self.dirs[logdir]
+
+  def _scan_logdir(self, logdir: str, path: str, mtime_ns: int) -> LogDirEntry:
+    try:
+      names = os.listdir(path)
+    except OSError:
+      return LogDirEntry(mtime_ns, True)
+
+    if any(name.endswith(".lock") for name in names):
+      return LogDirEntry(mtime_ns, True)
+
+    entry = LogDirEntry(mtime_ns, False)
+    for name in sorted(names, key=lambda n: self.immediate_priority.get(n, 1000)):
+      fn = os.path.join(path, name)
+      # skip files already uploaded
+      try:
+        ctime = os.path.getctime(fn)
+        is_uploaded = getxattr(fn, UPLOAD_ATTR_NAME) == UPLOAD_ATTR_VALUE
+      except OSError:
+        cloudlog.event("uploader_getxattr_failed", key=os.path.join(logdir, name), fn=fn)
+        # deleter could have deleted, so skip
+        continue
+      if not is_uploaded:
+        entry.pending.append((name, ctime))
+    return entry
+
+  def update(self) -> Iterator[tuple[str, str, float]]:
+    """Yields logdir, name, ctime of every file waiting to be uploaded, oldest logdir first"""
+    self._update_logdirs()
+
+    for logdir in self.logdirs:
+      path = os.path.join(self.root, logdir)
+      try:
+        mtime_ns = os.stat(path).st_mtime_ns
+      except OSError:
+        continue
+
+      entry = self.dirs.get(logdir)
+      if entry is None or entry.mtime_ns != mtime_ns:
+        entry = self._scan_logdir(logdir, path, settled_mtime_ns(mtime_ns))
+        self.dirs[logdir] = entry
+
+      if entry.locked:
+        continue
+
+      for name, ctime in entry.pending:
+        yield logdir, name, ctime
+
+  def mark_uploaded(self, logdir: str, name: str) -> None:
+    entry = self.dirs.get(logdir)
+    if entry is not None:
+      entry.pending = [(n, c) for n, c in entry.pending if n != name]
+
+
 class Uploader:
   def __init__(self, dongle_id: str, root: str):
     self.dongle_id = dongle_id
@@ -87,57 +194,43 @@ class Uploader:
     self.immediate_folders = ["crash/", "boot/"]
     self.immediate_priority = {"qlog": 0, "qlog.zst": 0, "qcamera.ts": 1}
 
+    self.index = UploadIndex(root, self.immediate_priority)
+
+    # concurrent mode: fn -> future of the upload in progress
+    self.executor: ThreadPoolExecutor | None = None
+    self.in_flight: dict[str, Future] = {}
+
   def list_upload_files(self, metered: bool) -> Iterator[tuple[str, str, str]]:
     r = self.params.get("AthenadRecentlyViewedRoutes")
     requested_routes = [] if r is None else [route for route in r.split(",") if route]
 
-    for logdir in listdir_by_creation(self.root):
-      path = os.path.join(self.root, logdir)
-      try:
-        names = os.listdir(path)
-      except OSError:
+    for logdir, name, ctime in self.index.update():
+      key = os.path.join(logdir, name)
+      fn = os.path.join(self.root, logdir, name)
+      if fn in self.in_flight:
         continue
 
-      if any(name.endswith(".lock") for name in names):
-        continue
-
-      for name in sorted(names, key=lambda n: self.immediate_priority.get(n, 1000)):
-        key = os.path.join(logdir, name)
-        fn = os.path.join(path, name)
-        # skip files already uploaded
-        try:
-          ctime = os.path.getctime(fn)
-          is_uploaded = getxattr(fn, UPLOAD_ATTR_NAME) == UPLOAD_ATTR_VALUE
-        except OSError:
-          cloudlog.event("uploader_getxattr_failed", key=key, fn=fn)
-          # deleter could have deleted, so skip
+      # limit uploading on metered connections
+      if metered:
+        dt = datetime.timedelta(hours=12)
+        if logdir in self.immediate_folders and (datetime.datetime.now() - datetime.datetime.fromtimestamp(ctime)) < dt:
           continue
-        if is_uploaded:
-          continue
-
-        # limit uploading on metered connections
-        if metered:
-          dt = datetime.timedelta(hours=12)
-          if logdir in self.immediate_folders and (datetime.datetime.now() - datetime.datetime.fromtimestamp(ctime)) < dt:
-            continue
 
-          if name == "qcamera.ts" and not any(logdir.startswith(r.split('|')[-1]) for r in requested_routes):
-            continue
+        if name == "qcamera.ts" and not any(logdir.startswith(r.split('|')[-1]) for r in requested_routes):
+          continue
 
-        yield name, key, fn
+      yield name, key, fn
 
-  def next_file_to_upload(self, metered: bool) -> tuple[str, str, str] | None:
+  def next_files_to_upload(self, metered: bool, count: int) -> list[tuple[str, str, str]]:
     upload_files = list(self.list_upload_files(metered))
 
-    for name, key, fn in upload_files:
-      if any(f in fn for f in self.immediate_folders):
-        return name, key, fn
-
-    for name, key, fn in upload_files:
-      if name in self.immediate_priority:
-        return name, key, fn
+    immediate = [f for f in upload_files if any(folder in f[2] for folder in self.immediate_folders)]
+    prioritized = [f for f in upload_files if f[0] in self.immediate_priority and f not in immediate]
+    return (immediate + prioritized)[:count]
 
-    return None
+  def next_file_to_upload(self, metered: bool) -> tuple[str, str, str] | None:
+    files = self.next_files_to_upload(metered, 1)
+    return files[0] if len(files) else None
 
   def do_upload(self, key: str, fn: str):
     url_resp = self.api.get("v1.4/" + self.dongle_id + "/upload_url/", timeout=10, path=key, access_token=self.api.get_token())
@@ -208,9 +301,16 @@ class Uploader:
         setxattr(fn, UPLOAD_ATTR_NAME, UPLOAD_ATTR_VALUE)
       except OSError:
         cloudlog.event("uploader_setxattr_failed", exc=last_exc, key=key, fn=fn, sz=sz)
+      self.index.mark_uploaded(os.path.basename(os.path.dirname(fn)), name)
 
     return success
 
+  @staticmethod
+  def upload_key(key: str) -> str:
+    # qlogs and bootlogs need to be compressed before uploading
+    if key.endswith(('qlog', 'rlog')) or (key.startswith('boot/') and not key.endswith('.zst')):
+      key += ".zst"
+    return key
 
   def step(self, network_type: int, metered: bool) -> bool | None:
     d = self.next_file_to_upload(metered)
@@ -218,12 +318,39 @@ class Uploader:
       return None
 
     name, key, fn = d
+    return self.upload(name, self.upload_key(key), fn, network_type, metered)
 
-    # qlogs and bootlogs need to be compressed before uploading
-    if key.endswith(('qlog', 'rlog')) or (key.startswith('boot/') and not key.endswith('.zst')):
-      key += ".zst"
+  def step_concurrent(self, network_type: int, metered: bool, timeout: float = 10.) -> bool | None:
+    """Keeps up to MAX_CONCURRENT_UPLOADS[network_type] uploads running and waits for at least one to finish.
+    Returns None if there is nothing to upload, otherwise whether all finished uploads succeeded."""
+    max_uploads = MAX_CONCURRENT_UPLOADS.get(network_type, 1)
+    if self.executor is None:
+      self.executor = ThreadPoolExecutor(max_workers=max(MAX_CONCURRENT_UPLOADS.values(), default=1), thread_name_prefix="uploader")
 
-    return self.upload(name, key, fn, network_type, metered)
+    if len(self.in_flight) < max_uploads:
+      for name, key, fn in self.next_files_to_upload(metered, max_uploads - len(self.in_flight)):
+        self.in_flight[fn] = self.executor.submit(self.upload, name, self.upload_key(key), fn, network_type, metered)
+
+    if not len(self.in_flight):
+      return None
+
+    done, _ = wait(self.in_flight.values(), timeout=timeout, return_when=FIRST_COMPLETED)
+    results = []
+    for fn, future in list(self.in_flight.items()):
+      if future in done:
+        del self.in_flight[fn]
+        results.append(future.result())
+
+    # still uploading, don't back off
+    if not len(results):
+      return True
+    return all(results)
+
+  def shutdown(self) -> None:
+    if self.executor is not None:
+      self.executor.shutdown(wait=True)
+      self.executor = None
+    self.in_flight.clear()
 
 
 def main(exit_event: threading.Event = None) -> None:
@@ -257,7 +384,10 @@ def main(exit_event: threading.Event = None) -> None:
         time.sleep(60 if offroad else 5)
       continue
 
-    success = uploader.step(sm['deviceState'].networkType.raw, sm['deviceState'].networkMetered)
+    if concurrent_upload:
+      success = uploader.step_concurrent(NetworkType.wifi if force_wifi else sm['deviceState'].networkType.raw, sm['deviceState'].networkMetered)
+    else:
+      success = uploader.step(sm['deviceState'].networkType.raw, sm['deviceState'].networkMetered)
     if success is None:
       backoff = 60 if offroad else 5
     elif success:
@@ -268,6 +398,8 @@ def main(exit_event: threading.Event = None) -> None:
     if allow_sleep:
       time.sleep(backoff + random.uniform(0, backoff))
 
+  uploader.shutdown()
+
 
 if __name__ == "__main__":
   main()
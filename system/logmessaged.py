@@ -5,7 +5,7 @@ from typing import NoReturn
 import cereal.messaging as messaging
 from openpilot.common.logging_extra import SwagLogFileFormatter
 from openpilot.system.hardware.hw import Paths
-from openpilot.common.swaglog import get_file_handler
+from openpilot.common.swaglog import decode_messages, get_file_handler
 
 
 def main() -> NoReturn:
@@ -23,24 +23,22 @@ def main() -> NoReturn:
 
   try:
     while True:
-      dat = b''.join(sock.recv_multipart())
-      level = dat[0]
-      record = dat[1:].decode("utf-8")
-      if level >= log_level:
-        log_handler.emit(record)
-
-      if len(record) > 2*1024*1024:
-        print("WARNING: log too big to publish", len(record))
-        print(record[:100])
-        continue
-
-      # then we publish them
-      msg = messaging.new_message(None, valid=True, logMessage=record)
-      log_message_sock.send(msg.to_bytes())
-
-      if level >= 40:  # logging.ERROR
-        msg = messaging.new_message(None, valid=True, errorLogMessage=record)
-        error_log_message_sock.send(msg.to_bytes())
+      for level, record in decode_messages(sock.recv_multipart()):
+        if level >= log_level:
+          log_handler.emit(record)
+
+        if len(record) > 2*1024*1024:
+          print("WARNING: log too big to publish", len(record))
+          print(record[:100])
+          continue
+
+        # then we publish them
+        msg = messaging.new_message(None, valid=True, logMessage=record)
+        log_message_sock.send(msg.to_bytes())
+
+        if level >= 40:  # logging.ERROR
+          msg = messaging.new_message(None, valid=True, errorLogMessage=record)
+          error_log_message_sock.send(msg.to_bytes())
   finally:
     sock.close()
     ctx.term()
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import math
 import numpy as np
 from functools import cache
 import threading
@@ -13,17 +14,23 @@ FFT_SAMPLES = 1600 # 100ms
 REFERENCE_SPL = 2e-5  # newtons/m^2
 SAMPLE_RATE = 16000
 SAMPLE_BUFFER = 800  # 50ms
+HOP_SAMPLES = SAMPLE_BUFFER  # a new estimate from the last FFT_SAMPLES every 50ms
 
 
 @cache
-def get_a_weighting_filter():
+def get_a_weighting_filter(n: int = FFT_SAMPLES, real: bool = False) -> np.ndarray:
   # Calculate the A-weighting filter
   # https://en.wikipedia.org/wiki/A-weighting
-  freqs = np.fft.fftfreq(FFT_SAMPLES, d=1 / SAMPLE_RATE)
+  freqs = np.fft.rfftfreq(n, d=1 / SAMPLE_RATE) if real else np.fft.fftfreq(n, d=1 / SAMPLE_RATE)
   A = 12194 ** 2 * freqs ** 4 / ((freqs ** 2 + 20.6 ** 2) * (freqs ** 2 + 12194 ** 2) * np.sqrt((freqs ** 2 + 107.7 ** 2) * (freqs ** 2 + 737.9 ** 2)))
   return A / np.max(A)
 
 
+@cache
+def get_window(n: int) -> np.ndarray:
+  return np.hanning(n)
+
+
 def calculate_spl(measurements):
   # https://www.engineeringtoolbox.com/sound-pressure-d_711.html
   sound_pressure = np.sqrt(np.mean(measurements ** 2))  # RMS of amplitudes
@@ -36,10 +43,79 @@ def calculate_spl(measurements):
 
 def apply_a_weighting(measurements: np.ndarray) -> np.ndarray:
   # Generate a Hanning window of the same length as the audio measurements
-  measurements_windowed = measurements * np.hanning(len(measurements))
+  measurements_windowed = measurements * get_window(len(measurements))
 
   # Apply the A-weighting filter to the signal
-  return np.abs(np.fft.ifft(np.fft.fft(measurements_windowed) * get_a_weighting_filter()))
+  return np.abs(np.fft.ifft(np.fft.fft(measurements_windowed) * get_a_weighting_filter(len(measurements))))
+
+
+class SPLEngine:
+  """Sliding-window sound pressure, unweighted and A-weighted.
+
+  Samples go into a preallocated ring buffer. Every hop samples, once the buffer is full, the last
+  window samples are measured the same way as calculate_spl and apply_a_weighting do, so a hop smaller
+  than the window gives overlapping estimates at a lower latency. The window and the filter are cached,
+  and the weighted level is taken from the power spectrum of a real FFT.
+  """
+
+  def __init__(self, window: int = FFT_SAMPLES, hop: int = FFT_SAMPLES):
+    assert 0 < hop <= window
+    self.window = window
+    self.hop = hop
+    # every sample is written twice, so the last window samples are always a contiguous view
+    self._buf = np.zeros(2 * window)
+    self._pos = 0
+    self._filled = 0
+    self._since_estimate = 0
+    self._hanning = get_window(window)
+    # squared A-weighting of each rfft bin, counting the mirrored negative frequencies, scaled for the mean square
+    self._power_weights = get_a_weighting_filter(window, real=True) ** 2 / window ** 2
+    self._power_weights[1:(window + 1) // 2] *= 2
+
+    self.sound_pressure = 0.
+    self.sound_pressure_level = 0.
+    self.sound_pressure_weighted = 0.
+    self.sound_pressure_level_weighted = 0.
+
+  def _write(self, samples: np.ndarray) -> None:
+    n = len(samples)
+    first = min(n, self.window - self._pos)
+    for offset in (self._pos, self._pos + self.window):
+      self._buf[offset:offset + first] = samples[:first]
+    if first < n:
+      self._buf[:n - first] = samples[first:]
+      self._buf[self.window:self.window + n - first] = samples[first:]
+    self._pos = (self._pos + n) % self.window
+
+  @staticmethod
+  def _spl(mean_square: float) -> tuple[float, float]:
+    sound_pressure = math.sqrt(mean_square)
+    return sound_pressure, (20 * math.log10(sound_pressure / REFERENCE_SPL) if sound_pressure > 0 else 0.)
+
+  def _estimate(self) -> None:
+    measurements = self._buf[self._pos:self._pos + self.window]
+    self.sound_pressure, self.sound_pressure_level = self._spl(float(np.dot(measurements, measurements)) / self.window)
+    # Parseval: the mean square of the weighted signal straight from its spectrum, no inverse FFT needed
+    spectrum = np.fft.rfft(measurements * self._hanning)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    self.sound_pressure_weighted, self.sound_pressure_level_weighted = self._spl(float(np.dot(power, self._power_weights)))
+
+  def process(self, samples: np.ndarray) -> int:
+    """Adds samples and returns how many new estimates were made, the attributes hold the latest one."""
+    estimates = 0
+    i = 0
+    while i < len(samples):
+      n = min(len(samples) - i, self.hop - self._since_estimate)
+      self._write(samples[i:i + n])
+      i += n
+      self._filled = min(self._filled + n, self.window)
+      self._since_estimate += n
+      if self._since_estimate == self.hop and self._filled == self.window:
+        self._estimate()
+        estimates += 1
+      if self._since_estimate == self.hop:
+        self._since_estimate = 0
+    return estimates
 
 
 class Mic:
@@ -47,11 +123,11 @@ class Mic:
     self.rk = Ratekeeper(RATE)
     self.pm = messaging.PubMaster(['soundPressure', 'rawAudioData'])
 
-    self.measurements = np.empty(0)
+    self.spl = SPLEngine(FFT_SAMPLES, HOP_SAMPLES)
 
-    self.sound_pressure = 0
-    self.sound_pressure_weighted = 0
-    self.sound_pressure_level_weighted = 0
+    self.sound_pressure = 0.
+    self.sound_pressure_weighted = 0.
+    self.sound_pressure_level_weighted = 0.
 
     self.lock = threading.Lock()
 
@@ -82,17 +158,11 @@ class Mic:
     msg.rawAudioData.sampleRate = SAMPLE_RATE
     self.pm.send('rawAudioData', msg)
 
-    with self.lock:
-      self.measurements = np.concatenate((self.measurements, indata[:, 0]))
-
-      while self.measurements.size >= FFT_SAMPLES:
-        measurements = self.measurements[:FFT_SAMPLES]
-
-        self.sound_pressure, _ = calculate_spl(measurements)
-        measurements_weighted = apply_a_weighting(measurements)
-        self.sound_pressure_weighted, self.sound_pressure_level_weighted = calculate_spl(measurements_weighted)
-
-        self.measurements = self.measurements[FFT_SAMPLES:]
+    if self.spl.process(indata[:, 0]):
+      with self.lock:
+        self.sound_pressure = self.spl.sound_pressure
+        self.sound_pressure_weighted = self.spl.sound_pressure_weighted
+        self.sound_pressure_level_weighted = self.spl.sound_pressure_level_weighted
 
   @retry(attempts=7, delay=3)
   def get_stream(self, sd):
@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 import os
+from operator import itemgetter
 from typing import NoReturn, TypedDict
 
 from cereal import messaging
+from cereal.services import SERVICE_LIST
 from openpilot.common.realtime import Ratekeeper
 from openpilot.common.swaglog import cloudlog
 
+# Publish procLogDelta in between the full procLogs, with only the processes that changed and the ones that exited,
+# for finer grained per-process CPU profiling. Off by default.
+PROCLOG_DELTA = os.getenv("PROCLOG_DELTA") is not None
+
 JIFFY = os.sysconf(os.sysconf_names['SC_CLK_TCK'])
 PAGE_SIZE = os.sysconf(os.sysconf_names['SC_PAGE_SIZE'])
 
@@ -65,6 +71,17 @@ _STAT_POS = {
   'processor': 39,
 }
 
+# Split plan for the fields after the process name: "<pid> (<comm>) <state> <ppid> ...", comm may contain spaces and parens.
+# The integer fields are picked from the split tail in one go, ordered like the ProcStat keys.
+_STAT_TAIL_START = _STAT_POS['state']
+_STAT_MIN_FIELDS = 52 - _STAT_TAIL_START + 1
+_STAT_INT_KEYS = ('ppid', 'utime', 'stime', 'cutime', 'cstime', 'priority', 'nice', 'num_threads', 'starttime', 'vms', 'rss', 'processor')
+_STAT_INT_FIELDS = itemgetter(*(_STAT_POS['vsize' if k == 'vms' else k] - _STAT_TAIL_START for k in _STAT_INT_KEYS))
+
+# stat files of live processes are kept open and re-read with pread, up to this many
+MAX_OPEN_FDS = 512
+STAT_READ_SIZE = 4096
+
 class ProcStat(TypedDict):
   name: str
   pid: int
@@ -83,34 +100,19 @@ class ProcStat(TypedDict):
   processor: int
 
 
-def _parse_proc_stat(stat: str) -> ProcStat | None:
+def _parse_proc_stat(stat: str | bytes) -> ProcStat | None:
+  if isinstance(stat, bytes):
+    stat = stat.decode('utf-8', errors='replace')
   open_paren = stat.find('(')
   close_paren = stat.rfind(')')
   if open_paren == -1 or close_paren == -1 or open_paren > close_paren:
     return None
-  name = stat[open_paren + 1:close_paren]
-  stat = stat[:open_paren] + stat[open_paren:close_paren].replace(' ', '_') + stat[close_paren:]
-  parts = stat.split()
-  if len(parts) < 52:
+  parts = stat[close_paren + 1:].split()
+  if len(parts) < _STAT_MIN_FIELDS:
     return None
   try:
-    return {
-      'name': name,
-      'pid': int(parts[_STAT_POS['pid'] - 1]),
-      'state': parts[_STAT_POS['state'] - 1][0],
-      'ppid': int(parts[_STAT_POS['ppid'] - 1]),
-      'utime': int(parts[_STAT_POS['utime'] - 1]),
-      'stime': int(parts[_STAT_POS['stime'] - 1]),
-      'cutime': int(parts[_STAT_POS['cutime'] - 1]),
-      'cstime': int(parts[_STAT_POS['cstime'] - 1]),
-      'priority': int(parts[_STAT_POS['priority'] - 1]),
-      'nice': int(parts[_STAT_POS['nice'] - 1]),
-      'num_threads': int(parts[_STAT_POS['num_threads'] - 1]),
-      'starttime': int(parts[_STAT_POS['starttime'] - 1]),
-      'vms': int(parts[_STAT_POS['vsize'] - 1]),
-      'rss': int(parts[_STAT_POS['rss'] - 1]),
-      'processor': int(parts[_STAT_POS['processor'] - 1]),
-    }
+    parsed = dict(zip(_STAT_INT_KEYS, map(int, _STAT_INT_FIELDS(parts)), strict=True))
+    return {'name': stat[open_paren + 1:close_paren], 'pid': int(stat[:open_paren]), 'state': parts[0][0], **parsed}  # type: ignore[typeddict-item]
   except Exception:
     cloudlog.exception("failed to parse /proc/<pid>/stat")
     return None
@@ -118,6 +120,7 @@ def _parse_proc_stat(stat: str) -> ProcStat | None:
 class ProcExtra(TypedDict):
   pid: int
   name: str
+  starttime: int
   exe: str
   cmdline: list[str]
 
@@ -125,9 +128,9 @@ class ProcExtra(TypedDict):
 _proc_cache: dict[int, ProcExtra] = {}
 
 
-def _get_proc_extra(pid: int, name: str) -> ProcExtra:
+def _get_proc_extra(pid: int, name: str, starttime: int = 0) -> ProcExtra:
   cache: ProcExtra | None = _proc_cache.get(pid)
-  if cache is None or cache.get('name') != name:
+  if cache is None or cache.get('name') != name or cache.get('starttime') != starttime:
     exe = ''
     cmdline: list[str] = []
     try:
@@ -139,31 +142,112 @@ def _get_proc_extra(pid: int, name: str) -> ProcExtra:
         cmdline = [c.decode('utf-8', errors='replace') for c in f.read().split(b'\0') if c]
     except OSError:
       pass
-    cache = {'pid': pid, 'name': name, 'exe': exe, 'cmdline': cmdline}
+    cache = {'pid': pid, 'name': name, 'starttime': starttime, 'exe': exe, 'cmdline': cmdline}
     _proc_cache[pid] = cache
   return cache
 
 
-def _procs() -> list[ProcStat]:
-  stats: list[ProcStat] = []
-  for pid_str in os.listdir('/proc'):
-    if not pid_str.isdigit():
-      continue
+class ProcSampler:
+  """Samples /proc/<pid>/stat for every process.
+
+  The stat files of processes seen in the previous sample stay open and are re-read with pread, so a
+  sample costs one listdir plus one read per process. Lines that didn't change since the last sample
+  aren't parsed again. Exited processes are dropped from the open files and from _proc_cache, and listed in
+  exited until the next sample.
+  """
+
+  def __init__(self, max_open_fds: int = MAX_OPEN_FDS):
+    self.max_open_fds = max_open_fds
+    self._fds: dict[int, int] = {}
+    self._raw: dict[int, bytes] = {}
+    self._stats: dict[int, ProcStat] = {}
+    self.exited: list[int] = []
+
+  def close(self) -> None:
+    for pid in list(self._fds):
+      self._close(pid)
+
+  def _close(self, pid: int) -> None:
+    fd = self._fds.pop(pid, None)
+    if fd is not None:
+      os.close(fd)
+
+  def _evict(self, pid: int) -> None:
+    self._close(pid)
+    if self._raw.pop(pid, None) is not None:
+      self.exited.append(pid)
+    self._stats.pop(pid, None)
+    _proc_cache.pop(pid, None)
+
+  def _read(self, pid: int) -> bytes | None:
+    fd = self._fds.get(pid)
+    if fd is not None:
+      try:
+        return os.pread(fd, STAT_READ_SIZE, 0)
+      except OSError:
+        # the process we had open exited, the pid may already belong to a new one
+        self._close(pid)
+
     try:
-      with open(f'/proc/{pid_str}/stat') as f:
-        stat = f.read()
-      parsed = _parse_proc_stat(stat)
-      if parsed is not None:
-        stats.append(parsed)
+      fd = os.open(f'/proc/{pid}/stat', os.O_RDONLY | os.O_CLOEXEC)
     except OSError:
-      continue
-  return stats
+      return None
+    try:
+      data = os.pread(fd, STAT_READ_SIZE, 0)
+    except OSError:
+      os.close(fd)
+      return None
+    # only processes that outlive one sample period are kept open
+    if pid in self._raw and len(self._fds) < self.max_open_fds:
+      self._fds[pid] = fd
+    else:
+      os.close(fd)
+    return data
+
+  def sample(self, changed_only: bool = False) -> list[ProcStat]:
+    """Returns the stats of all processes, or with changed_only, of the ones that changed since the last sample."""
+    pids = {int(p) for p in os.listdir('/proc') if p.isdigit()}
+    self.exited = []
+    for pid in self._raw.keys() - pids:
+      self._evict(pid)
+
+    stats: list[ProcStat] = []
+    for pid in pids:
+      data = self._read(pid)
+      if data is None:
+        self._evict(pid)
+        continue
+
+      if data == self._raw.get(pid):
+        if not changed_only:
+          stats.append(self._stats[pid])
+        continue
+
+      parsed = _parse_proc_stat(data)
+      if parsed is None:
+        self._evict(pid)
+        continue
+      self._raw[pid] = data
+      self._stats[pid] = parsed
+      stats.append(parsed)
+    return stats
+
+
+_sampler = ProcSampler()
+
+
+def _procs(changed_only: bool = False) -> list[ProcStat]:
+  return _sampler.sample(changed_only)
 
 
-def build_proc_log_message(msg) -> None:
-  pl = msg.procLog
+def build_proc_log_message(msg, changed_only: bool = False) -> None:
+  """Fills a procLog or procLogDelta message. With changed_only, procs only lists the processes whose stat changed
+  since the last message, and exitedPids the ones that exited."""
+  pl = getattr(msg, msg.which())
 
-  procs = _procs()
+  procs = _procs(changed_only)
+  if changed_only:
+    pl.exitedPids = _sampler.exited
   l = pl.init('procs', len(procs))
   for i, r in enumerate(procs):
     proc = l[i]
@@ -183,7 +267,7 @@ def build_proc_log_message(msg) -> None:
     proc.processor = r['processor']
     proc.name = r['name']
 
-    extra = _get_proc_extra(r['pid'], r['name'])
+    extra = _get_proc_extra(r['pid'], r['name'], r['starttime'])
     proc.exe = extra['exe']
     cmdline = proc.init('cmdline', len(extra['cmdline']))
     for j, arg in enumerate(extra['cmdline']):
@@ -214,12 +298,15 @@ def build_proc_log_message(msg) -> None:
 
 
 def main() -> NoReturn:
-  pm = messaging.PubMaster(['procLog'])
-  rk = Ratekeeper(0.5)
+  pm = messaging.PubMaster(['procLog', 'procLogDelta'])
+  rate = SERVICE_LIST['procLogDelta' if PROCLOG_DELTA else 'procLog'].frequency
+  full_every = round(rate / SERVICE_LIST['procLog'].frequency)
+  rk = Ratekeeper(rate)
   while True:
-    msg = messaging.new_message('procLog', valid=True)
-    build_proc_log_message(msg)
-    pm.send('procLog', msg)
+    service = 'procLog' if rk.frame % full_every == 0 else 'procLogDelta'
+    msg = messaging.new_message(service, valid=True)
+    build_proc_log_message(msg, changed_only=service == 'procLogDelta')
+    pm.send(service, msg)
     rk.keep_time()
 
 
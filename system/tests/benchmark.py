@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import argparse
+import time
+import numpy as np
+
+from openpilot.system.micd import FFT_SAMPLES, SAMPLE_BUFFER, SAMPLE_RATE, SPLEngine, apply_a_weighting, calculate_spl
+
+
+def _full_fft(chunks):
+  # the previous micd callback: concatenate, then one full FFT per FFT_SAMPLES
+  measurements = np.empty(0)
+  for chunk in chunks:
+    measurements = np.concatenate((measurements, chunk))
+    while measurements.size >= FFT_SAMPLES:
+      calculate_spl(measurements[:FFT_SAMPLES])
+      calculate_spl(apply_a_weighting(measurements[:FFT_SAMPLES]))
+      measurements = measurements[FFT_SAMPLES:]
+
+
+def _benchmark(seconds: float, hops: list[int]) -> None:
+  rng = np.random.default_rng(0)
+  samples = rng.uniform(-1, 1, int(seconds * SAMPLE_RATE))
+  chunks = [samples[i:i + SAMPLE_BUFFER] for i in range(0, len(samples), SAMPLE_BUFFER)]
+  print(f"{seconds:.0f}s of audio in {len(chunks)} chunks of {SAMPLE_BUFFER} samples, {FFT_SAMPLES} sample window")
+
+  t = time.perf_counter()
+  _full_fft(chunks)
+  dt = time.perf_counter() - t
+  print(f"  full fft (hop {FFT_SAMPLES}): {dt * 1e3:7.1f}ms, {seconds / dt:6.0f}x realtime")
+
+  for hop in hops:
+    engine = SPLEngine(FFT_SAMPLES, hop)
+    t = time.perf_counter()
+    estimates = sum(engine.process(chunk) for chunk in chunks)
+    dt = time.perf_counter() - t
+    print(f"  engine (hop {hop:4d}):     {dt * 1e3:7.1f}ms, {seconds / dt:6.0f}x realtime, {estimates / seconds:.0f} estimates/s")
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Throughput of micd's sound pressure calculation")
+  parser.add_argument("--seconds", type=float, default=600.)
+  parser.add_argument("--hop", type=int, nargs="+", default=[FFT_SAMPLES, SAMPLE_BUFFER, 400, 160])
+  args = parser.parse_args()
+
+  _benchmark(args.seconds, args.hop)
@@ -0,0 +1,66 @@
+import math
+import numpy as np
+import pytest
+
+from openpilot.system.micd import FFT_SAMPLES, REFERENCE_SPL, SAMPLE_RATE, SPLEngine, apply_a_weighting, calculate_spl
+
+
+def tone(freq, amplitude, n, phase=0.):
+  return amplitude * np.sin(2 * np.pi * freq * np.arange(n) / SAMPLE_RATE + phase)
+
+
+def a_weighting_gain(freq):
+  def a(f):
+    return 12194 ** 2 * f ** 4 / ((f ** 2 + 20.6 ** 2) * (f ** 2 + 12194 ** 2) * math.sqrt((f ** 2 + 107.7 ** 2) * (f ** 2 + 737.9 ** 2)))
+  freqs = np.fft.fftfreq(FFT_SAMPLES, d=1 / SAMPLE_RATE)
+  return a(freq) / max(a(f) for f in freqs)
+
+
+class TestSPLEngine:
+  @pytest.mark.parametrize("freq", [100, 1000, 4000])
+  def test_tone(self, freq):
+    amplitude = 0.1
+    engine = SPLEngine()
+    assert engine.process(tone(freq, amplitude, FFT_SAMPLES)) == 1
+
+    rms = amplitude / math.sqrt(2)
+    assert math.isclose(engine.sound_pressure, rms, rel_tol=1e-3)
+    assert math.isclose(engine.sound_pressure_level, 20 * math.log10(rms / REFERENCE_SPL), abs_tol=0.01)
+    # the Hanning window keeps 3/8 of the power
+    weighted = rms * math.sqrt(3 / 8) * a_weighting_gain(freq)
+    assert math.isclose(engine.sound_pressure_weighted, weighted, rel_tol=1e-2)
+    assert math.isclose(engine.sound_pressure_level_weighted, 20 * math.log10(weighted / REFERENCE_SPL), abs_tol=0.1)
+
+  def test_matches_full_fft(self):
+    rng = np.random.default_rng(0)
+    samples = rng.uniform(-1, 1, FFT_SAMPLES * 5)
+    engine = SPLEngine()
+    for i in range(0, len(samples), 800):
+      engine.process(samples[i:i + 800])
+    last = samples[-FFT_SAMPLES:]
+    assert engine.sound_pressure == pytest.approx(calculate_spl(last)[0])
+    sp_weighted, spl_weighted = calculate_spl(apply_a_weighting(last))
+    assert engine.sound_pressure_weighted == pytest.approx(sp_weighted)
+    assert engine.sound_pressure_level_weighted == pytest.approx(spl_weighted)
+
+  @pytest.mark.parametrize("hop,chunk", [(800, 800), (400, 123), (1600, 2000), (160, 5000)])
+  def test_hops(self, hop, chunk):
+    rng = np.random.default_rng(0)
+    samples = rng.uniform(-1, 1, FFT_SAMPLES * 6 + 77)
+    engine = SPLEngine(FFT_SAMPLES, hop)
+    estimates = 0
+    for i in range(0, len(samples), chunk):
+      estimates += engine.process(samples[i:i + chunk])
+    assert estimates == (len(samples) - FFT_SAMPLES) // hop + 1
+
+    last = FFT_SAMPLES + (estimates - 1) * hop
+    window = samples[last - FFT_SAMPLES:last]
+    assert engine.sound_pressure == pytest.approx(calculate_spl(window)[0])
+    assert engine.sound_pressure_weighted == pytest.approx(calculate_spl(apply_a_weighting(window))[0])
+
+  def test_silence(self):
+    engine = SPLEngine()
+    assert engine.process(np.zeros(FFT_SAMPLES - 1)) == 0
+    assert engine.process(np.zeros(1)) == 1
+    assert engine.sound_pressure_level == 0
+    assert engine.sound_pressure_level_weighted == 0
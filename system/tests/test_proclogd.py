@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+import time
+import pytest
+
+import cereal.messaging as messaging
+from openpilot.system import proclogd
+from openpilot.system.proclogd import ProcSampler, _parse_proc_stat, build_proc_log_message
+
+
+@pytest.fixture
+def sampler():
+  s = ProcSampler()
+  yield s
+  s.close()
+
+
+@pytest.fixture
+def sleeper():
+  p = subprocess.Popen(["sleep", "60"])
+  time.sleep(0.1)
+  yield p
+  p.kill()
+  p.wait()
+
+
+def find(stats, pid):
+  return next((s for s in stats if s['pid'] == pid), None)
+
+
+class TestProclogd:
+  def test_parse(self):
+    fields = " ".join(str(i) for i in range(4, 53))
+    stat = _parse_proc_stat(f"1234 (a) (b c)) S {fields}\n")
+    assert stat is not None
+    assert (stat['pid'], stat['name'], stat['state'], stat['ppid']) == (1234, "a) (b c)", 'S', 4)
+    assert (stat['utime'], stat['stime'], stat['cutime'], stat['cstime']) == (14, 15, 16, 17)
+    assert (stat['priority'], stat['nice'], stat['num_threads'], stat['starttime']) == (18, 19, 20, 22)
+    assert (stat['vms'], stat['rss'], stat['processor']) == (23, 24, 39)
+    assert _parse_proc_stat(f"1234 (a) S {fields}".encode()) == {**stat, 'name': "a"}
+
+    assert _parse_proc_stat("1234 (a) S 1 2 3") is None
+    assert _parse_proc_stat("1234 a) S " + fields.replace(" ", "(")) is None
+
+  def test_sample(self, sampler, sleeper):
+    own = _parse_proc_stat(open(f"/proc/{os.getpid()}/stat").read())
+    for _ in range(3):
+      stats = sampler.sample()
+      assert find(stats, sleeper.pid)['name'] == "sleep"
+      assert find(stats, os.getpid())['starttime'] == own['starttime']
+    # processes seen more than once are read through an open fd
+    assert sleeper.pid in sampler._fds
+
+  def test_eviction(self, sampler, sleeper):
+    sampler.sample()
+    sampler.sample()
+    proclogd._get_proc_extra(sleeper.pid, "sleep")
+    assert sleeper.pid in sampler._fds and sleeper.pid in proclogd._proc_cache
+
+    sleeper.kill()
+    sleeper.wait()
+    assert find(sampler.sample(), sleeper.pid) is None
+    assert sampler.exited == [sleeper.pid]
+    assert sleeper.pid not in sampler._fds
+    assert sleeper.pid not in sampler._stats
+    assert sleeper.pid not in proclogd._proc_cache
+    # only reported once
+    sampler.sample()
+    assert sampler.exited == []
+
+  def test_max_open_fds(self, sleeper):
+    sampler = ProcSampler(max_open_fds=2)
+    for _ in range(3):
+      assert find(sampler.sample(), sleeper.pid) is not None
+    assert len(sampler._fds) == 2
+    sampler.close()
+    assert len(sampler._fds) == 0
+
+  def test_changed_only(self, sampler, sleeper):
+    busy = subprocess.Popen([sys.executable, "-c", "while True: pass"])
+    try:
+      sampler.sample()
+      time.sleep(0.2)
+      changed = sampler.sample(changed_only=True)
+      assert find(changed, busy.pid) is not None
+      assert find(changed, sleeper.pid) is None
+      # a full sample still has the unchanged processes
+      assert find(sampler.sample(), sleeper.pid) is not None
+    finally:
+      busy.kill()
+      busy.wait()
+
+  def test_build_message(self, sleeper):
+    msg = messaging.new_message('procLog')
+    build_proc_log_message(msg)
+    pl = msg.procLog
+    proc = next(p for p in pl.procs if p.pid == sleeper.pid)
+    assert list(proc.cmdline) == ["sleep", "60"]
+    assert proc.name == "sleep"
+    assert len(pl.cpuTimes) > 0
+    assert pl.mem.total > 0
+
+    assert len(pl.exitedPids) == 0
+
+    msg = messaging.new_message('procLogDelta')
+    build_proc_log_message(msg, changed_only=True)
+    assert sleeper.pid not in [p.pid for p in msg.procLogDelta.procs]
+    assert len(msg.procLogDelta.cpuTimes) > 0
+
+    sleeper.kill()
+    sleeper.wait()
+    msg = messaging.new_message('procLogDelta')
+    build_proc_log_message(msg, changed_only=True)
+    assert sleeper.pid in msg.procLogDelta.exitedPids
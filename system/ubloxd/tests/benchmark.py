@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import argparse
+import time
+from collections import defaultdict
+
+from openpilot.system.ubloxd.generated.ubx import Ubx
+from openpilot.system.ubloxd.ubloxd import UbloxMsgParser
+from openpilot.tools.lib.logreader import LogReader
+
+MSG_NAMES = {0x0107: "NAV-PVT", 0x0135: "NAV-SAT", 0x0213: "RXM-SFRBX", 0x0215: "RXM-RAWX", 0x0A09: "MON-HW", 0x0A0B: "MON-HW2"}
+# the previous per-field decoders, for comparison
+KAITAI_DECODERS = {0x0135: Ubx.NavSat.from_bytes, 0x0215: Ubx.RxmRawx.from_bytes}
+
+
+def _benchmark(route: str, kaitai: bool) -> None:
+  raw = [(msg.logMonoTime * 1e-9, bytes(msg.ubloxRaw)) for msg in LogReader(route) if msg.which() == "ubloxRaw"]
+  if not raw:
+    print(f"no ubloxRaw in {route}")
+    return
+  total_bytes = sum(len(data) for _, data in raw)
+
+  parser = UbloxMsgParser()
+  t1 = time.perf_counter()
+  frames = [(log_time, frame) for log_time, data in raw for frame in parser.framer.add_data(log_time, data)]
+  framing = time.perf_counter() - t1
+
+  parser = UbloxMsgParser()
+  times: dict[str, list[float]] = defaultdict(list)
+  kaitai_times: dict[str, list[float]] = defaultdict(list)
+  for log_time, frame in frames:
+    msg_type = int.from_bytes(frame[2:4], 'big')
+    name = MSG_NAMES.get(msg_type, f"0x{msg_type:04X}")
+    parser.framer.last_log_time = log_time
+    t = time.perf_counter()
+    try:
+      parser.parse_frame(frame)
+    except Exception:
+      pass
+    times[name].append(time.perf_counter() - t)
+
+    if kaitai and msg_type in KAITAI_DECODERS:
+      t = time.perf_counter()
+      KAITAI_DECODERS[msg_type](frame[6:-2])
+      kaitai_times[name].append(time.perf_counter() - t)
+
+  duration = raw[-1][0] - raw[0][0]
+  parsing = sum(sum(t) for t in times.values())
+  print(f"[{route}] {len(raw)} ubloxRaw msgs, {total_bytes / 1e6:.2f}MB, {len(frames)} frames, {duration:.0f}s of log")
+  print(f"  framing: {framing * 1e3:.1f}ms, {total_bytes / framing / 1e6:.1f}MB/s")
+  print(f"  parsing: {parsing * 1e3:.1f}ms, {duration / max(framing + parsing, 1e-9):.0f}x realtime")
+  for name, t in sorted(times.items(), key=lambda kv: -sum(kv[1])):
+    line = f"  {name:>10}: {len(t):6d} frames, {sum(t) / len(t) * 1e6:7.1f}us/frame"
+    if name in kaitai_times:
+      line += f" (kaitai decode alone {sum(kaitai_times[name]) / len(kaitai_times[name]) * 1e6:.1f}us/frame)"
+    print(line)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Replay the ubloxRaw stream of a route through ubloxd's framer and parser")
+  parser.add_argument("route", help="route or segment with ubloxRaw, e.g. a local rlog or a route name")
+  parser.add_argument("--kaitai", action="store_true", help="also time the Kaitai decoders for the messages decoded with numpy")
+  args = parser.parse_args()
+
+  _benchmark(args.route, args.kaitai)
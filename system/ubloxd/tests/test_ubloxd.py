@@ -0,0 +1,120 @@
+import math
+import random
+import struct
+
+from openpilot.system.ubloxd.generated.ubx import Ubx
+from openpilot.system.ubloxd.ubloxd import UbloxMsgParser, UbxFramer
+
+
+def make_frame(msg_type: int, payload: bytes) -> bytes:
+  body = struct.pack('>H', msg_type) + struct.pack('<H', len(payload)) + payload
+  ck_a = ck_b = 0
+  for b in body:
+    ck_a = (ck_a + b) & 0xFF
+    ck_b = (ck_b + ck_a) & 0xFF
+  return b'\xB5\x62' + body + bytes([ck_a, ck_b])
+
+
+def make_rawx(rng: random.Random, num_meas: int) -> bytes:
+  payload = struct.pack('<dHbBB3x', rng.uniform(0, 604800), rng.randrange(2400), 18, num_meas, rng.randrange(256))
+  for _ in range(num_meas):
+    payload += struct.pack('<ddfBBxBHBBBBBx', rng.uniform(-3e7, 3e7), rng.uniform(-1e9, 1e9), rng.uniform(-5e3, 5e3),
+                           rng.choice((0, 2, 3, 6)), rng.randrange(256), rng.randrange(14), rng.randrange(65536),
+                           rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.randrange(256))
+  return make_frame(0x0215, payload)
+
+
+def make_nav_sat(rng: random.Random, num_svs: int) -> bytes:
+  payload = struct.pack('<IBB2x', rng.randrange(2**32), 1, num_svs)
+  for _ in range(num_svs):
+    payload += struct.pack('<BBBbhhI', rng.choice((0, 2, 3, 6)), rng.randrange(256), rng.randrange(256), rng.randrange(-90, 91),
+                           rng.randrange(-32768, 32768), rng.randrange(-32768, 32768), rng.randrange(2**32))
+  return make_frame(0x0135, payload)
+
+
+class TestUbxFramer:
+  def test_checksum(self):
+    rng = random.Random(0)
+    for size in (0, 1, 50, 200, 4000):
+      frame = make_frame(0x0215, rng.randbytes(size))
+      assert UbxFramer._checksum_ok(frame)
+      assert not UbxFramer._checksum_ok(frame[:-1] + bytes([frame[-1] ^ 1]))
+      assert UbxFramer._checksum_ok(b'garbage' + frame + b'garbage', 7, 7 + len(frame))
+
+  def test_split_chunks(self):
+    rng = random.Random(0)
+    frames = [make_frame(0x0107, rng.randbytes(rng.randrange(200))) for _ in range(100)]
+    stream = b''.join(rng.randbytes(rng.randrange(10)).replace(b'\xB5', b'') + f for f in frames)
+
+    for chunk_size in (1, 2, 7, 64, len(stream)):
+      framer = UbxFramer()
+      out = [f for i in range(0, len(stream), chunk_size) for f in framer.add_data(0., stream[i:i + chunk_size])]
+      assert out == frames
+
+  def test_resync(self):
+    rng = random.Random(0)
+    good = [make_frame(0x0107, rng.randbytes(92)) for _ in range(3)]
+    corrupt = bytearray(make_frame(0x0107, rng.randbytes(92)))
+    corrupt[20] ^= 0xFF
+    # a bad frame that swallows the start of the next one, and a false preamble with a long length in the garbage
+    framer = UbxFramer()
+    out = framer.add_data(0., good[0] + bytes(corrupt[:50]) + b'\xB5\x62\x01' + good[1] + good[2])
+    assert out == good[:1]
+    out += framer.add_data(0., b'\x00' * 400)
+    assert out == good
+    assert len(framer.buf) == 0
+
+  def test_garbage(self):
+    framer = UbxFramer()
+    assert framer.add_data(0., b'\x00' * 1000) == []
+    assert len(framer.buf) == 0
+    frame = make_frame(0x0107, b'\x01' * 92)
+    assert framer.add_data(0., b'\x00' * 100 + frame[:1]) == []
+    assert framer.add_data(0., frame[1:]) == [frame]
+
+
+class TestUbloxMsgParser:
+  def test_rxm_rawx(self):
+    rng = random.Random(0)
+    for num_meas in (0, 1, 32):
+      frame = make_rawx(rng, num_meas)
+      msg = Ubx.RxmRawx.from_bytes(frame[6:-2])
+      service, dat = UbloxMsgParser().parse_frame(frame)
+      assert service == 'ubloxGnss'
+      mr = dat.ubloxGnss.measurementReport
+      assert (mr.rcvTow, mr.gpsWeek, mr.leapSeconds, mr.numMeas) == (msg.rcv_tow, msg.week, msg.leap_s, msg.num_meas)
+      assert mr.receiverStatus.leapSecValid == bool(msg.rec_stat & 1)
+      assert mr.receiverStatus.clkReset == bool(msg.rec_stat & 4)
+      assert len(mr.measurements) == num_meas
+      for m, ref in zip(mr.measurements, msg.meas, strict=True):
+        assert (m.svId, m.gnssId, m.glonassFrequencyIndex, m.locktime, m.cno) == \
+               (ref.sv_id, ref.gnss_id.value, ref.freq_id, ref.lock_time, ref.cno)
+        assert (m.pseudorange, m.carrierCycles) == (ref.pr_mes, ref.cp_mes)
+        assert m.doppler == struct.unpack('<f', struct.pack('<f', ref.do_mes))[0]
+        assert math.isclose(m.pseudorangeStdev, 0.01 * 2 ** (ref.pr_stdev & 15), rel_tol=1e-6)
+        assert math.isclose(m.carrierPhaseStdev, 0.004 * (ref.cp_stdev & 15), rel_tol=1e-6)
+        assert math.isclose(m.dopplerStdev, 0.002 * 2 ** (ref.do_stdev & 15), rel_tol=1e-6)
+        ts = m.trackingStatus
+        assert [ts.pseudorangeValid, ts.carrierPhaseValid, ts.halfCycleValid, ts.halfCycleSubtracted] == \
+               [bool(ref.trk_stat & (1 << i)) for i in range(4)]
+
+  def test_nav_sat(self):
+    rng = random.Random(0)
+    for num_svs in (0, 1, 40):
+      frame = make_nav_sat(rng, num_svs)
+      msg = Ubx.NavSat.from_bytes(frame[6:-2])
+      service, dat = UbloxMsgParser().parse_frame(frame)
+      assert service == 'ubloxGnss'
+      sr = dat.ubloxGnss.satReport
+      assert sr.iTow == msg.itow
+      assert len(sr.svs) == num_svs
+      for sv, ref in zip(sr.svs, msg.svs, strict=True):
+        assert (sv.svId, sv.gnssId, sv.flagsBitfield, sv.cno, sv.elevationDeg, sv.azimuthDeg) == \
+               (ref.sv_id, ref.gnss_id.value, ref.flags, ref.cno, ref.elev, ref.azim)
+        assert math.isclose(sv.pseudorangeResidual, ref.pr_res * 0.1, rel_tol=1e-6)
+
+  def test_truncated(self):
+    rng = random.Random(0)
+    for frame in (make_rawx(rng, 4), make_nav_sat(rng, 4)):
+      # the header claims more blocks than the payload holds
+      assert UbloxMsgParser().parse_frame(make_frame(int.from_bytes(frame[2:4], 'big'), frame[6:-10])) is None
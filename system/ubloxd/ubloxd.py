@@ -18,10 +18,30 @@ SECS_IN_HR = 60 * SECS_IN_MIN
 SECS_IN_DAY = 24 * SECS_IN_HR
 SECS_IN_WEEK = 7 * SECS_IN_DAY
 
+# Fletcher weights: the i-th of n checksummed bytes is added to ck_b (n - i) times
+CHECKSUM_WEIGHTS = np.arange(4 + 0xFFFF, 0, -1, dtype=np.int64)
+# below this many bytes the numpy call overhead is more than the loop
+CHECKSUM_NUMPY_MIN = 64
+
+# Repeated blocks of the large messages, decoded straight into arrays instead of per-field Kaitai readers
+RXM_RAWX_HEADER = np.dtype([
+  ('rcv_tow', '<f8'), ('week', '<u2'), ('leap_s', 'i1'), ('num_meas', 'u1'), ('rec_stat', 'u1'), ('reserved1', 'V3'),
+])
+RXM_RAWX_MEAS = np.dtype([
+  ('pr_mes', '<f8'), ('cp_mes', '<f8'), ('do_mes', '<f4'), ('gnss_id', 'u1'), ('sv_id', 'u1'), ('reserved2', 'V1'),
+  ('freq_id', 'u1'), ('lock_time', '<u2'), ('cno', 'u1'), ('pr_stdev', 'u1'), ('cp_stdev', 'u1'), ('do_stdev', 'u1'),
+  ('trk_stat', 'u1'), ('reserved3', 'V1'),
+])
+NAV_SAT_HEADER = np.dtype([('itow', '<u4'), ('version', 'u1'), ('num_svs', 'u1'), ('reserved', 'V2')])
+NAV_SAT_SV = np.dtype([
+  ('gnss_id', 'u1'), ('sv_id', 'u1'), ('cno', 'u1'), ('elev', 'i1'), ('azim', '<i2'), ('pr_res', '<i2'), ('flags', '<u4'),
+])
+assert RXM_RAWX_HEADER.itemsize == 16 and RXM_RAWX_MEAS.itemsize == 32
+assert NAV_SAT_HEADER.itemsize == 8 and NAV_SAT_SV.itemsize == 12
+
 
 class UbxFramer:
-  PREAMBLE1 = 0xB5
-  PREAMBLE2 = 0x62
+  PREAMBLE = b"\xB5\x62"
   HEADER_SIZE = 6
   CHECKSUM_SIZE = 2
 
@@ -33,51 +53,57 @@ class UbxFramer:
     self.buf.clear()
 
   @staticmethod
-  def _checksum_ok(frame: bytes) -> bool:
-    ck_a = 0
-    ck_b = 0
-    for b in frame[2:-2]:
-      ck_a = (ck_a + b) & 0xFF
-      ck_b = (ck_b + ck_a) & 0xFF
-    return ck_a == frame[-2] and ck_b == frame[-1]
+  def _checksum_ok(buf: bytes | bytearray, start: int = 0, end: int | None = None) -> bool:
+    """Checks the 8-bit Fletcher checksum of the frame in buf[start:end]"""
+    if end is None:
+      end = len(buf)
+    n = end - start - 4
+    if n < CHECKSUM_NUMPY_MIN:
+      ck_a = 0
+      ck_b = 0
+      for b in buf[start + 2:end - 2]:
+        ck_a = (ck_a + b) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    else:
+      data = np.frombuffer(buf, dtype=np.uint8, count=n, offset=start + 2).astype(np.int64)
+      ck_a = int(data.sum()) & 0xFF
+      ck_b = int(CHECKSUM_WEIGHTS[-n:] @ data) & 0xFF
+    return ck_a == buf[end - 2] and ck_b == buf[end - 1]
 
   def add_data(self, log_time: float, incoming: bytes) -> list[bytes]:
     self.last_log_time = log_time
     out: list[bytes] = []
     if not incoming:
       return out
-    self.buf += incoming
+    buf = self.buf
+    buf += incoming
 
+    # walk the buffer by offset, frames and resyncs don't copy the rest of it
+    pos = 0
     while True:
-      # find preamble
-      if len(self.buf) < 2:
-        break
-      start = self.buf.find(b"\xB5\x62")
+      start = buf.find(self.PREAMBLE, pos)
       if start < 0:
-        # no preamble in buffer
-        self.buf.clear()
+        # no preamble in buffer, but a trailing first byte can still start one
+        pos = len(buf) - 1 if buf.endswith(self.PREAMBLE[:1]) else len(buf)
         break
-      if start > 0:
-        # drop garbage before preamble
-        self.buf = self.buf[start:]
+      pos = start
 
-      if len(self.buf) < self.HEADER_SIZE:
+      if len(buf) - pos < self.HEADER_SIZE:
         break
 
-      length_le = int.from_bytes(self.buf[4:6], 'little', signed=False)
-      total_len = self.HEADER_SIZE + length_le + self.CHECKSUM_SIZE
-      if len(self.buf) < total_len:
+      total_len = self.HEADER_SIZE + (buf[pos + 4] | (buf[pos + 5] << 8)) + self.CHECKSUM_SIZE
+      if len(buf) - pos < total_len:
         break
 
-      candidate = bytes(self.buf[:total_len])
-      if self._checksum_ok(candidate):
-        out.append(candidate)
-        # consume this frame
-        self.buf = self.buf[total_len:]
+      if self._checksum_ok(buf, pos, pos + total_len):
+        out.append(bytes(buf[pos:pos + total_len]))
+        pos += total_len
       else:
-        # drop first byte and retry
-        self.buf = self.buf[1:]
+        # skip the preamble and resync
+        pos += 1
 
+    # drop everything consumed at once, deleting from the front of a bytearray doesn't move the rest
+    del buf[:pos]
     return out
 
 
@@ -146,8 +172,7 @@ class UbloxMsgParser:
       view = _SfrbxView(gnss_id, sv_id, freq_id, words)
       return self._gen_rxm_sfrbx(view)
     if msg_type == 0x0215:
-      body = Ubx.RxmRawx.from_bytes(payload)
-      return self._gen_rxm_rawx(body)
+      return self._gen_rxm_rawx(payload)
     if msg_type == 0x0A09:
       body = Ubx.MonHw.from_bytes(payload)
       return self._gen_mon_hw(body)
@@ -155,8 +180,7 @@ class UbloxMsgParser:
       body = Ubx.MonHw2.from_bytes(payload)
       return self._gen_mon_hw2(body)
     if msg_type == 0x0135:
-      body = Ubx.NavSat.from_bytes(payload)
-      return self._gen_nav_sat(body)
+      return self._gen_nav_sat(payload)
     return None
 
   # NAV-PVT -> gpsLocationExternal
@@ -412,53 +436,85 @@ class UbloxMsgParser:
     self.caches.glonass_strings[freq_id].clear()
     return ('ubloxGnss', dat)
 
-  def _gen_rxm_rawx(self, msg: Ubx.RxmRawx) -> tuple[str, capnp.lib.capnp._DynamicStructBuilder]:
+  def _gen_rxm_rawx(self, payload: bytes) -> tuple[str, capnp.lib.capnp._DynamicStructBuilder] | None:
+    if len(payload) < RXM_RAWX_HEADER.itemsize:
+      return None
+    hdr = np.frombuffer(payload, dtype=RXM_RAWX_HEADER, count=1)[0]
+    num_meas = int(hdr['num_meas'])
+    if len(payload) < RXM_RAWX_HEADER.itemsize + num_meas * RXM_RAWX_MEAS.itemsize:
+      return None
+    meas = np.frombuffer(payload, dtype=RXM_RAWX_MEAS, count=num_meas, offset=RXM_RAWX_HEADER.itemsize)
+
     dat = messaging.new_message('ubloxGnss', valid=True)
     mr = dat.ubloxGnss.init('measurementReport')
-    mr.rcvTow = msg.rcv_tow
-    mr.gpsWeek = msg.week
-    mr.leapSeconds = msg.leap_s
-
-    mb = mr.init('measurements', msg.num_meas)
-    for i, m in enumerate(msg.meas):
-      mb[i].svId = m.sv_id
-      mb[i].pseudorange = m.pr_mes
-      mb[i].carrierCycles = m.cp_mes
-      mb[i].doppler = m.do_mes
-      mb[i].gnssId = int(m.gnss_id.value)
-      mb[i].glonassFrequencyIndex = m.freq_id
-      mb[i].locktime = m.lock_time
-      mb[i].cno = m.cno
-      mb[i].pseudorangeStdev = 0.01 * (math.pow(2, (m.pr_stdev & 15)))
-      mb[i].carrierPhaseStdev = 0.004 * (m.cp_stdev & 15)
-      mb[i].dopplerStdev = 0.002 * (math.pow(2, (m.do_stdev & 15)))
-
-      ts = mb[i].init('trackingStatus')
-      trk = m.trk_stat
-      ts.pseudorangeValid = _bit(trk, 0)
-      ts.carrierPhaseValid = _bit(trk, 1)
-      ts.halfCycleValid = _bit(trk, 2)
-      ts.halfCycleSubtracted = _bit(trk, 3)
-
-    mr.numMeas = msg.num_meas
+    mr.rcvTow = float(hdr['rcv_tow'])
+    mr.gpsWeek = int(hdr['week'])
+    mr.leapSeconds = int(hdr['leap_s'])
+
+    trk = meas['trk_stat']
+    columns = zip(
+      meas['sv_id'].tolist(), meas['pr_mes'].tolist(), meas['cp_mes'].tolist(), meas['do_mes'].tolist(),
+      meas['gnss_id'].tolist(), meas['freq_id'].tolist(), meas['lock_time'].tolist(), meas['cno'].tolist(),
+      (0.01 * 2.0 ** (meas['pr_stdev'] & 15)).tolist(),
+      (0.004 * (meas['cp_stdev'] & 15)).tolist(),
+      (0.002 * 2.0 ** (meas['do_stdev'] & 15)).tolist(),
+      (trk & 1).astype(bool).tolist(), (trk & 2).astype(bool).tolist(),
+      (trk & 4).astype(bool).tolist(), (trk & 8).astype(bool).tolist(),
+      strict=True,
+    )
+    mb = mr.init('measurements', num_meas)
+    for m, (sv_id, pr, cp, do, gnss_id, freq_id, lock_time, cno, pr_stdev, cp_stdev, do_stdev,
+            pr_valid, cp_valid, half_cycle_valid, half_cycle_sub) in zip(mb, columns, strict=True):
+      m.svId = sv_id
+      m.pseudorange = pr
+      m.carrierCycles = cp
+      m.doppler = do
+      m.gnssId = gnss_id
+      m.glonassFrequencyIndex = freq_id
+      m.locktime = lock_time
+      m.cno = cno
+      m.pseudorangeStdev = pr_stdev
+      m.carrierPhaseStdev = cp_stdev
+      m.dopplerStdev = do_stdev
+
+      ts = m.init('trackingStatus')
+      ts.pseudorangeValid = pr_valid
+      ts.carrierPhaseValid = cp_valid
+      ts.halfCycleValid = half_cycle_valid
+      ts.halfCycleSubtracted = half_cycle_sub
+
+    mr.numMeas = num_meas
     rs = mr.init('receiverStatus')
-    rs.leapSecValid = _bit(msg.rec_stat, 0)
-    rs.clkReset = _bit(msg.rec_stat, 2)
+    rs.leapSecValid = _bit(int(hdr['rec_stat']), 0)
+    rs.clkReset = _bit(int(hdr['rec_stat']), 2)
     return ('ubloxGnss', dat)
 
-  def _gen_nav_sat(self, msg: Ubx.NavSat) -> tuple[str, capnp.lib.capnp._DynamicStructBuilder]:
+  def _gen_nav_sat(self, payload: bytes) -> tuple[str, capnp.lib.capnp._DynamicStructBuilder] | None:
+    if len(payload) < NAV_SAT_HEADER.itemsize:
+      return None
+    hdr = np.frombuffer(payload, dtype=NAV_SAT_HEADER, count=1)[0]
+    num_svs = int(hdr['num_svs'])
+    if len(payload) < NAV_SAT_HEADER.itemsize + num_svs * NAV_SAT_SV.itemsize:
+      return None
+    sv = np.frombuffer(payload, dtype=NAV_SAT_SV, count=num_svs, offset=NAV_SAT_HEADER.itemsize)
+
     dat = messaging.new_message('ubloxGnss', valid=True)
     sr = dat.ubloxGnss.init('satReport')
-    sr.iTow = msg.itow
-    svs = sr.init('svs', msg.num_svs)
-    for i, s in enumerate(msg.svs):
-      svs[i].svId = s.sv_id
-      svs[i].gnssId = int(s.gnss_id.value)
-      svs[i].flagsBitfield = s.flags
-      svs[i].cno = s.cno
-      svs[i].elevationDeg = s.elev
-      svs[i].azimuthDeg = s.azim
-      svs[i].pseudorangeResidual = s.pr_res * 0.1
+    sr.iTow = int(hdr['itow'])
+    columns = zip(
+      sv['sv_id'].tolist(), sv['gnss_id'].tolist(), sv['flags'].tolist(), sv['cno'].tolist(),
+      sv['elev'].tolist(), sv['azim'].tolist(), (sv['pr_res'] * 0.1).tolist(),
+      strict=True,
+    )
+    svs = sr.init('svs', num_svs)
+    for s, (sv_id, gnss_id, flags, cno, elev, azim, pr_res) in zip(svs, columns, strict=True):
+      s.svId = sv_id
+      s.gnssId = gnss_id
+      s.flagsBitfield = flags
+      s.cno = cno
+      s.elevationDeg = elev
+      s.azimuthDeg = azim
+      s.pseudorangeResidual = pr_res
     return ('ubloxGnss', dat)
 
   def _gen_mon_hw(self, msg: Ubx.MonHw) -> tuple[str, capnp.lib.capnp._DynamicStructBuilder]:
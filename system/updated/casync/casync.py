@@ -1,16 +1,18 @@
 #!/usr/bin/env python3
-import io
 import lzma
 import os
 import pathlib
 import struct
 import sys
+import threading
 import time
 from abc import ABC, abstractmethod
 from collections import defaultdict, namedtuple
 from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import IO
 
+import numpy as np
 import requests
 from Crypto.Hash import SHA512
 from openpilot.system.updated.casync import tar
@@ -25,37 +27,60 @@ CA_HEADER_LEN = 48
 CA_TABLE_HEADER_LEN = 16
 CA_TABLE_ENTRY_LEN = 40
 CA_TABLE_MIN_LEN = CA_TABLE_HEADER_LEN + CA_TABLE_ENTRY_LEN
+CA_TABLE_ENTRY = np.dtype([('offset', '<u8'), ('sha', 'V32')])
 
 CHUNK_DOWNLOAD_TIMEOUT = 60
 CHUNK_DOWNLOAD_RETRIES = 3
 
 CAIBX_DOWNLOAD_TIMEOUT = 120
 
+# Downloads mostly wait on the network, decompression and hashing release the GIL and are bound by the cores
+EXTRACT_FETCH_WORKERS = 16
+EXTRACT_WORKERS = os.cpu_count() or 1
+# Chunks queued per fetch worker, an image has 100k+ chunks
+EXTRACT_QUEUE_DEPTH = 4
+
 Chunk = namedtuple('Chunk', ['sha', 'offset', 'length'])
 ChunkDict = dict[bytes, Chunk]
 
 
 class ChunkReader(ABC):
+  """Chunk readers are used from several threads at once by extract"""
+
   @abstractmethod
   def read(self, chunk: Chunk) -> bytes:
     ...
 
+  def fetch(self, chunk: Chunk) -> bytes:
+    """First half of read, the part that waits on IO"""
+    return self.read(chunk)
+
+  def decode(self, contents: bytes) -> bytes:
+    """Second half of read, the CPU bound part"""
+    return contents
+
 
 class BinaryChunkReader(ChunkReader):
   """Reads chunks from a local file"""
   def __init__(self, file_like: IO[bytes]) -> None:
     super().__init__()
     self.f = file_like
+    self.lock = threading.Lock()
 
   def read(self, chunk: Chunk) -> bytes:
-    self.f.seek(chunk.offset)
-    return self.f.read(chunk.length)
+    with self.lock:
+      self.f.seek(chunk.offset)
+      return self.f.read(chunk.length)
 
 
 class FileChunkReader(BinaryChunkReader):
   def __init__(self, path: str) -> None:
     super().__init__(open(path, 'rb'))
 
+  def read(self, chunk: Chunk) -> bytes:
+    # positional reads don't share a file position between threads
+    return os.pread(self.f.fileno(), chunk.length, chunk.offset)
+
   def __del__(self):
     self.f.close()
 
@@ -66,28 +91,39 @@ class RemoteChunkReader(ChunkReader):
   def __init__(self, url: str) -> None:
     super().__init__()
     self.url = url
-    self.session = requests.Session()
+    self.local = threading.local()
+
+  @property
+  def session(self) -> requests.Session:
+    # requests sessions aren't thread safe, each fetch thread gets its own connection pool
+    if not hasattr(self.local, 'session'):
+      self.local.session = requests.Session()
+    return self.local.session
 
   def read(self, chunk: Chunk) -> bytes:
+    return self.decode(self.fetch(chunk))
+
+  def fetch(self, chunk: Chunk) -> bytes:
     sha_hex = chunk.sha.hex()
     url = os.path.join(self.url, sha_hex[:4], sha_hex + ".cacnk")
 
     if os.path.isfile(url):
       with open(url, 'rb') as f:
-        contents = f.read()
-    else:
-      for i in range(CHUNK_DOWNLOAD_RETRIES):
-        try:
-          resp = self.session.get(url, timeout=CHUNK_DOWNLOAD_TIMEOUT)
-          break
-        except Exception:
-          if i == CHUNK_DOWNLOAD_RETRIES - 1:
-            raise
-          time.sleep(CHUNK_DOWNLOAD_TIMEOUT)
+        return f.read()
+
+    for i in range(CHUNK_DOWNLOAD_RETRIES):
+      try:
+        resp = self.session.get(url, timeout=CHUNK_DOWNLOAD_TIMEOUT)
+        break
+      except Exception:
+        if i == CHUNK_DOWNLOAD_RETRIES - 1:
+          raise
+        time.sleep(CHUNK_DOWNLOAD_TIMEOUT)
 
-      resp.raise_for_status()
-      contents = resp.content
+    resp.raise_for_status()
+    return resp.content
 
+  def decode(self, contents: bytes) -> bytes:
     decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_AUTO)
     return decompressor.decompress(contents)
 
@@ -109,50 +145,37 @@ class DirectoryTarChunkReader(BinaryChunkReader):
 def parse_caibx(caibx_path: str) -> list[Chunk]:
   """Parses the chunks from a caibx file. Can handle both local and remote files.
   Returns a list of chunks with hash, offset and length"""
-  caibx: io.BufferedIOBase
+  caibx: bytes
   if os.path.isfile(caibx_path):
-    caibx = open(caibx_path, 'rb')
+    with open(caibx_path, 'rb') as f:
+      caibx = f.read()
   else:
     resp = requests.get(caibx_path, timeout=CAIBX_DOWNLOAD_TIMEOUT)
     resp.raise_for_status()
-    caibx = io.BytesIO(resp.content)
-
-  caibx.seek(0, os.SEEK_END)
-  caibx_len = caibx.tell()
-  caibx.seek(0, os.SEEK_SET)
+    caibx = resp.content
 
   # Parse header
-  length, magic, flags, min_size, _, max_size = struct.unpack("<QQQQQQ", caibx.read(CA_HEADER_LEN))
+  length, magic, flags, min_size, _, max_size = struct.unpack_from("<QQQQQQ", caibx)
   assert flags == flags
   assert length == CA_HEADER_LEN
   assert magic == CA_FORMAT_INDEX
 
   # Parse table header
-  length, magic = struct.unpack("<QQ", caibx.read(CA_TABLE_HEADER_LEN))
+  length, magic = struct.unpack_from("<QQ", caibx, CA_HEADER_LEN)
   assert magic == CA_FORMAT_TABLE
 
-  # Parse chunks
-  num_chunks = (caibx_len - CA_HEADER_LEN - CA_TABLE_MIN_LEN) // CA_TABLE_ENTRY_LEN
-  chunks = []
-
-  offset = 0
-  for i in range(num_chunks):
-    new_offset = struct.unpack("<Q", caibx.read(8))[0]
-
-    sha = caibx.read(32)
-    length = new_offset - offset
-
-    assert length <= max_size
+  # Parse chunks, the table entries hold the end offset of each chunk
+  num_chunks = max(0, (len(caibx) - CA_HEADER_LEN - CA_TABLE_MIN_LEN) // CA_TABLE_ENTRY_LEN)
+  table = np.frombuffer(caibx, dtype=CA_TABLE_ENTRY, count=num_chunks, offset=CA_HEADER_LEN + CA_TABLE_HEADER_LEN)
+  ends = table['offset'].astype(np.int64)
+  offsets = np.concatenate(([0], ends[:-1]))
+  lengths = ends - offsets
 
-    # Last chunk can be smaller
-    if i < num_chunks - 1:
-      assert length >= min_size
+  assert np.all(lengths <= max_size)
+  # Last chunk can be smaller
+  assert np.all(lengths[:-1] >= min_size)
 
-    chunks.append(Chunk(sha, offset, length))
-    offset = new_offset
-
-  caibx.close()
-  return chunks
+  return list(map(Chunk, table['sha'].tolist(), offsets.tolist(), lengths.tolist()))
 
 
 def build_chunk_dict(chunks: list[Chunk]) -> ChunkDict:
@@ -165,41 +188,83 @@ def build_chunk_dict(chunks: list[Chunk]) -> ChunkDict:
   return r
 
 
+def _decode_chunk(chunk_reader: ChunkReader, contents: bytes, chunk: Chunk) -> bytes | None:
+  bts = chunk_reader.decode(contents)
+
+  # Check length
+  if len(bts) != chunk.length:
+    return None
+
+  # Check hash
+  if SHA512.new(bts, truncate="256").digest() != chunk.sha:
+    return None
+  return bts
+
+
 def extract(target: list[Chunk],
             sources: list[tuple[str, ChunkReader, ChunkDict]],
             out_path: str,
-            progress: Callable[[int], None] = None):
+            progress: Callable[[int], None] = None,
+            fetch_workers: int = EXTRACT_FETCH_WORKERS,
+            workers: int = EXTRACT_WORKERS):
+  """Writes the target chunks to out_path, reading each chunk from the first source that has it.
+
+  Chunks are fetched concurrently and decompressed and hashed on a worker pool, then written at their
+  offset, so they finish in any order. A chunk that occurs several times in the target is only read once,
+  the other copies are counted as 'dedup' in the returned stats."""
   stats: dict[str, int] = defaultdict(int)
 
+  # Every offset each chunk has to be written to, in target order
+  positions: dict[bytes, list[Chunk]] = {}
+  for cur_chunk in target:
+    positions.setdefault(cur_chunk.sha, []).append(cur_chunk)
+
   mode = 'rb+' if os.path.exists(out_path) else 'wb'
-  with open(out_path, mode) as out:
-    for cur_chunk in target:
+  with open(out_path, mode) as out, \
+       ThreadPoolExecutor(fetch_workers, thread_name_prefix='casync_fetch') as fetch_pool, \
+       ThreadPoolExecutor(workers, thread_name_prefix='casync_decode') as decode_pool:
+    fd = out.fileno()
+
+    def extract_chunk(chunks: list[Chunk]) -> str:
+      cur_chunk = chunks[0]
 
       # Find source for desired chunk
       for name, chunk_reader, store_chunks in sources:
         if cur_chunk.sha in store_chunks:
-          bts = chunk_reader.read(store_chunks[cur_chunk.sha])
-
-          # Check length
-          if len(bts) != cur_chunk.length:
-            continue
-
-          # Check hash
-          if SHA512.new(bts, truncate="256").digest() != cur_chunk.sha:
+          contents = chunk_reader.fetch(store_chunks[cur_chunk.sha])
+          bts = decode_pool.submit(_decode_chunk, chunk_reader, contents, cur_chunk).result()
+          if bts is None:
             continue
 
           # Write to output
-          out.seek(cur_chunk.offset)
-          out.write(bts)
-
-          stats[name] += cur_chunk.length
-
-          if progress is not None:
-            progress(sum(stats.values()))
-
+          for c in chunks:
+            os.pwrite(fd, bts, c.offset)
+          return name
+
+      raise RuntimeError("Desired chunk not found in provided stores")
+
+    queued = iter(positions.values())
+    pending: dict[Future, list[Chunk]] = {}
+    try:
+      while True:
+        while len(pending) < EXTRACT_QUEUE_DEPTH * fetch_workers and (chunks := next(queued, None)) is not None:
+          pending[fetch_pool.submit(extract_chunk, chunks)] = chunks
+        if not pending:
           break
-      else:
-        raise RuntimeError("Desired chunk not found in provided stores")
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+          chunks = pending.pop(future)
+          stats[future.result()] += chunks[0].length
+          if len(chunks) > 1:
+            stats['dedup'] += sum(c.length for c in chunks[1:])
+
+        if progress is not None:
+          progress(sum(stats.values()))
+    except BaseException:
+      for future in pending:
+        future.cancel()
+      raise
 
   return stats
 
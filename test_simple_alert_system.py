@@ -0,0 +1,256 @@
+import queue
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+import simple_alert_system
+from simple_alert_system import (AlertBus, CameraUpdate, DropOldestQueue, LaneTracker, MotionDetector, MultiCameraSupervisor,
+                                 SimpleAlertSystem, StageStats, camera_worker, evaluate_video)
+
+WIDTH, HEIGHT = 640, 480
+NO_EDGES = (np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32))
+
+
+def write_clip(path, frames=30, fps=30, box_from=2):
+    """A static gray scene where a large box appears at frame box_from"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (320, 240))
+    for i in range(frames):
+        frame = np.full((240, 320, 3), 90, dtype=np.uint8)
+        if i >= box_from:
+            cv2.rectangle(frame, (100, 80), (200, 160), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def test_drop_oldest_queue():
+    q = DropOldestQueue(maxsize=2)
+    for i in range(5):
+        q.put(i)
+    # a full queue drops its oldest items and counts them
+    assert q.dropped == 3
+    assert [q.get(), q.get()] == [3, 4]
+    assert q.get(timeout=0.01) is None
+
+    # closing wakes up a blocked consumer
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(q.get()))
+    consumer.start()
+    q.close()
+    consumer.join(timeout=1.0)
+    assert result == [None] and q.closed
+
+
+def test_stage_stats(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(simple_alert_system.time, "monotonic", lambda: now[0])
+    stats = StageStats("process", window=10)
+    assert stats.fps() == 0.0
+    assert stats.summary() == "   process: no frames"
+
+    for i in range(20):
+        stats.record(0.110 if i % 10 == 0 else 0.010)
+        now[0] += 0.05
+    # only the last `window` frames count
+    assert stats.fps() == pytest.approx(20.0)
+    assert stats.summary() == "   process:  20.0 fps |   20.0 ms avg |   65.0 ms p95"
+
+
+def lane_edges(left=0.3, right=0.7, slope=0.4):
+    """Normalized edge pixels of two straight lane lines, x at the evaluation row given by left and right"""
+    ys = np.linspace(0.6, 1.0, 100, dtype=np.float32)
+    xs = np.concatenate([left - slope * (ys - 0.9), right + slope * (ys - 0.9)])
+    return xs, np.concatenate([ys, ys])
+
+
+def hough_lines(left=0.3, right=0.7, slope=0.4):
+    """One Hough segment in pixels per side, a little off the true lines"""
+    def segment(x, s):
+        return np.array([[(x + s * -0.3 + 0.01) * WIDTH, 0.6 * HEIGHT, (x + s * 0.1 + 0.01) * WIDTH, HEIGHT]], dtype=np.float32)
+    return segment(left, -slope), segment(right, slope)
+
+
+def test_lane_tracker():
+    tracker = LaneTracker()
+    # edge pixels alone don't acquire anything
+    tracker.update(lane_edges(), None, WIDTH, HEIGHT)
+    assert not tracker.left.tracking and not tracker.right.tracking
+
+    # acquired from Hough lines, then converges on the edge pixels
+    tracker.update(lane_edges(), hough_lines(), WIDTH, HEIGHT)
+    assert tracker.acquired
+    for _ in range(10):
+        tracker.update(lane_edges(), None, WIDTH, HEIGHT)
+    assert tracker.positions(WIDTH) == pytest.approx((0.3 * WIDTH, 0.7 * WIDTH), abs=2)
+
+    # follows lines that drift without Hough lines
+    for i in range(1, 21):
+        tracker.update(lane_edges(0.3 + 0.005 * i, 0.7 + 0.005 * i), None, WIDTH, HEIGHT)
+    assert tracker.positions(WIDTH) == pytest.approx((0.4 * WIDTH, 0.8 * WIDTH), abs=3)
+
+    # coasts through max_missed frames without edges, then loses the lines
+    for _ in range(tracker.left.max_missed):
+        tracker.update(NO_EDGES, None, WIDTH, HEIGHT)
+    assert tracker.acquired
+    tracker.update(NO_EDGES, None, WIDTH, HEIGHT)
+    assert tracker.positions(WIDTH) == (None, None)
+
+    # and reacquires them from the next Hough lines
+    tracker.update(lane_edges(), hough_lines(), WIDTH, HEIGHT)
+    assert tracker.acquired
+    for _ in range(10):
+        tracker.update(lane_edges(), None, WIDTH, HEIGHT)
+    assert tracker.positions(WIDTH) == pytest.approx((0.3 * WIDTH, 0.7 * WIDTH), abs=2)
+
+
+def test_lane_offset_per_frame():
+    system = SimpleAlertSystem(detect_motion=False)
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    system.lane_tracker.update(lane_edges(0.25, 0.65), hough_lines(0.25, 0.65), WIDTH, HEIGHT)
+    alert, offset = system.detect_lane_departure(frame, frame_id=1)
+    # returned with the frame's alert, so a worker never picks up the offset of another worker's frame
+    assert alert is None and offset == pytest.approx(0.05 * WIDTH, abs=3)
+
+    system.lane_tracker = LaneTracker()
+    assert system.detect_lane_departure(frame, frame_id=2) == (None, None)
+
+
+@pytest.mark.parametrize("model", ["average", "mog2"])
+def test_motion_detector(model):
+    detector = MotionDetector(model=model)
+    background = np.full((240, 320), 90, dtype=np.uint8)
+
+    def feed(x=None, size=80):
+        frame = background.copy()
+        if x is not None:
+            frame[80:80 + size, x:x + size] = 255
+        return detector.update(detector.prepare(frame), frame.shape[1])
+
+    # a static scene never alerts
+    assert not any(feed() for _ in range(30))
+
+    # nor does a large blob that only shows up for a single frame
+    assert not feed(100)
+    assert not any(feed() for _ in range(10))
+
+    # nor a persistent blob smaller than min_area
+    assert not any(feed(100 + 4 * i, size=20) for i in range(10))
+    assert not any(feed() for _ in range(10))
+
+    # a large moving blob alerts once it has persisted for `persistence` frames
+    alerts = [feed(60 + 8 * i) for i in range(6)]
+    assert alerts[:detector.persistence] == [False] * (detector.persistence - 1) + [True]
+
+
+class FakeCapture:
+    """A stream that delivers `frames` frames, then fails. None can't be opened at all"""
+
+    def __init__(self, frames, on_end):
+        self.frames = frames
+        self.on_end = on_end
+
+    def isOpened(self):
+        return self.frames is not None
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        if not self.frames:
+            self.on_end()
+            return False, None
+        self.frames -= 1
+        return True, np.zeros((240, 320, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+class FakeStopEvent:
+    """Records the backoff waits instead of sleeping"""
+
+    def __init__(self):
+        self.stopped = False
+        self.waits = []
+
+    def is_set(self):
+        return self.stopped
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+        return self.stopped
+
+
+class UpdateQueue(queue.Queue):
+    def cancel_join_thread(self):
+        pass
+
+
+def run_worker(monkeypatch, connections, maxsize=0):
+    stop_event = FakeStopEvent()
+    script = list(connections)
+
+    def open_capture(source):
+        frames = script.pop(0)
+        # the worker is stopped once the last stream of the script has ended
+        return FakeCapture(frames, lambda: setattr(stop_event, "stopped", not script))
+
+    monkeypatch.setattr(simple_alert_system.cv2, "VideoCapture", open_capture)
+    updates = UpdateQueue(maxsize)
+    camera_worker(1, "rtsp://camera", {"detect_motion": False}, updates, stop_event)
+    return list(updates.queue), stop_event.waits
+
+
+def test_camera_worker_reconnects(monkeypatch):
+    # two failed connections, a stream that's lost after 3 frames, then one that's lost after 2
+    updates, waits = run_worker(monkeypatch, [None, None, 3, 2])
+    assert [(u.status, u.frame_id) for u in updates] == [
+        ("connecting", 0), ("cannot connect, retry in 1s", 0),
+        ("connecting", 0), ("cannot connect, retry in 2s", 0),
+        ("connecting", 0), ("live", 1), ("live", 2), ("live", 3), ("stream lost, retry in 1s", 0),
+        ("connecting", 0), ("live", 4), ("live", 5), ("stream lost, retry in 1s", 0),
+    ]
+    # exponential backoff, reset by the first frame after a reconnect
+    assert waits == [1.0, 2.0, 1.0, 1.0]
+    assert all(u.camera == 1 and u.dropped == 0 for u in updates)
+    assert all(u.frame is not None for u in updates if u.status == "live")
+
+
+def test_camera_worker_drops_oldest(monkeypatch):
+    updates, _ = run_worker(monkeypatch, [5], maxsize=2)
+    # the supervisor fell behind: only the freshest updates are left, with the count of the dropped ones
+    assert [(u.status, u.frame_id, u.dropped) for u in updates] == [("live", 5, 4), ("stream lost, retry in 1s", 0, 5)]
+
+    supervisor = MultiCameraSupervisor(["a", "b"], {})
+    supervisor.handle_update(CameraUpdate(0, "live", 1, np.zeros((90, 160, 3), dtype=np.uint8), lane_offset=-12.0), 1.0)
+    for update in updates:
+        update.camera = 1
+        supervisor.handle_update(update, 1.0)
+    supervisor.handle_update(CameraUpdate(1, "live", 6, np.zeros((90, 160, 3), dtype=np.uint8), lane_offset=8.0, dropped=2), 1.1)
+    # every update only touches its own camera, and the dropped count never goes back
+    assert supervisor.lane_offsets == [-12.0, 8.0]
+    assert supervisor.dropped == [0, 5]
+    assert supervisor.status == ["live", "live"]
+    assert supervisor.compose(1.2).shape == (360, 1280, 3)
+
+
+def test_alert_bus_cooldown():
+    bus = AlertBus()
+    assert [bus.accept("MOTION_DETECTED", t) for t in (0.0, 0.5, 0.9, 1.5)] == [True, False, False, True]
+    assert not bus.accept("LEFT_LANE_DEPARTURE", 2.5)
+    assert bus.accept("LEFT_LANE_DEPARTURE", 3.6)
+    assert bus.alerts == ["MOTION_DETECTED", "MOTION_DETECTED", "LEFT_LANE_DEPARTURE"]
+
+
+def test_evaluate_video_counts_first_alert(tmp_path):
+    path = tmp_path / "clip.avi"
+    write_clip(path)
+    result = evaluate_video(str(path), {})
+    assert result["frames"] == 30
+
+    # the first detection comes well within the motion cooldown of the start of the clip
+    first = result["events"][0]
+    assert first["alert"] == "MOTION_DETECTED"
+    assert first["time"] < 1.0
+    assert first["accepted"]
@@ -1,12 +1,33 @@
+import contextlib
+import json
+import mmap
+import os
 import numpy as np
 import threading
 import multiprocessing
 import bisect
-from collections import defaultdict
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from operator import attrgetter
 from tqdm import tqdm
+from openpilot.common.file_helpers import atomic_write_in_dir
 from openpilot.common.swaglog import cloudlog
 from openpilot.selfdrive.test.process_replay.migration import migrate_all
+from openpilot.system.hardware.hw import Paths
 from openpilot.tools.lib.logreader import _LogFileReader, LogReader
+from openpilot.tools.lib.url_file import hash_256
+
+EXTRACTOR_VERSION = 2  # bump when the extracted columns change, invalidates cached segments
+CACHE_ALIGNMENT = 64
+NO_DISCRIMINANT = 0xffff  # capnp discriminantValue of fields that aren't part of a union
+SCALAR_DTYPES = {
+  'bool': np.bool_, 'int8': np.int8, 'int16': np.int16, 'int32': np.int32, 'int64': np.int64,
+  'uint8': np.uint8, 'uint16': np.uint16, 'uint32': np.uint32, 'uint64': np.uint64,
+  'float32': np.float32, 'float64': np.float64,
+}
+
+LOD_BASE_WIDTH = 1 / 128  # seconds, width of the finest min/max bucket
+LOD_LEVELS = 16  # each level doubles the bucket width, up to ~4 minutes
 
 
 def flatten_dict(d: dict, sep: str = "/", prefix: str = None) -> dict:
@@ -107,11 +128,292 @@ def _get_field_times_values(segment, field_name):
     return segment_times, field_data['values']
 
 
+def _concatenate_values(values):
+  if len(values) == 1:
+    return values[0]
+  first_dtype = values[0].dtype
+  if all(arr.dtype == first_dtype for arr in values):  # check if all arrays have compatible dtypes
+    return np.concatenate(values)
+  return np.concatenate([arr.astype(object) for arr in values])
+
+
+def _is_plottable_dtype(dtype):
+  return np.issubdtype(dtype, np.number) or np.issubdtype(dtype, np.bool_)
+
+
+def _first_in_group(positions, group):
+  keep = np.ones(len(positions), dtype=bool)
+  keep[1:] = group[positions[1:]] != group[positions[:-1]]
+  return positions[keep]
+
+
+def _reduce_buckets(idx, tmin, vmin, tmax, vmax):
+  """Merge runs of equal bucket indices (idx must be sorted) into a single min/max bucket each."""
+  if len(idx) == 0:
+    return idx, tmin, vmin, tmax, vmax
+
+  starts = np.concatenate(([0], np.flatnonzero(np.diff(idx)) + 1))
+  group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(idx))))
+  group_min = np.minimum.reduceat(vmin, starts)
+  group_max = np.maximum.reduceat(vmax, starts)
+  min_pos = _first_in_group(np.flatnonzero(vmin == group_min[group]), group)
+  max_pos = _first_in_group(np.flatnonzero(vmax == group_max[group]), group)
+  return idx[starts], tmin[min_pos], group_min, tmax[max_pos], group_max
+
+
+class LODPyramid:
+  """
+  Min/max level-of-detail pyramid of a time series. Level k holds the min and max sample
+  (and their times) of every non-empty bucket of LOD_BASE_WIDTH * 2**k seconds, aligned to
+  absolute time so the levels of consecutive segments can be appended without a rebuild.
+  """
+  def __init__(self):
+    self._chunks: list[list[tuple]] = [[] for _ in range(LOD_LEVELS)]
+
+  @staticmethod
+  def build(times, values) -> list[tuple]:
+    values = values.astype(np.float64)
+    finite = np.isfinite(values)
+    times, values = times[finite], values[finite]
+    levels = [_reduce_buckets(np.floor(times / LOD_BASE_WIDTH).astype(np.int64), times, values, times, values)]
+    for _ in range(1, LOD_LEVELS):
+      idx, *rest = levels[-1]
+      levels.append(_reduce_buckets(idx >> 1, *rest))
+    return levels
+
+  def append(self, times, values):
+    for chunks, level in zip(self._chunks, self.build(times, values), strict=True):
+      if len(level[0]) == 0:
+        continue
+      if chunks and chunks[-1][0][-1] == level[0][0]:  # bucket straddles the segment boundary
+        last = chunks[-1]
+        merged = _reduce_buckets(*(np.array([a[-1], b[0]]) for a, b in zip(last, level, strict=True)))
+        for arr, value in zip(last, merged, strict=True):
+          arr[-1] = value[0]
+        level = tuple(arr[1:] for arr in level)
+      if len(level[0]):
+        chunks.append(level)
+
+  def _level(self, k):
+    chunks = self._chunks[k]
+    if len(chunks) > 1:
+      chunks[:] = [tuple(np.concatenate(arrs) for arrs in zip(*chunks, strict=True))]
+    return chunks[0] if chunks else None
+
+  def query(self, x_min: float, x_max: float, max_points: int):
+    """Returns min/max points covering [x_min, x_max] with at most ~4 * max_points points,
+    or None if the range needs more detail than the finest level holds."""
+    bucket_width = (x_max - x_min) / max(max_points, 1)
+    if bucket_width < LOD_BASE_WIDTH:
+      return None
+    k = min(int(np.log2(bucket_width / LOD_BASE_WIDTH)), LOD_LEVELS - 1)
+    level = self._level(k)
+    if level is None:
+      return np.array([]), np.array([])
+
+    idx, tmin, vmin, tmax, vmax = level
+    width = LOD_BASE_WIDTH * 2**k
+    lo = max(np.searchsorted(idx, np.floor(x_min / width), 'left') - 1, 0)  # one bucket past each edge
+    hi = min(np.searchsorted(idx, np.floor(x_max / width), 'right') + 1, len(idx))
+    tmin, vmin, tmax, vmax = tmin[lo:hi], vmin[lo:hi], tmax[lo:hi], vmax[lo:hi]
+
+    min_first = tmin <= tmax
+    times = np.empty(2 * len(tmin))
+    values = np.empty(2 * len(tmin))
+    times[0::2], times[1::2] = np.where(min_first, tmin, tmax), np.where(min_first, tmax, tmin)
+    values[0::2], values[1::2] = np.where(min_first, vmin, vmax), np.where(min_first, vmax, vmin)
+    return times, values
+
+
+class _SeriesCache:
+  """Per path segment chunks, their concatenated view and LOD pyramid, extended as segments arrive."""
+  def __init__(self):
+    self.times: list[np.ndarray] = []
+    self.values: list[np.ndarray] = []
+    self.view: tuple[np.ndarray, np.ndarray] | None = None
+    self.lod: LODPyramid | None = None
+
+  def append(self, times, values):
+    self.times.append(times)
+    self.values.append(values)
+    self.view = None
+    if self.lod is not None:
+      self.lod.append(times, values)
+
+
+class _FieldGroup:
+  """Fields that are present under the same set of union discriminants, read together with one attrgetter."""
+  def __init__(self, conditions: tuple):
+    self.conditions = [(attrgetter(parent) if parent else None, name) for parent, name in conditions]
+    self.paths: list[str] = []
+    self.attrs: list[str] = []
+    self.dtypes: list = []
+    self.decoders: dict[int, object] = {}
+    self.lists: list[tuple[str, attrgetter]] = []
+
+  def add(self, path: str, attr: str, dtype, decoder=None):
+    if decoder is not None:
+      self.decoders[len(self.paths)] = decoder
+    self.paths.append(path)
+    self.attrs.append(attr)
+    self.dtypes.append(dtype)
+
+  def compile(self):
+    self.dtype = np.dtype([(f"f{i}", dtype) for i, dtype in enumerate(self.dtypes)])
+    if len(self.attrs) == 1:
+      getter = attrgetter(self.attrs[0])
+      self.getter = lambda msg: (getter(msg),)
+    elif self.attrs:
+      self.getter = attrgetter(*self.attrs)
+    else:
+      self.getter = lambda msg: ()
+
+  def is_present(self, msg) -> bool:
+    for getter, name in self.conditions:
+      if (msg if getter is None else getter(msg)).which() != name:
+        return False
+    return True
+
+
+def _enum_decoder(enumerants: dict):
+  names = np.array([str(i) for i in range(max(enumerants.values(), default=0) + 1)], dtype=object)
+  for name, value in enumerants.items():
+    names[value] = name
+
+  def decode(codes):
+    known = codes < len(names)
+    return np.where(known, names[np.where(known, codes, 0)], codes.astype(str).astype(object))
+  return decode
+
+
+def _to_python(value):
+  if hasattr(value, 'to_dict'):
+    return value.to_dict(verbose=True)
+  if isinstance(value, (str, bytes, bool, int, float)):
+    return value
+  if hasattr(value, '__len__'):
+    return [_to_python(v) for v in value]
+  return str(value)  # enum
+
+
+class MessageExtractor:
+  """
+  Compiled from a message schema: scalar, enum and text fields are read with attrgetters straight
+  into typed NumPy columns, grouped by the union members they depend on. Lists have a variable
+  number of elements and are flattened into sparse columns, like to_dict() would.
+  """
+  _cache: dict[int, 'MessageExtractor'] = {}
+
+  def __init__(self, schema):
+    self._groups: dict[tuple, _FieldGroup] = {}
+    self._compile(schema, '', '', ())
+    self.groups = [group for group in self._groups.values() if group.paths or group.lists]
+    for group in self.groups:
+      group.compile()
+
+  @classmethod
+  def for_schema(cls, schema) -> 'MessageExtractor':
+    key = schema.node.id
+    if key not in cls._cache:
+      cls._cache[key] = cls(schema)
+    return cls._cache[key]
+
+  def _compile(self, schema, attr_prefix: str, path_prefix: str, conditions: tuple):
+    for field in schema.fields_list:
+      proto = field.proto
+      attr, path = attr_prefix + proto.name, path_prefix + proto.name
+      field_conditions = conditions
+      if proto.discriminantValue != NO_DISCRIMINANT:
+        field_conditions = conditions + ((attr_prefix[:-1], proto.name),)
+      if field_conditions not in self._groups:
+        self._groups[field_conditions] = _FieldGroup(field_conditions)
+      group = self._groups[field_conditions]
+
+      if proto.which() == 'group':
+        self._compile(field.schema, attr + '.', path + '/', field_conditions)
+        continue
+
+      field_type = proto.slot.type.which()
+      if field_type in SCALAR_DTYPES:
+        group.add(path, attr, SCALAR_DTYPES[field_type])
+      elif field_type == 'enum':
+        group.add(path, attr + '.raw', np.uint16, _enum_decoder(field.schema.enumerants))
+      elif field_type in ('text', 'data'):
+        group.add(path, attr, object)
+      elif field_type == 'struct':
+        self._compile(field.schema, attr + '.', path + '/', field_conditions)
+      elif field_type == 'list':
+        group.lists.append((path, attrgetter(attr)))
+
+
+def _make_column(values, t_index=None):
+  if t_index is None:
+    return {'values': values, 'sparse': False}
+  if len(t_index):  # check if indices > uint16 max, currently would require a 1000+ Hz signal since indices are within segments
+    assert t_index[-1] <= 65535, f"Sparse field has timestamp indices exceeding uint16 max. Max: {t_index[-1]}"
+  return {'values': values, 'sparse': True, 't_index': np.asarray(t_index, dtype=np.uint16)}
+
+
+class _TypeColumns:
+  def __init__(self, extractor: MessageExtractor, capacity: int):
+    self.extractor = extractor
+    self.count = 0
+    self.t = np.empty(capacity, dtype=np.float64)
+    self.valid = np.empty(capacity, dtype=np.bool_)
+    self.rows = [np.zeros(capacity, dtype=group.dtype) for group in extractor.groups]
+    self.present = [np.zeros(capacity, dtype=np.bool_) for _ in extractor.groups]
+    self.list_fields: dict[str, tuple[list, list]] = defaultdict(lambda: ([], []))
+
+  def append(self, msg, sub_msg, timestamp: float):
+    # read everything first, so a message that fails halfway doesn't leave a partial row behind
+    rows, list_values = [], []
+    for i, group in enumerate(self.extractor.groups):
+      if group.is_present(sub_msg):
+        rows.append((i, group.getter(sub_msg)))
+        for path, getter in group.lists:
+          list_values.extend(flatten_dict(_to_python(getter(sub_msg)), prefix=path).items())
+
+    row = self.count
+    for i, values in rows:
+      self.rows[i][row] = values
+      self.present[i][row] = True
+    for field, value in list_values:
+      if value is not None:
+        indices, values = self.list_fields[field]
+        indices.append(row)
+        values.append(value)
+    self.t[row] = timestamp
+    self.valid[row] = msg.valid
+    self.count += 1
+
+  def finalize(self, typ: str, field_types: dict) -> dict:
+    n = self.count
+    result = {'t': self.t[:n].copy()}
+    for group, rows, present in zip(self.extractor.groups, self.rows, self.present, strict=True):
+      present = present[:n]
+      if not present.any():
+        continue
+      t_index = None if present.all() else np.flatnonzero(present)
+      rows = rows[:n] if t_index is None else rows[:n][t_index]
+      for i, path in enumerate(group.paths):
+        values = np.ascontiguousarray(rows[f"f{i}"])
+        if i in group.decoders:
+          values = group.decoders[i](values)
+        result[path] = _make_column(values, t_index)
+
+    result['_valid'] = _make_column(self.valid[:n].copy())
+    for field, (indices, values) in self.list_fields.items():
+      capnp_type = _match_field_type(f"{typ}/{field}", field_types)
+      result[field] = _make_column(_convert_to_optimal_dtype(values, capnp_type), None if len(indices) == n else indices)
+    return result
+
+
 def msgs_to_time_series(msgs):
   """Extract scalar fields and return (time_series_data, start_time, end_time)."""
-  collected_data = defaultdict(lambda: {'timestamps': [], 'columns': defaultdict(list), 'sparse_fields': set()})
-  field_types = {}
-  extracted_schemas = set()
+  msgs = list(msgs)
+  counts = Counter(msg.which() for msg in msgs)
+  type_columns: dict[str, _TypeColumns] = {}
+  field_types: dict[str, str] = {}
   min_time = max_time = None
 
   for msg in msgs:
@@ -126,86 +428,176 @@ def msgs_to_time_series(msgs):
     if not hasattr(sub_msg, 'to_dict'):
       continue
 
-    if hasattr(sub_msg, 'schema') and typ not in extracted_schemas:
+    columns = type_columns.get(typ)
+    if columns is None:
       extract_field_types(sub_msg.schema, typ, field_types)
-      extracted_schemas.add(typ)
+      field_types[f"{typ}/_valid"] = 'bool'
+      columns = type_columns[typ] = _TypeColumns(MessageExtractor.for_schema(sub_msg.schema), counts[typ])
 
     try:
-      msg_dict = sub_msg.to_dict(verbose=True)
+      columns.append(msg, sub_msg, timestamp)
     except Exception as e:
-      cloudlog.warning(f"Failed to convert sub_msg.to_dict() for message of type: {typ}: {e}")
-      continue
-
-    flat_dict = flatten_dict(msg_dict)
-    flat_dict['_valid'] = msg.valid
-    field_types[f"{typ}/_valid"] = 'bool'
+      cloudlog.warning(f"Failed to extract fields for message of type: {typ}: {e}")
 
-    type_data = collected_data[typ]
-    columns, sparse_fields = type_data['columns'], type_data['sparse_fields']
-    known_fields = set(columns.keys())
-    missing_fields = known_fields - flat_dict.keys()
+  final_result = {typ: columns.finalize(typ, field_types) for typ, columns in type_columns.items() if columns.count}
+  return final_result, min_time or 0.0, max_time or 0.0
 
-    for field, value in flat_dict.items():
-      if field not in known_fields and type_data['timestamps']:
-        sparse_fields.add(field)
-      columns[field].append(value)
-      if value is None:
-        sparse_fields.add(field)
 
-    for field in missing_fields:
-      columns[field].append(None)
-      sparse_fields.add(field)
+def segment_cache_path(segment_identifier: str) -> str:
+  key = segment_identifier
+  if os.path.isfile(segment_identifier):
+    st = os.stat(segment_identifier)
+    key += f":{st.st_size}:{st.st_mtime_ns}"
+  return os.path.join(Paths.download_cache_root(), "jotpluggler", f"{hash_256(key)}_v{EXTRACTOR_VERSION}.bin")
+
+
+def _pack_objects(values) -> tuple[str, np.ndarray, np.ndarray]:
+  """Packs a text or data column into int64 offsets and one concatenated buffer, value i is buffer[offsets[i]:offsets[i + 1]]."""
+  is_data = len(values) > 0 and all(isinstance(v, bytes) for v in values)
+  items = list(values) if is_data else [str(v).encode() for v in values]
+  offsets = np.zeros(len(items) + 1, dtype=np.int64)
+  np.cumsum([len(item) for item in items], out=offsets[1:])
+  return 'data' if is_data else 'text', offsets, np.frombuffer(b''.join(items), dtype=np.uint8)
+
+
+def _unpack_objects(kind: str, offsets: np.ndarray, buffer: np.ndarray) -> np.ndarray:
+  data = buffer.tobytes()
+  bounds = offsets.tolist()
+  items = [data[start:end] for start, end in zip(bounds[:-1], bounds[1:], strict=True)]
+  values = np.empty(len(items), dtype=object)
+  values[:] = items if kind == 'data' else [item.decode() for item in items]
+  return values
+
+
+def save_segment_cache(path: str, segment_data: dict, start_time: float, end_time: float) -> None:
+  """
+  Cache file layout: little endian uint64 header size, JSON header, then the raw column arrays,
+  each aligned to CACHE_ALIGNMENT. The header has the offset, dtype and length of every array.
+  Text and data columns are stored as offsets into one concatenated buffer, see _pack_objects.
+  """
+  arrays: list[np.ndarray] = []
+  offset = 0
+
+  def add_array(arr):
+    nonlocal offset
+    if arr.dtype == object:
+      kind, offsets, buffer = _pack_objects(arr)
+      return {'kind': kind, 'offsets': add_array(offsets), 'buffer': add_array(buffer)}
+    arr = np.ascontiguousarray(arr)
+    offset = -(-offset // CACHE_ALIGNMENT) * CACHE_ALIGNMENT
+    arrays.append((offset, arr))
+    entry = (offset, arr.dtype.str, len(arr))
+    offset += arr.nbytes
+    return entry
+
+  types = {}
+  for typ, data in segment_data.items():
+    fields = []
+    for field_name, column in data.items():
+      if field_name != 't':
+        fields.append((field_name, add_array(column['values']), add_array(column['t_index']) if column['sparse'] else None))
+    types[typ] = {'t': add_array(data['t']), 'fields': fields}
+
+  header = json.dumps({'start_time': start_time, 'end_time': end_time, 'types': types}).encode()
+  data_start = -(-(8 + len(header)) // CACHE_ALIGNMENT) * CACHE_ALIGNMENT
+
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with atomic_write_in_dir(path, mode='wb', overwrite=True) as f:
+    f.write(len(header).to_bytes(8, 'little'))
+    f.write(header)
+    for array_offset, arr in arrays:
+      f.seek(data_start + array_offset)
+      f.write(arr.data)
+
+
+class _CachedMessageData(Mapping):
+  def __init__(self, buf, data_start: int, t, fields: list):
+    self._buf = buf
+    self._data_start = data_start
+    self._t = t
+    self._fields = {name: (values, t_index) for name, values, t_index in fields}
+    self._loaded: dict = {}
+
+  def _array(self, entry):
+    if isinstance(entry, dict):
+      return _unpack_objects(entry['kind'], self._array(entry['offsets']), self._array(entry['buffer']))
+    offset, dtype, count = entry
+    if count == 0:
+      return np.empty(0, dtype=dtype)
+    return np.frombuffer(self._buf, dtype=dtype, count=count, offset=self._data_start + offset)
+
+  def __getitem__(self, key):
+    if key not in self._loaded:
+      if key == 't':
+        self._loaded[key] = self._array(self._t)
+      else:
+        values, t_index = self._fields[key]
+        column = {'values': self._array(values), 'sparse': t_index is not None}
+        if t_index is not None:
+          column['t_index'] = self._array(t_index)
+        self._loaded[key] = column
+    return self._loaded[key]
 
-    type_data['timestamps'].append(timestamp)
+  def __contains__(self, key):
+    return key == 't' or key in self._fields
 
-  final_result = {}
-  for typ, data in collected_data.items():
-    if not data['timestamps']:
-      continue
+  def __iter__(self):
+    yield 't'
+    yield from self._fields
 
-    typ_result = {'t': np.array(data['timestamps'], dtype=np.float64)}
-    sparse_fields = data['sparse_fields']
+  def __len__(self):
+    return len(self._fields) + 1
 
-    for field_name, values in data['columns'].items():
-      if len(values) < len(data['timestamps']):
-        values = [None] * (len(data['timestamps']) - len(values)) + values
-        sparse_fields.add(field_name)
 
-      capnp_type = _match_field_type(f"{typ}/{field_name}", field_types)
+class CachedSegment(Mapping):
+  """Segment data memory mapped from a cache file. Columns are only read from disk when first accessed."""
+  def __init__(self, path: str):
+    with open(path, 'rb') as f:
+      self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header_size = int.from_bytes(self._buf[:8], 'little')
+    header = json.loads(self._buf[8:8 + header_size])
+    data_start = -(-(8 + header_size) // CACHE_ALIGNMENT) * CACHE_ALIGNMENT
+    self.start_time, self.end_time = header['start_time'], header['end_time']
+    self._types = {typ: _CachedMessageData(self._buf, data_start, info['t'], info['fields']) for typ, info in header['types'].items()}
 
-      if field_name in sparse_fields:  # extract non-None values and their indices
-        non_none_indices = []
-        non_none_values = []
-        for i, value in enumerate(values):
-          if value is not None:
-            non_none_indices.append(i)
-            non_none_values.append(value)
+  def __getitem__(self, key):
+    return self._types[key]
 
-        if non_none_values: # check if indices > uint16 max, currently would require a 1000+ Hz signal since indices are within segments
-          assert max(non_none_indices) <= 65535, f"Sparse field {typ}/{field_name} has timestamp indices exceeding uint16 max. Max: {max(non_none_indices)}"
+  def __iter__(self):
+    return iter(self._types)
 
-        typ_result[field_name] = {
-          'values': _convert_to_optimal_dtype(non_none_values, capnp_type),
-          'sparse': True,
-          't_index': np.array(non_none_indices, dtype=np.uint16),
-        }
-      else:  # dense representation
-        typ_result[field_name] = {'values': _convert_to_optimal_dtype(values, capnp_type), 'sparse': False}
+  def __len__(self):
+    return len(self._types)
 
-    final_result[typ] = typ_result
 
-  return final_result, min_time or 0.0, max_time or 0.0
+def _open_segment_cache(path: str) -> CachedSegment | None:
+  if not os.path.isfile(path):
+    return None
+  try:
+    return CachedSegment(path)
+  except Exception as e:
+    cloudlog.warning(f"Warning: Failed to load cached segment {path}: {e}")
+    return None
 
 
 def _process_segment(segment_identifier: str):
   try:
     lr = _LogFileReader(segment_identifier, sort_by_time=True)
     migrated_msgs = migrate_all(lr)
-    return msgs_to_time_series(migrated_msgs)
+    segment_data, start_time, end_time = msgs_to_time_series(migrated_msgs)
   except Exception as e:
     cloudlog.warning(f"Warning: Failed to process segment {segment_identifier}: {e}")
     return {}, 0.0, 0.0
 
+  # return the cache file rather than the data, so it doesn't need to be sent back from the worker
+  path = segment_cache_path(segment_identifier)
+  try:
+    save_segment_cache(path, segment_data, start_time, end_time)
+    return path, start_time, end_time
+  except Exception as e:
+    cloudlog.warning(f"Warning: Failed to cache segment {segment_identifier}: {e}")
+    return segment_data, start_time, end_time
+
 
 class DataManager:
   def __init__(self):
@@ -214,6 +606,7 @@ class DataManager:
     self._start_time = 0.0
     self._duration = 0.0
     self._paths = set()
+    self._series_cache: dict[str, _SeriesCache] = {}
     self._observers = []
     self._loading = False
     self._lock = threading.RLock()
@@ -224,33 +617,49 @@ class DataManager:
     self._reset()
     threading.Thread(target=self._load_async, args=(route,), daemon=True).start()
 
-  def get_timeseries(self, path: str):
-    with self._lock:
+  def _get_series(self, path: str) -> _SeriesCache:
+    series = self._series_cache.get(path)
+    if series is None:
+      series = self._series_cache[path] = _SeriesCache()
       msg_type, field = path.split('/', 1)
-      times, values = [], []
-
       for segment in self._segments:
         if msg_type in segment:
           field_times, field_values = _get_field_times_values(segment[msg_type], field)
           if field_times is not None:
-            times.append(field_times)
-            values.append(field_values)
+            series.append(field_times, field_values)
+    return series
 
-      if not times:
+  def get_timeseries(self, path: str):
+    with self._lock:
+      series = self._get_series(path)
+      if not series.times:
         return np.array([]), np.array([])
 
-      combined_times = np.concatenate(times) - self._start_time
+      if series.view is None:
+        series.view = (np.concatenate(series.times) - self._start_time, _concatenate_values(series.values))
+      return series.view
 
-      if len(values) > 1:
-        first_dtype = values[0].dtype
-        if all(arr.dtype == first_dtype for arr in values):  # check if all arrays have compatible dtypes
-          combined_values = np.concatenate(values)
-        else:
-          combined_values = np.concatenate([arr.astype(object) for arr in values])
-      else:
-        combined_values = values[0] if values else np.array([])
+  def get_lod(self, path: str, x_min: float, x_max: float, max_points: int):
+    """Returns the samples of path to draw [x_min, x_max] at max_points horizontal resolution.
+    Work is proportional to max_points (plus the samples in range when zoomed in past the LOD)."""
+    with self._lock:
+      times, values = self.get_timeseries(path)
+      series = self._series_cache[path]
+      if len(times) == 0 or not _is_plottable_dtype(values.dtype):
+        return times, values
 
-      return combined_times, combined_values
+      if series.lod is None:
+        series.lod = LODPyramid()
+        for chunk_times, chunk_values in zip(series.times, series.values, strict=True):
+          series.lod.append(chunk_times, chunk_values)
+
+      result = series.lod.query(x_min + self._start_time, x_max + self._start_time, max_points)
+      if result is not None:
+        return result[0] - self._start_time, result[1]
+
+      lo = max(np.searchsorted(times, x_min, 'left') - 1, 0)
+      hi = np.searchsorted(times, x_max, 'right') + 1
+      return times[lo:hi], values[lo:hi]
 
   def get_value_at(self, path: str, time: float):
     with self._lock:
@@ -281,10 +690,14 @@ class DataManager:
       return self._duration
 
   def is_plottable(self, path: str):
-    _, values = self.get_timeseries(path)
-    if len(values) == 0:
+    with self._lock:
+      msg_type, field = path.split('/', 1)
+      for segment in self._segments:
+        if msg_type in segment:
+          _, field_values = _get_field_times_values(segment[msg_type], field)
+          if field_values is not None and len(field_values):
+            return _is_plottable_dtype(field_values.dtype)
       return False
-    return np.issubdtype(values.dtype, np.number) or np.issubdtype(values.dtype, np.bool_)
 
   def add_observer(self, callback):
     with self._lock:
@@ -301,6 +714,7 @@ class DataManager:
       self._segments.clear()
       self._segment_starts.clear()
       self._paths.clear()
+      self._series_cache.clear()
       self._start_time = self._duration = 0.0
       observers = self._observers.copy()
 
@@ -320,9 +734,21 @@ class DataManager:
       for callback in observers:
         callback({'metadata_loaded': True, 'total_segments': total_segments})
 
-      num_processes = max(1, multiprocessing.cpu_count() // 2)
-      with multiprocessing.Pool(processes=num_processes) as pool, tqdm(total=len(lr.logreader_identifiers), desc="Processing Segments") as pbar:
-        for segment_result, start_time, end_time in pool.imap(_process_segment, lr.logreader_identifiers):
+      # segments that were opened before are read lazily from their cache, only the rest are processed
+      cached = [_open_segment_cache(segment_cache_path(identifier)) for identifier in lr.logreader_identifiers]
+      missing = [identifier for identifier, segment in zip(lr.logreader_identifiers, cached, strict=True) if segment is None]
+
+      num_processes = max(1, min(len(missing), multiprocessing.cpu_count() // 2))
+      with (multiprocessing.Pool(processes=num_processes) if missing else contextlib.nullcontext()) as pool, \
+           tqdm(total=total_segments, desc="Processing Segments") as pbar:
+        processed = pool.imap(_process_segment, missing) if missing else iter(())
+        for segment in cached:
+          if segment is not None:
+            segment_result, start_time, end_time = segment, segment.start_time, segment.end_time
+          else:
+            segment_result, start_time, end_time = next(processed)
+            if isinstance(segment_result, str):
+              segment_result = _open_segment_cache(segment_result)
           pbar.update(1)
           if segment_result:
             self._add_segment(segment_result, start_time, end_time)
@@ -331,7 +757,7 @@ class DataManager:
     finally:
       self._finalize_loading()
 
-  def _add_segment(self, segment_data: dict, start_time: float, end_time: float):
+  def _add_segment(self, segment_data: Mapping, start_time: float, end_time: float):
     with self._lock:
       self._segments.append(segment_data)
       self._segment_starts.append(start_time)
@@ -345,6 +771,13 @@ class DataManager:
           if field_name != 't':
             self._paths.add(f"{msg_type}/{field_name}")
 
+      for path, series in self._series_cache.items():
+        msg_type, field = path.split('/', 1)
+        if msg_type in segment_data:
+          field_times, field_values = _get_field_times_values(segment_data[msg_type], field)
+          if field_times is not None:
+            series.append(field_times, field_values)
+
       observers = self._observers.copy()
 
     for callback in observers:
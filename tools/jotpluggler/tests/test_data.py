@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+
+from cereal import log
+from openpilot.tools.jotpluggler.data import LOD_LEVELS, CachedSegment, DataManager, LODPyramid, msgs_to_time_series, save_segment_cache
+
+
+def make_series(duration=600., hz=100., seed=0):
+  rng = np.random.default_rng(seed)
+  times = np.arange(0, duration, 1 / hz) + 1234.567
+  return times, np.cumsum(rng.standard_normal(len(times)))
+
+
+def make_segment(msg_type, times, values):
+  return {msg_type: {'t': times, 'x': {'values': values, 'sparse': False}}}
+
+
+class TestLODPyramid:
+  def test_incremental_matches_full_build(self):
+    times, values = make_series()
+    full = LODPyramid()
+    full.append(times, values)
+    incremental = LODPyramid()
+    for idxs in np.array_split(np.arange(len(times)), 7):
+      incremental.append(times[idxs], values[idxs])
+
+    for k in range(LOD_LEVELS):
+      for a, b in zip(full._level(k), incremental._level(k), strict=True):
+        np.testing.assert_array_equal(a, b)
+
+  def test_query_preserves_extremes(self):
+    times, values = make_series()
+    lod = LODPyramid()
+    lod.append(times, values)
+
+    for x_min, x_max, max_points in [(times[0], times[-1], 1000), (1300., 1400., 500), (1500., 1530., 1920)]:
+      lod_times, lod_values = lod.query(x_min, x_max, max_points)
+      in_range = (times >= x_min) & (times <= x_max)
+      assert len(lod_times) <= 4 * max_points + 4
+      assert np.all(np.diff(lod_times) >= 0)
+      assert lod_values.min() <= values[in_range].min()
+      assert lod_values.max() >= values[in_range].max()
+      assert np.isin(lod_values, values).all()
+
+    # more detail than the finest level, callers fall back to raw samples
+    assert lod.query(1300., 1301., 1000) is None
+
+  def test_nan_and_bool(self):
+    lod = LODPyramid()
+    lod.append(np.arange(10.), np.array([np.nan, 1, 2, np.nan, 4, 5, 6, 7, 8, 9]))
+    lod.append(np.arange(10., 20.), np.ones(10, dtype=bool))
+    _, values = lod.query(0., 20., 1)
+    assert values.min() == 1 and values.max() == 9
+
+
+class TestDataManager:
+  def test_series_cache_extends_with_segments(self):
+    times, values = make_series(duration=180.)
+    dm = DataManager()
+    for idxs in np.array_split(np.arange(len(times)), 3):
+      dm._add_segment(make_segment('carState', times[idxs], values[idxs]), times[idxs][0], times[idxs][-1])
+      if len(dm._segments) == 1:
+        first_times, _ = dm.get_timeseries('carState/x')
+        dm.get_lod('carState/x', 0., 60., 100)
+
+    all_times, all_values = dm.get_timeseries('carState/x')
+    assert len(first_times) < len(all_times) == len(times)
+    np.testing.assert_allclose(all_times, times - times[0])
+    np.testing.assert_array_equal(all_values, values)
+
+    lod_times, lod_values = dm.get_lod('carState/x', 0., 180., 100)
+    assert lod_times[0] < 2. and lod_times[-1] > 178.
+    assert lod_values.min() == values.min() and lod_values.max() == values.max()
+
+    # zoomed in past the finest level returns the raw samples in range
+    raw_times, _ = dm.get_lod('carState/x', 10., 11., 1000)
+    assert 100 <= len(raw_times) <= 103
+
+
+def make_msgs(n=300):
+  msgs = []
+  for i in range(n):
+    msg = log.Event.new_message(logMonoTime=int(100e9 + i * 1e7), valid=bool(i % 5))
+    if i % 2 == 0:
+      cs = msg.init('carState')
+      cs.vEgo = i / 10
+      cs.gearShifter = 'drive' if i % 4 else 'park'
+      cs.wheelSpeeds.fl = 1.5
+      if i % 10 == 0:
+        cs.init('buttonEvents', 1)[0].type = 'accelCruise'
+    else:
+      cs = msg.init('controlsState')
+      if i % 3:
+        cs.lateralControlState.init('pidState').p = 1.25
+      else:
+        cs.lateralControlState.init('torqueState').f = 2.5
+    msgs.append(msg.to_bytes())
+  init = log.Event.new_message(logMonoTime=50, initData={'gitCommit': 'abc'})
+  return list(log.Event.read_multiple_bytes(b''.join([init.to_bytes(), *msgs])))
+
+
+class TestExtractor:
+  def test_columns(self):
+    segment, start_time, end_time = msgs_to_time_series(make_msgs())
+    assert start_time == 100. and end_time == pytest.approx(102.99)
+    assert segment['initData']['gitCommit']['values'][0] == 'abc'
+
+    cs = segment['carState']
+    assert len(cs['t']) == 150
+    assert cs['vEgo']['values'].dtype == np.float32 and not cs['vEgo']['sparse']
+    np.testing.assert_allclose(cs['vEgo']['values'], np.arange(0, 300, 2) / 10, rtol=1e-6)
+    assert list(cs['gearShifter']['values'][:3]) == ['park', 'drive', 'park']
+    assert np.all(cs['wheelSpeeds/fl']['values'] == 1.5)
+    np.testing.assert_array_equal(cs['_valid']['values'], np.arange(0, 300, 2) % 5 != 0)
+
+    # list elements are flattened into sparse columns
+    button_type = cs['buttonEvents/0/type']
+    assert button_type['sparse'] and list(button_type['t_index']) == list(range(0, 150, 5))
+
+    # union members are sparse, and only read when active
+    lateral = segment['controlsState']
+    pid, torque = lateral['lateralControlState/pidState/p'], lateral['lateralControlState/torqueState/f']
+    assert pid['sparse'] and torque['sparse']
+    assert len(pid['values']) + len(torque['values']) == 150
+    assert np.all(pid['values'] == 1.25) and np.all(torque['values'] == 2.5)
+
+  def test_segment_cache(self, tmp_path):
+    segment, start_time, end_time = msgs_to_time_series(make_msgs())
+    path = str(tmp_path / "segment.bin")
+    save_segment_cache(path, segment, start_time, end_time)
+
+    cached = CachedSegment(path)
+    assert (cached.start_time, cached.end_time) == (start_time, end_time)
+    assert set(cached) == set(segment)
+    for typ, data in segment.items():
+      assert set(cached[typ]) == set(data)
+      np.testing.assert_array_equal(cached[typ]['t'], data['t'])
+      for field, column in data.items():
+        if field == 't':
+          continue
+        cached_column = cached[typ][field]
+        assert cached_column['sparse'] == column['sparse']
+        assert cached_column['values'].dtype == column['values'].dtype
+        np.testing.assert_array_equal(cached_column['values'], column['values'])
+        if column['sparse']:
+          np.testing.assert_array_equal(cached_column['t_index'], column['t_index'])
+
+  def test_long_text(self, tmp_path):
+    msgs = [log.Event.new_message(logMonoTime=int(100e9 + i * 1e6), androidLog={'message': f"line {i}"}) for i in range(5000)]
+    msgs[1234].androidLog.message = "x" * 20000
+    segment, start_time, end_time = msgs_to_time_series(msgs)
+    messages = segment['androidLog']['message']['values']
+    # text stays an object column, instead of a fixed width array as wide as its longest value
+    assert messages.dtype == object and messages[1234] == "x" * 20000 and messages[0] == "line 0"
+
+    path = tmp_path / "segment.bin"
+    save_segment_cache(str(path), segment, start_time, end_time)
+    assert path.stat().st_size < 1_000_000  # a <U20000 column would take 400 MB
+    cached = CachedSegment(str(path))['androidLog']['message']['values']
+    assert cached.dtype == object
+    np.testing.assert_array_equal(cached, messages)
@@ -1,7 +1,6 @@
 import uuid
 import threading
 import numpy as np
-from collections import deque
 import dearpygui.dearpygui as dpg
 from abc import ABC, abstractmethod
 
@@ -56,9 +55,8 @@ class TimeSeriesPanel(ViewPanel):
     self.timeline_indicator_tag = f"{self.plot_tag}_timeline"
     self._ui_created = False
     self._series_data: dict[str, tuple[np.ndarray, np.ndarray]] = {}
-    self._last_plot_duration = 0
+    self._last_plot_width = 0
     self._update_lock = threading.RLock()
-    self._results_deque: deque[tuple[str, list, list]] = deque()
     self._new_data = False
     self._last_x_limits = (0.0, 0.0)
     self._queued_x_sync: tuple | None = None
@@ -104,6 +102,7 @@ class TimeSeriesPanel(ViewPanel):
         dpg.set_axis_limits(self.x_axis_tag, min_time, max_time)
         self._last_x_limits = (min_time, max_time)
         self._fit_y_axis(min_time, max_time)
+        self._update_series_lod(min_time, max_time)
         self._queued_reallow_x_zoom = True # must wait a frame before allowing user changes so that axis limits take effect
         return
 
@@ -124,22 +123,14 @@ class TimeSeriesPanel(ViewPanel):
           self.add_series(series_path, update=True)
 
       current_limits = dpg.get_axis_limits(self.x_axis_tag)
-      # downsample if plot zoom changed significantly
-      plot_duration = current_limits[1] - current_limits[0]
-      if plot_duration > self._last_plot_duration * 2 or plot_duration < self._last_plot_duration * 0.5:
-        self._downsample_all_series(plot_duration)
       # sync x-axis if changed by user
       if self._last_x_limits != current_limits:
         self.playback_manager.set_x_axis_bounds(current_limits[0], current_limits[1], source_panel=self)
         self._last_x_limits = current_limits
         self._fit_y_axis(current_limits[0], current_limits[1])
-
-      while self._results_deque:  # handle downsampled results in main thread
-        results = self._results_deque.popleft()
-        for series_path, downsampled_time, downsampled_values in results:
-          series_tag = f"series_{self.panel_id}_{series_path}"
-          if dpg.does_item_exist(series_tag):
-            dpg.set_value(series_tag, (downsampled_time, downsampled_values.astype(float)))
+        self._update_series_lod(current_limits[0], current_limits[1])
+      elif dpg.get_item_rect_size(self.plot_tag)[0] != self._last_plot_width:
+        self._update_series_lod(current_limits[0], current_limits[1])
 
       # update timeline
       current_time_s = self.playback_manager.current_time_s
@@ -169,9 +160,9 @@ class TimeSeriesPanel(ViewPanel):
     global_max = float('-inf')
     found_data = False
 
-    for time_array, value_array in self._series_data.values():
-      if len(time_array) == 0:
-        continue
+    plot_width = max(int(dpg.get_item_rect_size(self.plot_tag)[0]), 1)
+    for series_path in self._series_data:
+      time_array, value_array = self.data_manager.get_lod(series_path, x_min, x_max, plot_width)
       start_idx, end_idx = np.searchsorted(time_array, [x_min, x_max])
       end_idx = min(end_idx, len(time_array) - 1)
       if start_idx <= end_idx:
@@ -195,45 +186,32 @@ class TimeSeriesPanel(ViewPanel):
 
     dpg.set_axis_limits(self.y_axis_tag, y_min, y_max)
 
-  def _downsample_all_series(self, plot_duration):
-    plot_width = dpg.get_item_rect_size(self.plot_tag)[0]
-    if plot_width <= 0 or plot_duration <= 0:
+  def _update_series_lod(self, x_min: float, x_max: float):
+    plot_width = int(dpg.get_item_rect_size(self.plot_tag)[0])
+    if plot_width <= 0 or x_max <= x_min:
       return
 
-    self._last_plot_duration = plot_duration
-    target_points_per_second = plot_width / plot_duration
-    work_items = []
-    for series_path, (time_array, value_array) in self._series_data.items():
-      if len(time_array) == 0:
-        continue
-      series_duration = time_array[-1] - time_array[0] if len(time_array) > 1 else 1
-      points_per_second = len(time_array) / series_duration
-      if points_per_second > target_points_per_second * 2:
-        target_points = max(int(target_points_per_second * series_duration), plot_width)
-        work_items.append((series_path, time_array, value_array, target_points))
-      elif dpg.does_item_exist(f"series_{self.panel_id}_{series_path}"):
-        dpg.set_value(f"series_{self.panel_id}_{series_path}", (time_array, value_array.astype(float)))
-
-    if work_items:
-      self.worker_manager.submit_task(
-        TimeSeriesPanel._downsample_worker, work_items, callback=lambda results: self._results_deque.append(results), task_id=f"downsample_{self.panel_id}"
-      )
+    self._last_plot_width = plot_width
+    # also cover a view width on either side, so panning doesn't reveal undrawn data before the next update
+    span = x_max - x_min
+    for series_path in self._series_data:
+      series_tag = f"series_{self.panel_id}_{series_path}"
+      if dpg.does_item_exist(series_tag):
+        time_array, value_array = self.data_manager.get_lod(series_path, x_min - span, x_max + span, 3 * plot_width)
+        dpg.set_value(series_tag, (time_array, value_array.astype(float)))
 
   def add_series(self, series_path: str, update: bool = False):
     with self._update_lock:
       if update or series_path not in self._series_data:
         self._series_data[series_path] = self.data_manager.get_timeseries(series_path)
 
-      time_array, value_array = self._series_data[series_path]
       series_tag = f"series_{self.panel_id}_{series_path}"
-      if dpg.does_item_exist(series_tag):
-        dpg.set_value(series_tag, (time_array, value_array.astype(float)))
-      else:
-        line_series_tag = dpg.add_line_series(x=time_array, y=value_array.astype(float), label=series_path, parent=self.y_axis_tag, tag=series_tag)
+      if not dpg.does_item_exist(series_tag):
+        line_series_tag = dpg.add_line_series(x=[], y=[], label=series_path, parent=self.y_axis_tag, tag=series_tag)
         dpg.bind_item_theme(line_series_tag, "line_theme")
-      self._fit_y_axis(*dpg.get_axis_limits(self.x_axis_tag))
-      plot_duration = dpg.get_axis_limits(self.x_axis_tag)[1] - dpg.get_axis_limits(self.x_axis_tag)[0]
-      self._downsample_all_series(plot_duration)
+      x_limits = dpg.get_axis_limits(self.x_axis_tag)
+      self._fit_y_axis(*x_limits)
+      self._update_series_lod(*x_limits)
 
   def destroy_ui(self):
     with self._update_lock:
@@ -268,27 +246,3 @@ class TimeSeriesPanel(ViewPanel):
 
   def _on_series_drop(self, sender, app_data, user_data):
     self.add_series(app_data)
-
-  @staticmethod
-  def _downsample_worker(series_path, time_array, value_array, target_points):
-    if len(time_array) <= target_points:
-      return series_path, time_array, value_array
-
-    step = len(time_array) / target_points
-    indices = []
-
-    for i in range(target_points):
-      start_idx = int(i * step)
-      end_idx = int((i + 1) * step)
-      if start_idx == end_idx:
-        indices.append(start_idx)
-      else:
-        bucket_values = value_array[start_idx:end_idx]
-        min_idx = start_idx + np.argmin(bucket_values)
-        max_idx = start_idx + np.argmax(bucket_values)
-        if min_idx != max_idx:
-          indices.extend([min(min_idx, max_idx), max(min_idx, max_idx)])
-        else:
-          indices.append(min_idx)
-    indices = sorted(set(indices))
-    return series_path, time_array[indices], value_array[indices]
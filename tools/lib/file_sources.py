@@ -1,4 +1,6 @@
+import os
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 
 from openpilot.tools.lib.comma_car_segments import get_url as get_comma_segments_url
 from openpilot.tools.lib.openpilotci import get_url
@@ -11,6 +13,9 @@ Source = Callable[[SegmentRange, list[int], FileNames], dict[int, str]]
 
 InternalUnavailableException = Exception("Internal source not available")
 
+# Max number of concurrent existence checks per source
+MAX_PROBE_WORKERS = int(os.getenv("FILE_SOURCES_WORKERS", "16"))
+
 
 def comma_api_source(sr: SegmentRange, seg_idxs: list[int], fns: FileNames) -> dict[int, str]:
   route = Route(sr.route_name)
@@ -42,16 +47,18 @@ def comma_car_segments_source(sr: SegmentRange, seg_idxs: list[int], fns: FileNa
 
 def eval_source(files: dict[int, list[str] | str]) -> dict[int, str]:
   # Returns valid file URLs given a list of possible file URLs for each segment (e.g. rlog.bz2, rlog.zst)
+  candidates = {seg_idx: [urls] if isinstance(urls, str) else list(urls) for seg_idx, urls in files.items()}
   valid_files: dict[int, str] = {}
-
-  for seg_idx, urls in files.items():
-    if isinstance(urls, str):
-      urls = [urls]
-
-    # Add first valid file URL
-    for url in urls:
-      if file_exists(url):
-        valid_files[seg_idx] = url
-        break
-
-  return valid_files
+  if not candidates:
+    return valid_files
+
+  num_rounds = max(len(urls) for urls in candidates.values())
+  with ThreadPoolExecutor(max_workers=max(1, min(MAX_PROBE_WORKERS, len(candidates)))) as pool:
+    # Check all segments concurrently, one candidate at a time, so fallback names are only checked for segments still missing
+    for i in range(num_rounds):
+      probes = {seg_idx: urls[i] for seg_idx, urls in candidates.items() if seg_idx not in valid_files and i < len(urls)}
+      for (seg_idx, url), exists in zip(probes.items(), pool.map(file_exists, probes.values()), strict=True):
+        if exists:
+          valid_files[seg_idx] = url
+
+  return {seg_idx: valid_files[seg_idx] for seg_idx in candidates if seg_idx in valid_files}
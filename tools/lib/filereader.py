@@ -1,14 +1,22 @@
 import os
 import posixpath
 import socket
+import time
 from functools import cache
+from openpilot.common.file_helpers import atomic_write_in_dir
 from openpilot.common.retry import retry
 from urllib.parse import urlparse
 
-from openpilot.tools.lib.url_file import URLFile
+from openpilot.system.hardware.hw import Paths
+from openpilot.tools.lib.url_file import URLFile, hash_256
 
 DATA_ENDPOINT = os.getenv("DATA_ENDPOINT", "http://data-raw.comma.internal/")
 
+# How long a remote existence check stays valid in the download cache. Uploaded logs don't
+# disappear, but missing ones may still be uploading, so negative results expire quickly.
+EXISTS_TTL = int(os.getenv("FILE_EXISTS_TTL", str(7 * 24 * 60 * 60)))
+MISSING_TTL = int(os.getenv("FILE_MISSING_TTL", str(10 * 60)))
+
 
 @cache
 @retry(delay=0.0)
@@ -34,11 +42,39 @@ def resolve_name(fn):
   return fn
 
 
+def _exists_cache_path(url: str) -> str:
+  return os.path.join(Paths.download_cache_root(), hash_256(url) + "_exists")
+
+
+def _read_exists_cache(url: str) -> bool | None:
+  path = _exists_cache_path(url)
+  try:
+    with open(path) as f:
+      exists = f.read() == "1"
+    age = time.time() - os.path.getmtime(path)  # noqa: TID251
+  except OSError:
+    return None
+  return exists if age < (EXISTS_TTL if exists else MISSING_TTL) else None
+
+
+def _write_exists_cache(url: str, exists: bool) -> None:
+  os.makedirs(Paths.download_cache_root(), exist_ok=True)
+  with atomic_write_in_dir(_exists_cache_path(url), mode="w", overwrite=True) as f:
+    f.write("1" if exists else "0")
+
+
 @cache
 def file_exists(fn):
   fn = resolve_name(fn)
   if fn.startswith(("http://", "https://")):
-    return URLFile(fn).get_length_online() != -1
+    use_cache = bool(int(os.environ.get("FILEREADER_CACHE", "0")))
+    if use_cache and (exists := _read_exists_cache(fn)) is not None:
+      return exists
+
+    exists = URLFile(fn).get_length_online() != -1
+    if use_cache:
+      _write_exists_cache(fn, exists)
+    return exists
   return os.path.exists(fn)
 
 
@@ -168,19 +168,21 @@ def auto_source(identifier: str, sources: list[Source], default_mode: ReadMode)
   # This function only returns when we've sourced all files, or throws an exception
   valid_files: dict[int, str] = {}
   for fn in try_fns:
+    # Sources are tried in priority order, each only for the segments still missing, so lower priority (remote) sources
+    # aren't probed for files that were already found. Each source checks its segments concurrently.
     for source in sources:
       try:
         files = source(sr, needed_seg_idxs, fn)
 
         # Build a dict of valid files
-        valid_files |= files
+        valid_files |= {idx: files[idx] for idx in needed_seg_idxs if idx in files}
 
         # Don't check for segment files that have already been found
         needed_seg_idxs = [idx for idx in needed_seg_idxs if idx not in valid_files]
 
         # We've found all files, return them
         if len(needed_seg_idxs) == 0:
-          return cast(list[str], list(valid_files.values()))
+          return cast(list[str], [valid_files[idx] for idx in sorted(valid_files)])
 
       except Exception as e:
         exceptions[source.__name__] = e
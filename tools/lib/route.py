@@ -1,14 +1,13 @@
-import os
 import re
 import requests
 from functools import cache
 from urllib.parse import urlparse
-from collections import defaultdict
 from itertools import chain
 
 from openpilot.tools.lib.auth_config import get_token
 from openpilot.tools.lib.api import APIError, CommaApi
 from openpilot.tools.lib.helpers import RE
+from openpilot.tools.lib.route_catalog import get_route_catalog
 
 
 class FileName:
@@ -107,32 +106,8 @@ class Route:
     return sorted(segments.values(), key=lambda seg: seg.name.segment_num)
 
   def _get_segments_local(self, data_dir):
-    files = os.listdir(data_dir)
-    segment_files = defaultdict(list)
-
-    for f in files:
-      fullpath = os.path.join(data_dir, f)
-      explorer_match = re.match(RE.EXPLORER_FILE, f)
-      op_match = re.match(RE.OP_SEGMENT_DIR, f)
-
-      if explorer_match:
-        segment_name = explorer_match.group('segment_name')
-        fn = explorer_match.group('file_name')
-        if segment_name.replace('_', '|').startswith(self.name.canonical_name):
-          segment_files[segment_name].append((fullpath, fn))
-      elif op_match and os.path.isdir(fullpath):
-        segment_name = op_match.group('segment_name')
-        if segment_name.startswith(self.name.canonical_name):
-          for seg_f in os.listdir(fullpath):
-            segment_files[segment_name].append((os.path.join(fullpath, seg_f), seg_f))
-      elif f == self.name.canonical_name:
-        for seg_num in os.listdir(fullpath):
-          if not seg_num.isdigit():
-            continue
-
-          segment_name = f'{self.name.canonical_name}--{seg_num}'
-          for seg_f in os.listdir(os.path.join(fullpath, seg_num)):
-            segment_files[segment_name].append((os.path.join(fullpath, seg_num, seg_f), seg_f))
+    segment_files = {f'{self.name.canonical_name}--{segment_num}': files
+                     for segment_num, files in get_route_catalog(data_dir).route_files(self.name.canonical_name).items()}
 
     segments = []
     for segment, files in segment_files.items():
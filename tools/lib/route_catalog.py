@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from functools import cache
+from hashlib import sha256
+
+from openpilot.system.hardware.hw import Paths
+from openpilot.tools.lib.helpers import RE
+
+CATALOG_VERSION = 1
+
+# A directory modified this recently may still change within the same mtime tick, so it's listed again on the next lookup
+MTIME_SETTLE_NS = 2_000_000_000
+
+EXPLORER_FILE_RE = re.compile(RE.EXPLORER_FILE)
+OP_SEGMENT_DIR_RE = re.compile(RE.OP_SEGMENT_DIR)
+ROUTE_DIR_RE = re.compile(fr'^{RE.DONGLE_ID}\|{RE.LOG_ID}$')
+TIMESTAMP_RE = re.compile(RE.TIMESTAMP)
+
+SCHEMA = """
+CREATE TABLE dirs (
+  path TEXT PRIMARY KEY,
+  parent TEXT,
+  route TEXT,
+  segment_num INTEGER,
+  mtime_ns INTEGER
+);
+CREATE INDEX dirs_parent ON dirs (parent, route);
+
+CREATE TABLE files (
+  path TEXT PRIMARY KEY,
+  dir TEXT NOT NULL,
+  route TEXT NOT NULL,
+  dongle_id TEXT NOT NULL,
+  timestamp TEXT,
+  segment_num INTEGER NOT NULL,
+  file_name TEXT NOT NULL
+);
+CREATE INDEX files_route ON files (route, segment_num);
+CREATE INDEX files_dongle ON files (dongle_id, timestamp);
+CREATE INDEX files_dir ON files (dir);
+"""
+
+
+def _route_name(m: re.Match) -> str:
+  return f"{m.group('dongle_id')}|{m.group('log_id')}"
+
+
+def _format_timestamp(t: datetime | str) -> str:
+  return t.strftime("%Y-%m-%d--%H-%M-%S") if isinstance(t, datetime) else t
+
+
+class RouteCatalog:
+  """Index of the routes, segments and files in a local data directory.
+
+  Understands the same layouts as Route(name, data_dir=...):
+    <data_dir>/<segment name>--<file name>     (explorer)
+    <data_dir>/<segment name>/<file name>      (device)
+    <data_dir>/<route name>/<segment>/<file name>
+
+  The index lives in SQLite and is kept up to date incrementally. A directory is only listed again
+  when its mtime changes, and only entries that weren't seen before are parsed.
+  """
+
+  def __init__(self, data_dir: str, db_path: str | None = None):
+    self.data_dir = os.path.abspath(data_dir)
+    if db_path is None:
+      db_path = os.path.join(Paths.download_cache_root(), "route_catalog", sha256(self.data_dir.encode()).hexdigest() + ".db")
+      os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+    self._lock = threading.Lock()
+    self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    with self._lock, self._db:
+      self._db.execute("PRAGMA journal_mode=WAL")
+      if self._db.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+        self._db.execute("DROP TABLE IF EXISTS dirs")
+        self._db.execute("DROP TABLE IF EXISTS files")
+        self._db.executescript(SCHEMA + f"PRAGMA user_version = {CATALOG_VERSION};")
+
+  def close(self) -> None:
+    self._db.close()
+
+  def update(self) -> None:
+    """Bring the whole index up to date."""
+    with self._lock, self._db:
+      self._refresh_dir(self.data_dir, None, None, None)
+
+  def route_files(self, route_name: str) -> dict[int, list[tuple[str, str]]]:
+    """Returns the (path, file name) pairs of each segment in a route, after updating only the directories of that route."""
+    with self._lock, self._db:
+      self._refresh_dir(self.data_dir, None, None, route_name)
+      rows = self._db.execute("SELECT segment_num, path, file_name FROM files WHERE route = ? ORDER BY segment_num, path", (route_name,))
+      segment_files: dict[int, list[tuple[str, str]]] = {}
+      for segment_num, path, file_name in rows:
+        segment_files.setdefault(segment_num, []).append((path, file_name))
+    return segment_files
+
+  def routes(self, dongle_id: str | None = None, start: datetime | str | None = None, end: datetime | str | None = None,
+             file_names: tuple[str, ...] | None = None, update: bool = True) -> list[str]:
+    """Returns the names of the routes that have at least one file matching all the filters.
+
+    start and end are inclusive bounds on the route's start time. Routes without a timestamp log id
+    never match a date range. file_names filters by file kind, e.g. FileName.RLOG.
+    """
+    if update:
+      self.update()
+
+    query, params = "SELECT DISTINCT route FROM files WHERE 1", []
+    if dongle_id is not None:
+      query += " AND dongle_id = ?"
+      params.append(dongle_id)
+    if start is not None:
+      query += " AND timestamp >= ?"
+      params.append(_format_timestamp(start))
+    if end is not None:
+      query += " AND timestamp <= ?"
+      params.append(_format_timestamp(end))
+    if file_names is not None:
+      query += f" AND file_name IN ({', '.join('?' * len(file_names))})"
+      params.extend(file_names)
+
+    with self._lock:
+      return [route for (route,) in self._db.execute(query + " ORDER BY route", params)]
+
+  def _refresh_dir(self, path: str, parent: str | None, route: str | None, only_route: str | None,
+                   segment_num: int | None = None) -> None:
+    try:
+      mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+      self._forget_dir(path)
+      return
+
+    row = self._db.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (path,)).fetchone()
+    if row is None or row[0] != mtime_ns:
+      self._scan_dir(path, parent, route, segment_num, mtime_ns)
+
+    query, params = "SELECT path, route, segment_num FROM dirs WHERE parent = ?", [path]
+    if only_route is not None:
+      query += " AND route = ?"
+      params.append(only_route)
+    for child, child_route, child_segment_num in self._db.execute(query, params).fetchall():
+      self._refresh_dir(child, path, child_route, only_route, child_segment_num)
+
+  def _scan_dir(self, path: str, parent: str | None, route: str | None, segment_num: int | None, mtime_ns: int) -> None:
+    known_files = {p for (p,) in self._db.execute("SELECT path FROM files WHERE dir = ?", (path,))}
+    known_dirs = {p for (p,) in self._db.execute("SELECT path FROM dirs WHERE parent = ?", (path,))}
+    seen = set()
+    new_files, new_dirs = [], []
+
+    with os.scandir(path) as entries:
+      for entry in entries:
+        if entry.path in known_files or entry.path in known_dirs:
+          seen.add(entry.path)
+          continue
+
+        if route is None:
+          # data_dir: explorer files, segment directories and route directories
+          if (m := EXPLORER_FILE_RE.match(entry.name)) and not entry.is_dir():
+            new_files.append((entry.path, path, _route_name(m), int(m.group('segment_num')), m.group('file_name')))
+          elif entry.is_dir():
+            if m := OP_SEGMENT_DIR_RE.match(entry.name):
+              new_dirs.append((entry.path, path, _route_name(m), int(m.group('segment_num'))))
+            elif m := ROUTE_DIR_RE.match(entry.name):
+              new_dirs.append((entry.path, path, _route_name(m), None))
+        elif segment_num is None:
+          # route directory: one directory per segment
+          if entry.name.isdigit() and entry.is_dir():
+            new_dirs.append((entry.path, path, route, int(entry.name)))
+        elif not entry.is_dir():
+          new_files.append((entry.path, path, route, segment_num, entry.name))
+
+    self._db.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in known_files - seen))
+    for p in known_dirs - seen:
+      self._forget_dir(p)
+
+    file_rows = []
+    for file_path, file_dir, file_route, file_segment_num, file_name in new_files:
+      dongle_id, log_id = file_route.split('|')
+      timestamp = log_id if TIMESTAMP_RE.fullmatch(log_id) else None
+      file_rows.append((file_path, file_dir, file_route, dongle_id, timestamp, file_segment_num, file_name))
+    self._db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", file_rows)
+    # new directories have no mtime yet, so they are listed right after this one
+    self._db.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, NULL)", new_dirs)
+
+    if time.time_ns() - mtime_ns < MTIME_SETTLE_NS:
+      mtime_ns = -1
+    self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)", (path, parent, route, segment_num, mtime_ns))
+
+  def _forget_dir(self, path: str) -> None:
+    for (child,) in self._db.execute("SELECT path FROM dirs WHERE parent = ?", (path,)).fetchall():
+      self._forget_dir(child)
+    self._db.execute("DELETE FROM files WHERE dir = ?", (path,))
+    self._db.execute("DELETE FROM dirs WHERE path = ?", (path,))
+
+
+@cache
+def get_route_catalog(data_dir: str) -> RouteCatalog:
+  return RouteCatalog(data_dir)
+
+
+if __name__ == "__main__":
+  from openpilot.tools.lib.route import FileName
+
+  parser = argparse.ArgumentParser(description="Index a local data directory and list the routes in it")
+  parser.add_argument("data_dir")
+  parser.add_argument("--dongle-id")
+  parser.add_argument("--start", help="earliest route start time, e.g. 2024-01-03--09-37-12")
+  parser.add_argument("--end", help="latest route start time, e.g. 2024-01-03--09-37-12")
+  parser.add_argument("--kind", choices=[k.lower() for k in vars(FileName) if not k.startswith('_')], help="only routes with this kind of file")
+  args = parser.parse_args()
+
+  file_names = getattr(FileName, args.kind.upper()) if args.kind else None
+  for route in get_route_catalog(args.data_dir).routes(args.dongle_id, args.start, args.end, file_names):
+    print(route)
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+import pytest
+
+from openpilot.tools.lib import filereader
+from openpilot.tools.lib.file_sources import eval_source
+from openpilot.tools.lib.logreader import LogsUnavailable, ReadMode, auto_source
+from openpilot.tools.lib.route import FileName
+
+ROUTE = "344c5c15b34f2d8a/2024-01-03--09-37-12"
+
+
+def make_source(name, files, delay=0.0, calls=None):
+  def source(sr, seg_idxs, fns):
+    if calls is not None:
+      calls.append((name, list(seg_idxs)))
+    time.sleep(delay)
+    return {seg: f for seg, f in files.items() if seg in seg_idxs}
+  source.__name__ = name
+  return source
+
+
+class TestEvalSource:
+  def test_priority(self, mocker):
+    existing = {"0/rlog.zst", "1/rlog.bz2", "2/rlog.zst", "2/rlog.bz2"}
+    mocker.patch("openpilot.tools.lib.file_sources.file_exists", side_effect=lambda url: url in existing)
+    files = {seg: [f"{seg}/rlog.zst", f"{seg}/rlog.bz2"] for seg in range(4)}
+    assert eval_source(files) == {0: "0/rlog.zst", 1: "1/rlog.bz2", 2: "2/rlog.zst"}
+
+  def test_fallback_only_for_missing(self, mocker):
+    probed = []
+    def file_exists(url):
+      probed.append(url)
+      return url.endswith(".zst") or url == "3/rlog.bz2"
+    mocker.patch("openpilot.tools.lib.file_sources.file_exists", side_effect=file_exists)
+    files = {seg: [f"{seg}/rlog.zst", f"{seg}/rlog.bz2"] for seg in range(3)}
+    files[3] = ["3/rlog.bz2"]
+    assert eval_source(files) == {0: "0/rlog.zst", 1: "1/rlog.zst", 2: "2/rlog.zst", 3: "3/rlog.bz2"}
+    assert sorted(probed) == ["0/rlog.zst", "1/rlog.zst", "2/rlog.zst", "3/rlog.bz2"]
+
+  def test_concurrent(self, mocker):
+    barrier = threading.Barrier(8, timeout=5)
+    def file_exists(url):
+      barrier.wait()
+      return True
+    mocker.patch("openpilot.tools.lib.file_sources.file_exists", side_effect=file_exists)
+    # would deadlock (and time out) if the checks ran serially
+    assert len(eval_source({seg: f"{seg}/qlog.zst" for seg in range(8)})) == 8
+
+  def test_empty(self):
+    assert eval_source({}) == {}
+
+
+class TestAutoSource:
+  def test_priority_merge(self):
+    # slow high priority source still wins over a fast low priority one
+    sources = [make_source("a", {0: "a0", 2: "a2"}, delay=0.2), make_source("b", {0: "b0", 1: "b1", 2: "b2"})]
+    assert auto_source(f"{ROUTE}/0:3/r", sources, ReadMode.RLOG) == ["a0", "b1", "a2"]
+
+  def test_only_missing_segments(self):
+    calls = []
+    sources = [make_source(name, files, calls=calls) for name, files in
+               (("a", {0: "a0", 2: "a2"}), ("b", {1: "b1"}), ("c", {0: "c0", 1: "c1", 2: "c2", 3: "c3"}))]
+    assert auto_source(f"{ROUTE}/0:3/r", sources, ReadMode.RLOG) == ["a0", "b1", "a2"]
+    # lower priority sources are only asked for what's still missing, and not at all once everything is found
+    assert calls == [("a", [0, 1, 2]), ("b", [1])]
+
+  def test_segment_order(self):
+    # segment 0 only has a qlog, it's found in the fallback round after segment 1's rlog
+    files = {FileName.RLOG: {1: "r1"}, FileName.QLOG: {0: "q0", 1: "q1"}}
+    def source(sr, seg_idxs, fns):
+      return {seg: f for seg, f in files[fns].items() if seg in seg_idxs}
+    assert auto_source(f"{ROUTE}/0:2", [source], ReadMode.AUTO) == ["q0", "r1"]
+
+  def test_short_circuit(self):
+    calls = []
+    sources = [make_source("a", {0: "a0"}, calls=calls), make_source("b", {0: "b0"}, calls=calls)]
+    assert auto_source(f"{ROUTE}/0", sources, ReadMode.AUTO) == ["a0"]
+    # all segments were found as rlogs (the first file name tried), no qlog fallback round
+    assert calls == [("a", [0])]
+
+  def test_exceptions(self):
+    def broken(sr, seg_idxs, fns):
+      raise RuntimeError("broken")
+    with pytest.raises(LogsUnavailable, match="broken"):
+      auto_source(f"{ROUTE}/0/r", [broken, make_source("b", {})], ReadMode.RLOG)
+
+
+class TestFileExistsCache:
+  @pytest.fixture(autouse=True)
+  def setup(self, mocker, tmp_path):
+    mocker.patch.dict(os.environ, {"COMMA_CACHE": str(tmp_path), "FILEREADER_CACHE": "1"})
+    filereader.file_exists.cache_clear()
+    self.length_mock = mocker.patch("openpilot.tools.lib.url_file.URLFile.get_length_online", return_value=-1)
+    yield
+    filereader.file_exists.cache_clear()
+
+  def check(self, url):
+    filereader.file_exists.cache_clear()
+    return filereader.file_exists(url)
+
+  def test_persistent(self):
+    url = "https://example.com/rlog.zst"
+    self.length_mock.return_value = 4
+    assert self.check(url)
+    self.length_mock.return_value = -1
+    assert self.check(url)
+    assert self.length_mock.call_count == 1
+
+  def test_missing_ttl(self, mocker):
+    url = "https://example.com/rlog.zst"
+    assert not self.check(url)
+    assert not self.check(url)
+    assert self.length_mock.call_count == 1
+
+    # negative results expire, the file might have been uploaded since
+    mocker.patch.object(filereader, "MISSING_TTL", 0)
+    self.length_mock.return_value = 4
+    assert self.check(url)
+    assert self.length_mock.call_count == 2
+
+  def test_disabled(self, mocker):
+    mocker.patch.dict(os.environ, {"FILEREADER_CACHE": "0"})
+    url = "https://example.com/rlog.zst"
+    assert not self.check(url)
+    assert not self.check(url)
+    assert self.length_mock.call_count == 2
+    assert not os.path.exists(filereader._exists_cache_path(url))
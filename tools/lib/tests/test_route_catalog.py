@@ -0,0 +1,135 @@
+import os
+import pytest
+from datetime import datetime
+
+from openpilot.tools.lib import route_catalog
+from openpilot.tools.lib.route import FileName, Route
+from openpilot.tools.lib.route_catalog import RouteCatalog
+
+DONGLE_ID = "a2a0ccea32023010"
+OTHER_DONGLE_ID = "344c5c15b34f2d8a"
+ROUTE = f"{DONGLE_ID}|2023-07-27--13-01-19"
+
+
+def touch(path):
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  open(path, "wb").close()
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+  # route directory layout
+  for seg in range(3):
+    for fn in ("rlog.zst", "qlog.zst", "fcamera.hevc"):
+      touch(str(tmp_path / ROUTE / str(seg) / fn))
+  # device layout
+  for seg in range(2):
+    touch(str(tmp_path / f"{DONGLE_ID}|2023-07-28--10-00-00--{seg}" / "qlog.zst"))
+  # explorer layout
+  touch(str(tmp_path / f"{OTHER_DONGLE_ID}_2024-01-03--09-37-12--0--rlog.bz2"))
+  touch(str(tmp_path / "not_a_route.txt"))
+  return tmp_path
+
+
+@pytest.fixture
+def catalog(data_dir):
+  c = RouteCatalog(str(data_dir), db_path=":memory:")
+  yield c
+  c.close()
+
+
+def set_old_mtimes(path):
+  # the catalog doesn't trust the mtime of directories that were just modified
+  for root, dirs, _ in os.walk(path):
+    for d in dirs:
+      os.utime(os.path.join(root, d), (1e9, 1e9))
+  os.utime(path, (1e9, 1e9))
+
+
+class TestRouteCatalog:
+  def test_layouts(self, catalog, data_dir):
+    files = catalog.route_files(ROUTE)
+    assert sorted(files) == [0, 1, 2]
+    assert sorted(fn for _, fn in files[1]) == ["fcamera.hevc", "qlog.zst", "rlog.zst"]
+    assert (str(data_dir / ROUTE / "1" / "rlog.zst"), "rlog.zst") in files[1]
+
+    files = catalog.route_files(f"{DONGLE_ID}|2023-07-28--10-00-00")
+    assert files == {seg: [(str(data_dir / f"{DONGLE_ID}|2023-07-28--10-00-00--{seg}" / "qlog.zst"), "qlog.zst")] for seg in range(2)}
+
+    files = catalog.route_files(f"{OTHER_DONGLE_ID}|2024-01-03--09-37-12")
+    assert files == {0: [(str(data_dir / f"{OTHER_DONGLE_ID}_2024-01-03--09-37-12--0--rlog.bz2"), "rlog.bz2")]}
+
+    assert catalog.route_files(f"{DONGLE_ID}|2020-01-01--00-00-00") == {}
+
+  def test_query(self, catalog):
+    all_routes = [f"{OTHER_DONGLE_ID}|2024-01-03--09-37-12", ROUTE, f"{DONGLE_ID}|2023-07-28--10-00-00"]
+    assert catalog.routes() == sorted(all_routes)
+    assert catalog.routes(dongle_id=DONGLE_ID) == [ROUTE, f"{DONGLE_ID}|2023-07-28--10-00-00"]
+    assert catalog.routes(start=datetime(2023, 7, 28)) == [f"{OTHER_DONGLE_ID}|2024-01-03--09-37-12", f"{DONGLE_ID}|2023-07-28--10-00-00"]
+    assert catalog.routes(start="2023-07-27--00-00-00", end=datetime(2023, 7, 27, 23)) == [ROUTE]
+    assert catalog.routes(file_names=FileName.RLOG) == [f"{OTHER_DONGLE_ID}|2024-01-03--09-37-12", ROUTE]
+    assert catalog.routes(dongle_id=DONGLE_ID, file_names=FileName.FCAMERA) == [ROUTE]
+
+  def test_incremental(self, catalog, data_dir, mocker):
+    catalog.update()
+    set_old_mtimes(data_dir)
+    catalog.update()
+
+    # nothing changed, nothing is listed again
+    scan_dir = mocker.patch.object(catalog, "_scan_dir", wraps=catalog._scan_dir)
+    catalog.update()
+    assert scan_dir.call_count == 0
+
+    # only modified directories are listed again
+    touch(str(data_dir / ROUTE / "1" / "ecamera.hevc"))
+    os.remove(data_dir / ROUTE / "2" / "fcamera.hevc")
+    touch(str(data_dir / ROUTE / "3" / "rlog.zst"))
+    files = catalog.route_files(ROUTE)
+    expected = [str(data_dir / ROUTE), *(str(data_dir / ROUTE / seg) for seg in ("1", "2", "3"))]
+    assert sorted(c.args[0] for c in scan_dir.call_args_list) == sorted(expected)
+    assert sorted(files) == [0, 1, 2, 3]
+    assert "ecamera.hevc" in [fn for _, fn in files[1]]
+    assert "fcamera.hevc" not in [fn for _, fn in files[2]]
+
+    # removed routes are forgotten
+    for root, _, fns in os.walk(data_dir / ROUTE, topdown=False):
+      for fn in fns:
+        os.remove(os.path.join(root, fn))
+      os.rmdir(root)
+    assert catalog.route_files(ROUTE) == {}
+    assert ROUTE not in catalog.routes()
+
+  def test_route_lookup_only_lists_route(self, catalog, data_dir, mocker):
+    catalog.update()
+    set_old_mtimes(data_dir)
+    catalog.update()
+
+    touch(str(data_dir / f"{DONGLE_ID}|2023-07-28--10-00-00--0" / "rlog.zst"))
+    scan_dir = mocker.patch.object(catalog, "_scan_dir", wraps=catalog._scan_dir)
+    catalog.route_files(ROUTE)
+    assert scan_dir.call_count == 0
+
+  def test_persistent(self, data_dir, tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("db") / "catalog.db")
+    c = RouteCatalog(str(data_dir), db_path=db_path)
+    c.update()
+    c.close()
+
+    c = RouteCatalog(str(data_dir), db_path=db_path)
+    assert len(c.routes(update=False)) == 3
+    c.close()
+
+  def test_route(self, data_dir, mocker, monkeypatch):
+    monkeypatch.setenv("COMMA_CACHE", str(data_dir / "cache"))
+    route_catalog.get_route_catalog.cache_clear()
+    mocker.patch.object(Route, "metadata", {"url": "https://example.com"})
+
+    r = Route(ROUTE, data_dir=str(data_dir))
+    assert r.max_seg_number == 2
+    assert r.log_paths() == [str(data_dir / ROUTE / str(seg) / "rlog.zst") for seg in range(3)]
+    assert r.camera_paths() == [str(data_dir / ROUTE / str(seg) / "fcamera.hevc") for seg in range(3)]
+    assert r.dcamera_paths() == [None] * 3
+
+    with pytest.raises(ValueError):
+      Route(f"{DONGLE_ID}|2020-01-01--00-00-00", data_dir=str(data_dir))
+    route_catalog.get_route_catalog.cache_clear()
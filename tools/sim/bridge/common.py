@@ -1,6 +1,7 @@
 import signal
 import threading
 import functools
+import time
 import numpy as np
 
 from collections import namedtuple
@@ -13,6 +14,7 @@ from openpilot.common.params import Params
 from openpilot.common.realtime import Ratekeeper
 from openpilot.selfdrive.test.helpers import set_params_enabled
 from openpilot.tools.sim.lib.common import SimulatorState, World
+from openpilot.tools.sim.lib.lockstep import LockstepScheduler, OpenpilotSync, SimClock, WallClock
 from openpilot.tools.sim.lib.simulated_car import SimulatedCar
 from openpilot.tools.sim.lib.simulated_sensors import SimulatedSensors
 
@@ -37,7 +39,7 @@ def rk_loop(function, hz, exit_event: threading.Event):
 class SimulatorBridge(ABC):
   TICKS_PER_FRAME = 5
 
-  def __init__(self, dual_camera, high_quality):
+  def __init__(self, dual_camera, high_quality, lockstep=False, seed=None):
     set_params_enabled()
     self.params = Params()
     self.params.put_bool("AlphaLongitudinalEnabled", True)
@@ -47,6 +49,12 @@ class SimulatorBridge(ABC):
     self.dual_camera = dual_camera
     self.high_quality = high_quality
 
+    # in lockstep, the simulation advances in fixed steps as fast as the simulator and openpilot keep up with,
+    # instead of in real time
+    self.lockstep = lockstep
+    self.seed = seed
+    self.clock: SimClock | WallClock = SimClock() if lockstep else WallClock()
+
     self._exit_event: threading.Event | None = None
     self._threads = []
     self._keep_alive = True
@@ -55,6 +63,8 @@ class SimulatorBridge(ABC):
     self.simulator_state = SimulatorState()
 
     self.world: World | None = None
+    # openpilot's selfdriveState and carControl for the current step, in lockstep
+    self.op_answer: tuple | None = None
 
     self.past_startup_engaged = False
     self.startup_button_prev = True
@@ -87,6 +97,10 @@ class SimulatorBridge(ABC):
     bridge_p.start()
     return bridge_p
 
+  @property
+  def frame(self) -> int:
+    return self.clock.frame if isinstance(self.clock, SimClock) else self.rk.frame
+
   def print_status(self):
     print(
     f"""
@@ -102,10 +116,16 @@ Ignition: {self.simulator_state.ignition} Engaged: {self.simulator_state.is_enga
     self.world = self.spawn_world(q)
 
     self.simulated_car = SimulatedCar()
-    self.simulated_sensors = SimulatedSensors(self.dual_camera)
+    self.simulated_sensors = SimulatedSensors(self.dual_camera, self.clock)
 
     self._exit_event = threading.Event()
 
+    if self.lockstep:
+      self._run_lockstep(q)
+    else:
+      self._run_realtime(q)
+
+  def _run_realtime(self, q: Queue):
     self.simulated_car_thread = threading.Thread(target=rk_loop, args=(functools.partial(self.simulated_car.update, self.simulator_state),
                                                                         100, self._exit_event))
     self.simulated_car_thread.start()
@@ -119,88 +139,121 @@ Ignition: {self.simulator_state.ignition} Engaged: {self.simulator_state.is_enga
       self.world.tick()
 
     while self._keep_alive:
-      throttle_out = steer_out = brake_out = 0.0
-      throttle_op = steer_op = brake_op = 0.0
-
-      self.simulator_state.cruise_button = 0
-      self.simulator_state.left_blinker = False
-      self.simulator_state.right_blinker = False
-
-      throttle_manual = steer_manual = brake_manual = 0.
-
-      # Read manual controls
-      if not q.empty():
-        message = q.get()
-        if message.type == QueueMessageType.CONTROL_COMMAND:
-          m = message.info.split('_')
-          if m[0] == "steer":
-            steer_manual = float(m[1])
-          elif m[0] == "throttle":
-            throttle_manual = float(m[1])
-          elif m[0] == "brake":
-            brake_manual = float(m[1])
-          elif m[0] == "cruise":
-            if m[1] == "down":
-              self.simulator_state.cruise_button = CruiseButtons.DECEL_SET
-            elif m[1] == "up":
-              self.simulator_state.cruise_button = CruiseButtons.RES_ACCEL
-            elif m[1] == "cancel":
-              self.simulator_state.cruise_button = CruiseButtons.CANCEL
-            elif m[1] == "main":
-              self.simulator_state.cruise_button = CruiseButtons.MAIN
-          elif m[0] == "blinker":
-            if m[1] == "left":
-              self.simulator_state.left_blinker = True
-            elif m[1] == "right":
-              self.simulator_state.right_blinker = True
-          elif m[0] == "ignition":
-            self.simulator_state.ignition = not self.simulator_state.ignition
-          elif m[0] == "reset":
-            self.world.reset()
-          elif m[0] == "quit":
-            break
-
-      self.simulator_state.user_brake = brake_manual
-      self.simulator_state.user_gas = throttle_manual
-      self.simulator_state.user_torque = steer_manual * -10000
-
-      steer_manual = steer_manual * -40
-
-      # Update openpilot on current sensor state
-      self.simulated_sensors.update(self.simulator_state, self.world)
-
-      self.simulated_car.sm.update(0)
-      self.simulator_state.is_engaged = self.simulated_car.sm['selfdriveState'].active
-
-      if self.simulator_state.is_engaged:
-        throttle_op = np.clip(self.simulated_car.sm['carControl'].actuators.accel / 1.6, 0.0, 1.0)
-        brake_op = np.clip(-self.simulated_car.sm['carControl'].actuators.accel / 4.0, 0.0, 1.0)
-        steer_op = self.simulated_car.sm['carControl'].actuators.steeringAngleDeg
-
-        self.past_startup_engaged = True
-      elif not self.past_startup_engaged and self.simulated_car.sm['selfdriveState'].engageable:
-        self.simulator_state.cruise_button = CruiseButtons.DECEL_SET if self.startup_button_prev else CruiseButtons.MAIN # force engagement on startup
-        self.startup_button_prev = not self.startup_button_prev
-
-      throttle_out = throttle_op if self.simulator_state.is_engaged else throttle_manual
-      brake_out = brake_op if self.simulator_state.is_engaged else brake_manual
-      steer_out = steer_op if self.simulator_state.is_engaged else steer_manual
-
-      self.world.apply_controls(steer_out, throttle_out, brake_out)
-      self.world.read_state()
-      self.world.read_sensors(self.simulator_state)
-
-      if self.world.exit_event.is_set():
-        self.shutdown()
-
-      if self.rk.frame % self.TICKS_PER_FRAME == 0:
-        self.world.tick()
-        self.world.read_cameras()
-
-      # don't print during test, so no print/IO Block between OP and metadrive processes
-      if not self.test_run and self.rk.frame % 25 == 0:
-        self.print_status()
-
-      self.started.value = True
-
+      self._step(q)
       self.rk.keep_time()
+
+  def _run_lockstep(self, q: Queue):
+    # every step, openpilot answers the CAN messages with a carState, then a selfdriveState and a carControl, and each
+    # camera frame with a modelV2. Waiting for those keeps it in step with the simulation however fast that runs
+    answer_services = ['carState', 'selfdriveState', 'carControl']
+    op_sync = OpenpilotSync([*answer_services, 'modelV2'])
+
+    def send_can():
+      sent = int(time.monotonic() * 1e9)  # the clock of logMonoTime
+      self.simulated_car.update(self.simulator_state)
+      answer = op_sync.wait_answer(answer_services, sent)
+      self.op_answer = None if answer is None else (answer[1].selfdriveState, answer[2].carControl)
+
+    def send_cameras():
+      self.simulated_sensors.send_camera_images(self.world)
+      frame_id = self.simulated_sensors.camerad.frame_road_id - 1
+      op_sync.wait('modelV2', lambda msg: msg.modelV2.frameId >= frame_id)
+
+    scheduler = LockstepScheduler(self.clock)
+    scheduler.add(send_can)
+    scheduler.add(functools.partial(self._step, q))
+    scheduler.add(send_cameras, self.TICKS_PER_FRAME)
+
+    while self._keep_alive:
+      scheduler.step()
+      # while openpilot starts up there's nothing to wait on, don't run ahead of it
+      if not op_sync.synced:
+        self.rk.keep_time()
+
+  def _step(self, q: Queue):
+    throttle_out = steer_out = brake_out = 0.0
+    throttle_op = steer_op = brake_op = 0.0
+
+    self.simulator_state.cruise_button = 0
+    self.simulator_state.left_blinker = False
+    self.simulator_state.right_blinker = False
+
+    throttle_manual = steer_manual = brake_manual = 0.
+
+    # Read manual controls
+    if not q.empty():
+      message = q.get()
+      if message.type == QueueMessageType.CONTROL_COMMAND:
+        m = message.info.split('_')
+        if m[0] == "steer":
+          steer_manual = float(m[1])
+        elif m[0] == "throttle":
+          throttle_manual = float(m[1])
+        elif m[0] == "brake":
+          brake_manual = float(m[1])
+        elif m[0] == "cruise":
+          if m[1] == "down":
+            self.simulator_state.cruise_button = CruiseButtons.DECEL_SET
+          elif m[1] == "up":
+            self.simulator_state.cruise_button = CruiseButtons.RES_ACCEL
+          elif m[1] == "cancel":
+            self.simulator_state.cruise_button = CruiseButtons.CANCEL
+          elif m[1] == "main":
+            self.simulator_state.cruise_button = CruiseButtons.MAIN
+        elif m[0] == "blinker":
+          if m[1] == "left":
+            self.simulator_state.left_blinker = True
+          elif m[1] == "right":
+            self.simulator_state.right_blinker = True
+        elif m[0] == "ignition":
+          self.simulator_state.ignition = not self.simulator_state.ignition
+        elif m[0] == "reset":
+          self.world.reset()
+        elif m[0] == "quit":
+          self.shutdown()
+          return
+
+    self.simulator_state.user_brake = brake_manual
+    self.simulator_state.user_gas = throttle_manual
+    self.simulator_state.user_torque = steer_manual * -10000
+
+    steer_manual = steer_manual * -40
+
+    # Update openpilot on current sensor state
+    self.simulated_sensors.update(self.simulator_state, self.world)
+
+    self.simulated_car.sm.update(0)
+    # in lockstep, use the answer to this step rather than whatever openpilot published last
+    selfdrive_state, car_control = self.op_answer or (self.simulated_car.sm['selfdriveState'], self.simulated_car.sm['carControl'])
+    self.simulator_state.is_engaged = selfdrive_state.active
+
+    if self.simulator_state.is_engaged:
+      throttle_op = np.clip(car_control.actuators.accel / 1.6, 0.0, 1.0)
+      brake_op = np.clip(-car_control.actuators.accel / 4.0, 0.0, 1.0)
+      steer_op = car_control.actuators.steeringAngleDeg
+
+      self.past_startup_engaged = True
+    elif not self.past_startup_engaged and selfdrive_state.engageable:
+      self.simulator_state.cruise_button = CruiseButtons.DECEL_SET if self.startup_button_prev else CruiseButtons.MAIN # force engagement on startup
+      self.startup_button_prev = not self.startup_button_prev
+
+    throttle_out = throttle_op if self.simulator_state.is_engaged else throttle_manual
+    brake_out = brake_op if self.simulator_state.is_engaged else brake_manual
+    steer_out = steer_op if self.simulator_state.is_engaged else steer_manual
+
+    self.world.apply_controls(steer_out, throttle_out, brake_out)
+    self.world.read_state()
+    self.world.read_sensors(self.simulator_state)
+
+    if self.world.exit_event.is_set():
+      self.shutdown()
+
+    if self.frame % self.TICKS_PER_FRAME == 0:
+      self.world.tick()
+      self.world.read_cameras()
+
+    # don't print during test, so no print/IO Block between OP and metadrive processes
+    if not self.test_run and self.frame % 25 == 0:
+      self.print_status()
+
+    self.started.value = True
@@ -50,8 +50,8 @@ def create_map(track_size=60):
 class MetaDriveBridge(SimulatorBridge):
   TICKS_PER_FRAME = 5
 
-  def __init__(self, dual_camera, high_quality, test_duration=math.inf, test_run=False):
-    super().__init__(dual_camera, high_quality)
+  def __init__(self, dual_camera, high_quality, test_duration=math.inf, test_run=False, lockstep=False, seed=None):
+    super().__init__(dual_camera, high_quality, lockstep, seed)
 
     self.should_render = False
     self.test_run = test_run
@@ -90,4 +90,8 @@ class MetaDriveBridge(SimulatorBridge):
       anisotropic_filtering=False
     )
 
-    return MetaDriveWorld(queue, config, self.test_duration, self.test_run, self.dual_camera)
+    if self.seed is not None:
+      # there's a single scenario, so this is the seed every reset starts from
+      config["start_seed"] = self.seed
+
+    return MetaDriveWorld(queue, config, self.test_duration, self.test_run, self.dual_camera, self.clock, self.lockstep)
@@ -11,7 +11,7 @@ from metadrive.engine.core.image_buffer import ImageBuffer
 from metadrive.envs.metadrive_env import MetaDriveEnv
 from metadrive.obs.image_obs import ImageObservation
 
-from openpilot.common.realtime import Ratekeeper
+from openpilot.common.realtime import DT_CTRL, Ratekeeper
 
 from openpilot.tools.sim.lib.common import vec3
 from openpilot.tools.sim.lib.camerad import W, H
@@ -50,7 +50,7 @@ def apply_metadrive_patches(arrive_dest_done=True):
 
 def metadrive_process(dual_camera: bool, config: dict, camera_array, wide_camera_array, image_lock,
                       controls_recv: Connection, simulation_state_send: Connection, vehicle_state_send: Connection,
-                      exit_event, op_engaged, test_duration, test_run):
+                      exit_event, op_engaged, test_duration, test_run, lockstep=False):
   arrive_dest_done = config.pop("arrive_dest_done", True)
   apply_metadrive_patches(arrive_dest_done)
 
@@ -94,6 +94,7 @@ def metadrive_process(dual_camera: bool, config: dict, camera_array, wide_camera
     return img
 
   rk = Ratekeeper(100, None)
+  frame = 0
 
   steer_ratio = 8
   vc = [0,0]
@@ -107,6 +108,12 @@ def metadrive_process(dual_camera: bool, config: dict, camera_array, wide_camera
     )
     vehicle_state_send.send(vehicle_state)
 
+    # in lockstep, the bridge sends the controls of each step and waits for the next vehicle state, so it sets the pace
+    if lockstep:
+      while not controls_recv.poll(0.1):
+        if exit_event.is_set():
+          return
+
     if controls_recv.poll(0):
       while controls_recv.poll(0):
         steer_angle, gas, should_reset = controls_recv.recv()
@@ -120,13 +127,14 @@ def metadrive_process(dual_camera: bool, config: dict, camera_array, wide_camera
         lane_idx_prev = reset()
         start_time = None
 
+    now = frame * DT_CTRL if lockstep else time.monotonic()
     is_engaged = op_engaged.is_set()
     if is_engaged and start_time is None:
-      start_time = time.monotonic()
+      start_time = now
 
-    if rk.frame % 5 == 0:
+    if frame % 5 == 0:
       _, _, terminated, _, _ = env.step(vc)
-      timeout = True if start_time is not None and time.monotonic() - start_time >= test_duration else False
+      timeout = True if start_time is not None and now - start_time >= test_duration else False
       lane_idx_curr, on_lane = get_current_lane_info(env.vehicle)
       out_of_lane = lane_idx_curr != lane_idx_prev or not on_lane
       lane_idx_prev = lane_idx_curr
@@ -151,4 +159,6 @@ def metadrive_process(dual_camera: bool, config: dict, camera_array, wide_camera
       road_image[...] = get_cam_as_rgb("rgb_road")
       image_lock.release()
 
-    rk.keep_time()
+    frame += 1
+    if not lockstep:
+      rk.keep_time()
@@ -2,7 +2,6 @@ import ctypes
 import functools
 import multiprocessing
 import numpy as np
-import time
 
 from multiprocessing import Pipe, Array
 
@@ -11,11 +10,14 @@ from openpilot.tools.sim.bridge.metadrive.metadrive_process import (metadrive_pr
                                                                     metadrive_vehicle_state)
 from openpilot.tools.sim.lib.common import SimulatorState, World
 from openpilot.tools.sim.lib.camerad import W, H
+from openpilot.tools.sim.lib.lockstep import WallClock
 
 
 class MetaDriveWorld(World):
-  def __init__(self, status_q, config, test_duration, test_run, dual_camera=False):
+  def __init__(self, status_q, config, test_duration, test_run, dual_camera=False, clock=None, lockstep=False):
     super().__init__(dual_camera)
+    self.clock = clock if clock is not None else WallClock()
+    self.lockstep = lockstep
     self.status_q = status_q
     self.camera_array = Array(ctypes.c_uint8, W*H*3)
     self.road_image = np.frombuffer(self.camera_array.get_obj(), dtype=np.uint8).reshape((H, W, 3))
@@ -41,7 +43,8 @@ class MetaDriveWorld(World):
                               functools.partial(metadrive_process, dual_camera, config,
                                                 self.camera_array, self.wide_camera_array, self.image_lock,
                                                 self.controls_recv, self.simulation_state_send,
-                                                self.vehicle_state_send, self.exit_event, self.op_engaged, test_duration, self.test_run))
+                                                self.vehicle_state_send, self.exit_event, self.op_engaged, test_duration, self.test_run,
+                                                lockstep))
 
     self.metadrive_process.start()
     self.status_q.put(QueueMessage(QueueMessageType.START_STATUS, "starting"))
@@ -59,7 +62,7 @@ class MetaDriveWorld(World):
     self.should_reset = False
 
   def apply_controls(self, steer_angle, throttle_out, brake_out):
-    if (time.monotonic() - self.reset_time) > 2:
+    if (self.clock.monotonic() - self.reset_time) > 2:
       self.vc[0] = steer_angle
 
       if throttle_out:
@@ -81,6 +84,12 @@ class MetaDriveWorld(World):
         self.exit_event.set()
 
   def read_sensors(self, state: SimulatorState):
+    if self.lockstep:
+      # the vehicle state after the controls of this step
+      while not self.vehicle_state_recv.poll(0.1):
+        if not self.metadrive_process.is_alive():
+          return
+
     while self.vehicle_state_recv.poll(0):
       md_vehicle: metadrive_vehicle_state = self.vehicle_state_recv.recv()
       curr_pos = md_vehicle.position
@@ -93,11 +102,11 @@ class MetaDriveWorld(World):
 
       is_engaged = state.is_engaged
       if is_engaged and self.first_engage is None:
-        self.first_engage = time.monotonic()
+        self.first_engage = self.clock.monotonic()
         self.op_engaged.set()
 
       # check moving 5 seconds after engaged, doesn't move right away
-      after_engaged_check = is_engaged and time.monotonic() - self.first_engage >= 5 and self.test_run
+      after_engaged_check = is_engaged and self.clock.monotonic() - self.first_engage >= 5 and self.test_run
 
       x_dist = abs(curr_pos[0] - self.vehicle_last_pos[0])
       y_dist = abs(curr_pos[1] - self.vehicle_last_pos[1])
@@ -106,7 +115,7 @@ class MetaDriveWorld(World):
         self.distance_moved += x_dist + y_dist
 
       time_check_threshold = 29
-      current_time = time.monotonic()
+      current_time = self.clock.monotonic()
       since_last_check = current_time - self.last_check_timestamp
       if since_last_check >= time_check_threshold:
         if after_engaged_check and self.distance_moved == 0:
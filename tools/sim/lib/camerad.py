@@ -1,7 +1,6 @@
+import cv2 as cv
 import numpy as np
 import os
-import pyopencl as cl
-import pyopencl.array as cl_array
 
 from msgq.visionipc import VisionIpcServer, VisionStreamType
 from cereal import messaging
@@ -9,6 +8,143 @@ from cereal import messaging
 from openpilot.common.basedir import BASEDIR
 from openpilot.tools.sim.lib.common import W, H
 
+try:
+  import pyopencl as cl
+except ImportError:
+  cl = None
+
+# "cl", "cpu", or unset to use OpenCL when there is a device and the CPU otherwise
+SIM_CAMERA_BACKEND = os.getenv("SIM_CAMERA_BACKEND")
+NUM_SLOTS = 2
+
+
+class CPUConverter:
+  """NumPy port of rgb_to_nv12.cl, with the same integer math and the same output.
+
+  The input is BGR like the kernel reads it. The channels are split into planes and, since all the
+  intermediate values fit in uint16, the math runs in place on uint16 buffers that are allocated once.
+  """
+
+  def __init__(self, width: int, height: int, slots: int = NUM_SLOTS):
+    assert width % 2 == 0 and height % 2 == 0
+    self.width, self.height = width, height
+    self._out = [np.empty(width * height * 3 // 2, dtype=np.uint8) for _ in range(slots)]
+    self._planes = tuple(np.empty((height, width), dtype=np.uint8) for _ in range(3))
+    self._y = np.empty((height, width), dtype=np.uint16)
+    self._tmp = np.empty((height, width), dtype=np.uint16)
+    self._rows = np.empty((height // 2, width), dtype=np.uint16)
+    self._avg = tuple(np.empty((height // 2, width // 2), dtype=np.uint16) for _ in range(3))
+    self._uv = np.empty((height // 2, width // 2), dtype=np.uint16)
+    self._uv_tmp = np.empty((height // 2, width // 2), dtype=np.uint16)
+
+  @staticmethod
+  def _weighted_sum(planes, weights, offset: int, out: np.ndarray, tmp: np.ndarray) -> None:
+    # out = offset + sum(plane * weight) with negative weights subtracted, in place in uint16
+    np.multiply(planes[0], weights[0], out=out, dtype=np.uint16)
+    out += offset
+    for plane, weight in zip(planes[1:], weights[1:], strict=True):
+      np.multiply(plane, abs(weight), out=tmp, dtype=np.uint16)
+      if weight > 0:
+        out += tmp
+      else:
+        out -= tmp
+
+  def submit(self, rgb: np.ndarray, slot: int) -> None:
+    w, h = self.width, self.height
+    out = self._out[slot]
+    cv.split(rgb, self._planes)
+    b, g, r = self._planes
+
+    # Y = ((13b + 65g + 33r + 64) >> 7) + 16
+    self._weighted_sum((b, g, r), (13, 65, 33), 64, self._y, self._tmp)
+    self._y >>= 7
+    self._y += 16
+    np.copyto(out[:w * h].reshape(h, w), self._y, casting='unsafe')
+
+    # the kernel's AVERAGE is half the sum of each 2x2 block, rounded
+    for plane, avg in zip(self._planes, self._avg, strict=True):
+      np.add(plane[0::2], plane[1::2], out=self._rows, dtype=np.uint16)
+      np.add(self._rows[:, 0::2], self._rows[:, 1::2], out=avg)
+      avg += 1
+      avg >>= 1
+    ab, ag, ar = self._avg
+
+    # U = (56b - 37g - 19r + 0x8080) >> 8, V = (56r - 47g - 9b + 0x8080) >> 8, never negative
+    uv = out[w * h:].reshape(h // 2, w // 2, 2)
+    for i, (planes, weights) in enumerate((((ab, ag, ar), (56, -37, -19)), ((ar, ag, ab), (56, -47, -9)))):
+      self._weighted_sum(planes, weights, 0x8080, self._uv, self._uv_tmp)
+      self._uv >>= 8
+      np.copyto(uv[..., i], self._uv, casting='unsafe')
+
+  def result(self, slot: int) -> np.ndarray:
+    return self._out[slot]
+
+
+class CLConverter:
+  """rgb_to_nv12.cl, with pinned host buffers and a device buffer pair for each slot.
+
+  submit() only enqueues the copies and the kernel, so the next frame can be submitted into the other
+  slot while this one converts. result() waits for a slot's frame.
+  """
+
+  def __init__(self, width: int, height: int, ctx, slots: int = NUM_SLOTS):
+    self.width, self.height = width, height
+    self.ctx = ctx
+    self.queue = cl.CommandQueue(ctx)
+    cl_arg = f" -DHEIGHT={height} -DWIDTH={width} -DRGB_STRIDE={width * 3} -DUV_WIDTH={width // 2} -DUV_HEIGHT={height // 2}" + \
+             f" -DRGB_SIZE={width * height} -DCL_DEBUG "
+
+    kernel_fn = os.path.join(BASEDIR, "tools/sim/rgb_to_nv12.cl")
+    with open(kernel_fn) as f:
+      prg = cl.Program(ctx, f.read()).build(cl_arg)
+      self.krnl = prg.rgb_to_nv12
+    self.Wdiv4 = width // 4 if (width % 4 == 0) else (width + (4 - width % 4)) // 4
+    self.Hdiv4 = height // 4 if (height % 4 == 0) else (height + (4 - height % 4)) // 4
+
+    mf = cl.mem_flags
+    in_size, out_size = width * height * 3, width * height * 3 // 2
+    self._slots = []
+    for _ in range(slots):
+      host_in = cl.Buffer(ctx, mf.READ_ONLY | mf.ALLOC_HOST_PTR, in_size)
+      host_out = cl.Buffer(ctx, mf.WRITE_ONLY | mf.ALLOC_HOST_PTR, out_size)
+      in_arr, _ = cl.enqueue_map_buffer(self.queue, host_in, cl.map_flags.WRITE, 0, (height, width, 3), np.uint8)
+      out_arr, _ = cl.enqueue_map_buffer(self.queue, host_out, cl.map_flags.READ, 0, (out_size,), np.uint8)
+      dev_in = cl.Buffer(ctx, mf.READ_ONLY, in_size)
+      dev_out = cl.Buffer(ctx, mf.WRITE_ONLY, out_size)
+      # the host buffers stay mapped, they're kept here so they live as long as the arrays
+      self._slots.append({'host': (host_in, host_out), 'in': in_arr, 'out': out_arr, 'dev_in': dev_in, 'dev_out': dev_out, 'event': None})
+    self.queue.finish()
+
+  def submit(self, rgb: np.ndarray, slot: int) -> None:
+    s = self._slots[slot]
+    if s['event'] is not None:
+      s['event'].wait()
+    np.copyto(s['in'], rgb)
+    cl.enqueue_copy(self.queue, s['dev_in'], s['in'], is_blocking=False)
+    self.krnl(self.queue, (self.Wdiv4, self.Hdiv4), None, s['dev_in'], s['dev_out'])
+    s['event'] = cl.enqueue_copy(self.queue, s['out'], s['dev_out'], is_blocking=False)
+
+  def result(self, slot: int) -> np.ndarray:
+    s = self._slots[slot]
+    if s['event'] is not None:
+      s['event'].wait()
+      s['event'] = None
+    return s['out']
+
+
+def get_converter(width: int, height: int, backend: str | None = SIM_CAMERA_BACKEND) -> CPUConverter | CLConverter:
+  if backend != "cpu":
+    try:
+      if cl is None:
+        raise RuntimeError("pyopencl is not installed")
+      return CLConverter(width, height, cl.create_some_context(interactive=False))
+    except Exception as e:
+      if backend == "cl":
+        raise
+      print(f"no OpenCL device, converting camera frames on the CPU: {e}")
+  return CPUConverter(width, height)
+
+
 class Camerad:
   """Simulates the camerad daemon"""
   def __init__(self, dual_camera):
@@ -24,17 +160,8 @@ class Camerad:
 
     self.vipc_server.start_listener()
 
-    # set up for pyopencl rgb to yuv conversion
-    self.ctx = cl.create_some_context()
-    self.queue = cl.CommandQueue(self.ctx)
-    cl_arg = f" -DHEIGHT={H} -DWIDTH={W} -DRGB_STRIDE={W * 3} -DUV_WIDTH={W // 2} -DUV_HEIGHT={H // 2} -DRGB_SIZE={W * H} -DCL_DEBUG "
-
-    kernel_fn = os.path.join(BASEDIR, "tools/sim/rgb_to_nv12.cl")
-    with open(kernel_fn) as f:
-      prg = cl.Program(self.ctx, f.read()).build(cl_arg)
-      self.krnl = prg.rgb_to_nv12
-    self.Wdiv4 = W // 4 if (W % 4 == 0) else (W + (4 - W % 4)) // 4
-    self.Hdiv4 = H // 4 if (H % 4 == 0) else (H + (4 - H % 4)) // 4
+    self.converter = get_converter(W, H)
+    self._slot = 0
 
   def cam_send_yuv_road(self, yuv):
     self._send_yuv(yuv, self.frame_road_id, 'roadCameraState', VisionStreamType.VISION_STREAM_ROAD)
@@ -44,16 +171,21 @@ class Camerad:
     self._send_yuv(yuv, self.frame_wide_id, 'wideRoadCameraState', VisionStreamType.VISION_STREAM_WIDE_ROAD)
     self.frame_wide_id += 1
 
-  # Returns: yuv bytes
-  def rgb_to_yuv(self, rgb):
+  def submit(self, rgb) -> int:
+    """Starts converting a frame and returns the slot to pass to result(). Up to NUM_SLOTS frames can be in flight."""
     assert rgb.shape == (H, W, 3), f"{rgb.shape}"
     assert rgb.dtype == np.uint8
+    slot = self._slot
+    self._slot = (self._slot + 1) % NUM_SLOTS
+    self.converter.submit(rgb, slot)
+    return slot
+
+  def result(self, slot: int) -> np.ndarray:
+    """Returns the NV12 frame of a slot, it's overwritten by the next frame submitted into the slot."""
+    return self.converter.result(slot)
 
-    rgb_cl = cl_array.to_device(self.queue, rgb)
-    yuv_cl = cl_array.empty_like(rgb_cl)
-    self.krnl(self.queue, (self.Wdiv4, self.Hdiv4), None, rgb_cl.data, yuv_cl.data).wait()
-    yuv = np.resize(yuv_cl.get(), rgb.size // 2)
-    return yuv.data.tobytes()
+  def rgb_to_yuv(self, rgb) -> np.ndarray:
+    return self.result(self.submit(rgb))
 
   def _send_yuv(self, yuv, frame_id, pub_type, yuv_type):
     eof = int(frame_id * 0.05 * 1e9)
@@ -0,0 +1,115 @@
+import time
+from collections.abc import Callable
+
+import cereal.messaging as messaging
+
+DT_SIM = 0.01  # s, one step of the bridge
+SIM_EPOCH = 1704067200  # unix time at the start of a simulation, 2024-01-01
+SYNC_TIMEOUT = 1.0  # s
+
+
+class WallClock:
+  """The system clocks, for a bridge that runs in real time."""
+  def monotonic(self) -> float:
+    return time.monotonic()
+
+  def time(self) -> float:
+    return time.time()  # noqa: TID251
+
+
+class SimClock:
+  """Simulation time, only advanced by tick().
+
+  It counts whole steps so it doesn't drift, and two runs see exactly the same times.
+  """
+  def __init__(self, dt: float = DT_SIM, epoch: float = SIM_EPOCH):
+    self.dt = dt
+    self.epoch = epoch
+    self.frame = 0
+
+  def tick(self) -> None:
+    self.frame += 1
+
+  def monotonic(self) -> float:
+    return self.frame * self.dt
+
+  def time(self) -> float:
+    return self.epoch + self.monotonic()
+
+
+class LockstepScheduler:
+  """Runs periodic tasks in fixed steps of a SimClock.
+
+  step() runs the tasks due at the current frame in the order they were added, then advances the clock. Nothing is
+  paced by the wall clock, a step takes as long as its tasks.
+  """
+  def __init__(self, clock: SimClock):
+    self.clock = clock
+    self.tasks: list[tuple[Callable[[], None], int, int]] = []
+
+  def add(self, task: Callable[[], None], period: int = 1, offset: int = 0) -> None:
+    """Runs task every period steps, starting at frame offset."""
+    assert period > 0 and 0 <= offset < period
+    self.tasks.append((task, period, offset))
+
+  def step(self) -> None:
+    frame = self.clock.frame
+    for task, period, offset in self.tasks:
+      if frame % period == offset:
+        task()
+    self.clock.tick()
+
+
+class OpenpilotSync:
+  """Holds the simulation back until openpilot has answered the inputs of the last step.
+
+  A service is only waited on once openpilot has published it, so the bridge doesn't block while openpilot starts up.
+  After a timeout the step goes on without the answer, e.g. when a process was restarted. Such a step depends on
+  timing, so a run is only reproducible if it had no timeouts.
+  """
+  def __init__(self, services: list[str], timeout: float = SYNC_TIMEOUT):
+    self.timeout = timeout
+    self.socks = {s: messaging.sub_sock(s, timeout=int(timeout * 1000)) for s in services}
+    self.seen = dict.fromkeys(services, False)
+    self.timeouts = dict.fromkeys(services, 0)
+
+  @property
+  def synced(self) -> bool:
+    return all(self.seen.values())
+
+  def wait(self, service: str, done: Callable | None = None):
+    """Waits for a message of service for which done(msg) is true, any message if done is None.
+
+    Returns the message, or None after a timeout and while openpilot hasn't published the service yet.
+    """
+    sock = self.socks[service]
+    if not self.seen[service]:
+      msgs = messaging.drain_sock(sock)
+      self.seen[service] = len(msgs) > 0
+      return next((msg for msg in reversed(msgs) if done is None or done(msg)), None)
+
+    deadline = time.monotonic() + self.timeout
+    while time.monotonic() < deadline:
+      msg = messaging.recv_one(sock)
+      if msg is not None and (done is None or done(msg)):
+        return msg
+    self.timeouts[service] += 1
+    print(f"lockstep: no {service} from openpilot after {self.timeout}s, going on without it, this run isn't reproducible")
+    return None
+
+  def wait_answer(self, services: list[str], sent: int):
+    """Waits for openpilot's answer to inputs sent at logMonoTime sent: a message of each service in turn, each one
+    published after the one before.
+
+    Each service is computed from the one before it, so this order ties the answer to the step, as frameId does for
+    modelV2. A late answer to an earlier step is skipped instead of being taken for this one. Returns the messages,
+    or None without a complete answer.
+    """
+    answer = []
+    for service in services:
+      msg = self.wait(service, lambda msg, sent=sent: msg.logMonoTime > sent)
+      if msg is None:
+        return None
+      answer.append(msg)
+      sent = msg.logMonoTime
+    return answer
@@ -5,111 +5,154 @@ import cereal.messaging as messaging
 
 from openpilot.common.realtime import DT_DMON
 from openpilot.tools.sim.lib.camerad import Camerad
+from openpilot.tools.sim.lib.lockstep import WallClock
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
   from openpilot.tools.sim.lib.common import World, SimulatorState
 
 
+def _to_bytes(msg) -> bytes:
+  # only scalars and list elements are set again after the first write, which doesn't grow the message
+  dat = msg.to_bytes()
+  msg.clear_write_flag()
+  return dat
+
+
+class SensorMessages:
+  """Builds the sensor messages once and then only updates the fields that change, instead of a new message per sample.
+
+  Each method returns the serialized message, ready to be sent as many times as needed. mono_time is the logMonoTime in
+  ns, the values and the GPS time come from the simulation, so the same inputs give the same bytes.
+  """
+  def __init__(self):
+    self.accelerometer = messaging.new_message('accelerometer', valid=True)
+    self.accelerometer.accelerometer.sensor = 4
+    self.accelerometer.accelerometer.type = 0x10
+    self.acceleration = self.accelerometer.accelerometer.init('acceleration').init('v', 3)
+
+    # copied these numbers from locationd
+    self.gyroscope = messaging.new_message('gyroscope', valid=True)
+    self.gyroscope.gyroscope.sensor = 5
+    self.gyroscope.gyroscope.type = 0x10
+    self.gyro = self.gyroscope.gyroscope.init('gyroUncalibrated').init('v', 3)
+
+    self.gps = messaging.new_message('gpsLocationExternal', valid=True)
+    self.gps.gpsLocationExternal = {
+      "flags": 1,  # valid fix
+      "horizontalAccuracy": 1.0,
+      "verticalAccuracy": 1.0,
+      "speedAccuracy": 0.1,
+      "bearingAccuracyDeg": 0.1,
+      "source": log.GpsLocationData.SensorSource.ublox,
+    }
+    self.vNED = self.gps.gpsLocationExternal.init('vNED', 3)
+
+    self.peripheral = messaging.new_message('peripheralState', valid=True)
+    self.peripheral.peripheralState = {
+      'pandaType': log.PandaState.PandaType.blackPanda,
+      'voltage': 12000,
+      'current': 5678,
+      'fanSpeedRpm': 1000
+    }
+
+    # dmonitoringmodeld output
+    self.driver_state = messaging.new_message('driverStateV2')
+    self.driver_state.driverStateV2.leftDriverData.faceOrientation = [0., 0., 0.]
+    self.driver_state.driverStateV2.leftDriverData.faceProb = 1.0
+    self.driver_state.driverStateV2.rightDriverData.faceOrientation = [0., 0., 0.]
+    self.driver_state.driverStateV2.rightDriverData.faceProb = 1.0
+
+    # dmonitoringd output
+    self.driver_monitoring = messaging.new_message('driverMonitoringState', valid=True)
+    self.driver_monitoring.driverMonitoringState = {
+      "faceDetected": True,
+      "isDistracted": False,
+      "awarenessStatus": 1.,
+    }
+
+  def imu(self, simulator_state: 'SimulatorState', mono_time: int) -> tuple[bytes, bytes]:
+    self.accelerometer.logMonoTime = mono_time
+    self.accelerometer.accelerometer.timestamp = mono_time  # TODO: use the IMU timestamp
+    self.acceleration[0], self.acceleration[1], self.acceleration[2] = simulator_state.imu.accelerometer
+
+    self.gyroscope.logMonoTime = mono_time
+    self.gyroscope.gyroscope.timestamp = mono_time  # TODO: use the IMU timestamp
+    self.gyro[0], self.gyro[1], self.gyro[2] = simulator_state.imu.gyroscope
+    return _to_bytes(self.accelerometer), _to_bytes(self.gyroscope)
+
+  def gps_location(self, simulator_state: 'SimulatorState', mono_time: int, unix_time: float) -> bytes:
+    self.gps.logMonoTime = mono_time
+    gps = self.gps.gpsLocationExternal
+    gps.unixTimestampMillis = int(unix_time * 1000)
+    # transform from vel to NED
+    self.vNED[0], self.vNED[1], self.vNED[2] = -simulator_state.velocity.y, simulator_state.velocity.x, simulator_state.velocity.z
+    gps.bearingDeg = simulator_state.imu.bearing
+    gps.latitude = simulator_state.gps.latitude
+    gps.longitude = simulator_state.gps.longitude
+    gps.altitude = simulator_state.gps.altitude
+    gps.speed = simulator_state.speed
+    return _to_bytes(self.gps)
+
+  def peripheral_state(self, mono_time: int) -> bytes:
+    self.peripheral.logMonoTime = mono_time
+    return _to_bytes(self.peripheral)
+
+  def fake_driver_monitoring(self, mono_time: int) -> tuple[bytes, bytes]:
+    self.driver_state.logMonoTime = mono_time
+    self.driver_monitoring.logMonoTime = mono_time
+    return _to_bytes(self.driver_state), _to_bytes(self.driver_monitoring)
+
+
 class SimulatedSensors:
-  """Simulates the C3 sensors (acc, gyro, gps, peripherals, dm state, cameras) to OpenPilot"""
+  """Simulates the C3 sensors (acc, gyro, gps, peripherals, dm state, cameras) to OpenPilot
 
-  def __init__(self, dual_camera=False):
+  clock is the simulation's time source, the wall clock unless the bridge runs in lockstep. logMonoTime always comes from
+  the system's monotonic clock, which openpilot compares it with.
+  """
+
+  def __init__(self, dual_camera=False, clock=None):
     self.pm = messaging.PubMaster(['accelerometer', 'gyroscope', 'gpsLocationExternal', 'driverStateV2', 'driverMonitoringState', 'peripheralState'])
     self.camerad = Camerad(dual_camera=dual_camera)
+    self.clock = clock if clock is not None else WallClock()
+    self.msgs = SensorMessages()
     self.last_perp_update = 0
     self.last_dmon_update = 0
 
   def send_imu_message(self, simulator_state: 'SimulatorState'):
+    accelerometer, gyroscope = self.msgs.imu(simulator_state, time.monotonic_ns())
     for _ in range(5):
-      dat = messaging.new_message('accelerometer', valid=True)
-      dat.accelerometer.sensor = 4
-      dat.accelerometer.type = 0x10
-      dat.accelerometer.timestamp = dat.logMonoTime  # TODO: use the IMU timestamp
-      dat.accelerometer.init('acceleration')
-      dat.accelerometer.acceleration.v = [simulator_state.imu.accelerometer.x, simulator_state.imu.accelerometer.y, simulator_state.imu.accelerometer.z]
-      self.pm.send('accelerometer', dat)
-
-      # copied these numbers from locationd
-      dat = messaging.new_message('gyroscope', valid=True)
-      dat.gyroscope.sensor = 5
-      dat.gyroscope.type = 0x10
-      dat.gyroscope.timestamp = dat.logMonoTime  # TODO: use the IMU timestamp
-      dat.gyroscope.init('gyroUncalibrated')
-      dat.gyroscope.gyroUncalibrated.v = [simulator_state.imu.gyroscope.x, simulator_state.imu.gyroscope.y, simulator_state.imu.gyroscope.z]
-      self.pm.send('gyroscope', dat)
+      self.pm.send('accelerometer', accelerometer)
+      self.pm.send('gyroscope', gyroscope)
 
   def send_gps_message(self, simulator_state: 'SimulatorState'):
     if not simulator_state.valid:
       return
 
-    # transform from vel to NED
-    velNED = [
-      -simulator_state.velocity.y,
-      simulator_state.velocity.x,
-      simulator_state.velocity.z,
-    ]
-
+    dat = self.msgs.gps_location(simulator_state, time.monotonic_ns(), self.clock.time())
     for _ in range(10):
-      dat = messaging.new_message('gpsLocationExternal', valid=True)
-      dat.gpsLocationExternal = {
-        "unixTimestampMillis": int(time.time() * 1000),  # noqa: TID251
-        "flags": 1,  # valid fix
-        "horizontalAccuracy": 1.0,
-        "verticalAccuracy": 1.0,
-        "speedAccuracy": 0.1,
-        "bearingAccuracyDeg": 0.1,
-        "vNED": velNED,
-        "bearingDeg": simulator_state.imu.bearing,
-        "latitude": simulator_state.gps.latitude,
-        "longitude": simulator_state.gps.longitude,
-        "altitude": simulator_state.gps.altitude,
-        "speed": simulator_state.speed,
-        "source": log.GpsLocationData.SensorSource.ublox,
-      }
-
       self.pm.send('gpsLocationExternal', dat)
 
   def send_peripheral_state(self):
-    dat = messaging.new_message('peripheralState')
-    dat.valid = True
-    dat.peripheralState = {
-      'pandaType': log.PandaState.PandaType.blackPanda,
-      'voltage': 12000,
-      'current': 5678,
-      'fanSpeedRpm': 1000
-    }
-    self.pm.send('peripheralState', dat)
+    self.pm.send('peripheralState', self.msgs.peripheral_state(time.monotonic_ns()))
 
   def send_fake_driver_monitoring(self):
-    # dmonitoringmodeld output
-    dat = messaging.new_message('driverStateV2')
-    dat.driverStateV2.leftDriverData.faceOrientation = [0., 0., 0.]
-    dat.driverStateV2.leftDriverData.faceProb = 1.0
-    dat.driverStateV2.rightDriverData.faceOrientation = [0., 0., 0.]
-    dat.driverStateV2.rightDriverData.faceProb = 1.0
-    self.pm.send('driverStateV2', dat)
-
-    # dmonitoringd output
-    dat = messaging.new_message('driverMonitoringState', valid=True)
-    dat.driverMonitoringState = {
-      "faceDetected": True,
-      "isDistracted": False,
-      "awarenessStatus": 1.,
-    }
-    self.pm.send('driverMonitoringState', dat)
+    driver_state, driver_monitoring = self.msgs.fake_driver_monitoring(time.monotonic_ns())
+    self.pm.send('driverStateV2', driver_state)
+    self.pm.send('driverMonitoringState', driver_monitoring)
 
   def send_camera_images(self, world: 'World'):
     world.image_lock.acquire()
-    yuv = self.camerad.rgb_to_yuv(world.road_image)
-    self.camerad.cam_send_yuv_road(yuv)
+    # both frames are in flight at once, the wide one converts while the road one is sent
+    road = self.camerad.submit(world.road_image)
+    wide = self.camerad.submit(world.wide_road_image) if world.dual_camera else None
 
-    if world.dual_camera:
-      yuv = self.camerad.rgb_to_yuv(world.wide_road_image)
-      self.camerad.cam_send_yuv_wide_road(yuv)
+    self.camerad.cam_send_yuv_road(self.camerad.result(road))
+    if wide is not None:
+      self.camerad.cam_send_yuv_wide_road(self.camerad.result(wide))
 
   def update(self, simulator_state: 'SimulatorState', world: 'World'):
-    now = time.monotonic()
+    now = self.clock.monotonic()
     self.send_imu_message(simulator_state)
     self.send_gps_message(simulator_state)
 
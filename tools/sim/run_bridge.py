@@ -6,10 +6,10 @@ from multiprocessing import Queue
 
 from openpilot.tools.sim.bridge.metadrive.metadrive_bridge import MetaDriveBridge
 
-def create_bridge(dual_camera, high_quality):
+def create_bridge(dual_camera, high_quality, lockstep=False, seed=None):
   queue: Any = Queue()
 
-  simulator_bridge = MetaDriveBridge(dual_camera, high_quality)
+  simulator_bridge = MetaDriveBridge(dual_camera, high_quality, lockstep=lockstep, seed=seed)
   simulator_process = simulator_bridge.run(queue)
 
   return queue, simulator_process, simulator_bridge
@@ -23,13 +23,15 @@ def parse_args(add_args=None):
   parser.add_argument('--joystick', action='store_true')
   parser.add_argument('--high_quality', action='store_true')
   parser.add_argument('--dual_camera', action='store_true')
+  parser.add_argument('--lockstep', action='store_true', help='step the simulation as fast as openpilot keeps up instead of in real time')
+  parser.add_argument('--seed', type=int, help='seed of the simulated scenario')
 
   return parser.parse_args(add_args)
 
 if __name__ == "__main__":
   args = parse_args()
 
-  queue, simulator_process, simulator_bridge = create_bridge(args.dual_camera, args.high_quality)
+  queue, simulator_process, simulator_bridge = create_bridge(args.dual_camera, args.high_quality, args.lockstep, args.seed)
 
   if args.joystick:
     # start input poll for joystick
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from openpilot.tools.sim.lib import camerad
+from openpilot.tools.sim.lib.camerad import CLConverter, CPUConverter, get_converter
+
+SIZES = [(1928, 1208), (66, 34), (8, 2)]
+
+
+def cl_context():
+  if camerad.cl is None:
+    pytest.skip("pyopencl is not installed")
+  try:
+    return camerad.cl.create_some_context(interactive=False)
+  except Exception as e:
+    pytest.skip(f"no OpenCL device: {e}")
+
+
+def reference_nv12(bgr):
+  # the integer math of rgb_to_nv12.cl, written out plainly
+  b, g, r = (bgr[..., c].astype(np.int32) for c in range(3))
+  y = ((b * 13 + g * 65 + r * 33 + 64) >> 7) + 16
+  def avg(p):
+    return (p[0::2, 0::2] + p[0::2, 1::2] + p[1::2, 0::2] + p[1::2, 1::2] + 1) >> 1
+  ab, ag, ar = avg(b), avg(g), avg(r)
+  u = (ab * 56 - ag * 37 - ar * 19 + 0x8080) >> 8
+  v = (ar * 56 - ag * 47 - ab * 9 + 0x8080) >> 8
+  return np.concatenate((y.reshape(-1), np.stack((u, v), axis=-1).reshape(-1))).astype(np.uint8)
+
+
+def random_frames(width, height, n=3):
+  rng = np.random.default_rng(0)
+  frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(n - 2)]
+  return frames + [np.zeros((height, width, 3), dtype=np.uint8), np.full((height, width, 3), 255, dtype=np.uint8)]
+
+
+def convert_all(converter, frames):
+  # keep two frames in flight, like the bridge does with the road and wide cameras
+  out = []
+  for i in range(0, len(frames), 2):
+    pair = frames[i:i + 2]
+    for slot, frame in enumerate(pair):
+      converter.submit(frame, slot)
+    out += [converter.result(slot).copy() for slot in range(len(pair))]
+  return out
+
+
+class TestConverters:
+  @pytest.mark.parametrize("width,height", SIZES)
+  def test_cpu(self, width, height):
+    frames = random_frames(width, height)
+    for frame, nv12 in zip(frames, convert_all(CPUConverter(width, height), frames), strict=True):
+      np.testing.assert_array_equal(nv12, reference_nv12(frame))
+
+  @pytest.mark.parametrize("width,height", SIZES)
+  def test_cl_matches_cpu(self, width, height):
+    ctx = cl_context()
+    frames = random_frames(width, height)
+    cl_out = convert_all(CLConverter(width, height, ctx), frames)
+    cpu_out = convert_all(CPUConverter(width, height), frames)
+    for frame, a, b in zip(frames, cl_out, cpu_out, strict=True):
+      np.testing.assert_array_equal(a, reference_nv12(frame))
+      np.testing.assert_array_equal(a, b)
+
+  def test_fallback(self, mocker):
+    mocker.patch.object(camerad, "cl", None)
+    assert isinstance(get_converter(8, 2), CPUConverter)
+    assert isinstance(get_converter(8, 2, backend="cpu"), CPUConverter)
+    with pytest.raises(RuntimeError):
+      get_converter(8, 2, backend="cl")
@@ -0,0 +1,147 @@
+import math
+
+from cereal import log
+import cereal.messaging as messaging
+from openpilot.tools.sim.lib.common import SimulatorState, vec3
+from openpilot.tools.sim.lib import lockstep
+from openpilot.tools.sim.lib.lockstep import SIM_EPOCH, LockstepScheduler, OpenpilotSync, SimClock
+from openpilot.tools.sim.lib.simulated_sensors import SensorMessages
+
+
+def drive(n):
+  # a deterministic trajectory: accelerating along a curve
+  for i in range(n):
+    state = SimulatorState()
+    state.valid = True
+    state.velocity = vec3(x=0.1 * i * math.cos(i / 50), y=0.1 * i * math.sin(i / 50), z=0.)
+    state.imu.accelerometer = vec3(0.1 * math.sin(i / 7), 0.01 * i, 9.81)
+    state.imu.gyroscope = vec3(0., 0., 0.02 * math.cos(i / 50))
+    state.imu.bearing = math.degrees(i / 50)
+    state.gps.from_xy((i * 0.3, i * 0.1))
+    yield state
+
+
+def run_sensors(n):
+  clock = SimClock()
+  msgs = SensorMessages()
+  out = []
+  for state in drive(n):
+    mono_time = int(clock.monotonic() * 1e9)
+    out += [*msgs.imu(state, mono_time), msgs.gps_location(state, mono_time, clock.time())]
+    clock.tick()
+  return out
+
+
+class FakeSock:
+  def __init__(self):
+    self.msgs = []
+
+  def publish(self, service, mono_time):
+    self.msgs.append(messaging.log_from_bytes(messaging.new_message(service, logMonoTime=mono_time).to_bytes()))
+
+  def drain(self):
+    msgs, self.msgs = self.msgs, []
+    return msgs
+
+  def recv(self):
+    return self.msgs.pop(0) if self.msgs else None
+
+
+ANSWER = ['carState', 'selfdriveState', 'carControl']
+
+
+class TestLockstep:
+  def test_sim_clock(self):
+    clock = SimClock()
+    for _ in range(100_000):
+      clock.tick()
+    # no drift from adding up steps
+    assert clock.monotonic() == 1000.
+    assert clock.time() == SIM_EPOCH + 1000.
+
+  def test_scheduler(self):
+    clock = SimClock()
+    calls = []
+    scheduler = LockstepScheduler(clock)
+    scheduler.add(lambda: calls.append(("car", clock.frame)))
+    scheduler.add(lambda: calls.append(("camera", clock.frame)), 5)
+    scheduler.add(lambda: calls.append(("slow", clock.frame)), 4, 3)
+    for _ in range(10):
+      scheduler.step()
+
+    assert clock.frame == 10
+    assert [f for name, f in calls if name == "car"] == list(range(10))
+    assert [f for name, f in calls if name == "camera"] == [0, 5]
+    assert [f for name, f in calls if name == "slow"] == [3, 7]
+    # tasks of a step run in the order they were added
+    assert calls[:3] == [("car", 0), ("camera", 0), ("car", 1)]
+
+  def test_sensor_messages(self):
+    msgs = SensorMessages()
+    state = next(drive(10))
+    state.velocity = vec3(1.5, -2., 0.25)
+    accelerometer, gyroscope = (messaging.log_from_bytes(dat) for dat in msgs.imu(state, 1234))
+    gps = messaging.log_from_bytes(msgs.gps_location(state, 1234, 1.7e9))
+
+    assert accelerometer.logMonoTime == accelerometer.accelerometer.timestamp == 1234
+    assert accelerometer.valid and accelerometer.accelerometer.sensor == 4
+    assert list(accelerometer.accelerometer.acceleration.v) == [0., 0., 9.8100004196167]
+    assert gyroscope.gyroscope.sensor == 5 and list(gyroscope.gyroscope.gyroUncalibrated.v) == [0., 0., 0.019999999552965164]
+
+    g = gps.gpsLocationExternal
+    assert gps.valid and g.unixTimestampMillis == 1_700_000_000_000 and g.flags == 1
+    assert list(g.vNED) == [2., 1.5, 0.25]
+    assert (g.latitude, g.longitude) == (state.gps.latitude, state.gps.longitude)
+    assert math.isclose(g.speed, state.speed, rel_tol=1e-6)
+    assert g.source == log.GpsLocationData.SensorSource.ublox
+
+  def test_sensor_messages_reused(self):
+    out = run_sensors(500)
+    # updating the same messages doesn't grow them
+    assert len({len(dat) for dat in out[0::3]}) == 1
+    assert len({len(dat) for dat in out[2::3]}) == 1
+    # the values of every step are in its message
+    last = messaging.log_from_bytes(out[-1]).gpsLocationExternal
+    assert last.unixTimestampMillis == (SIM_EPOCH + 4.99) * 1000
+    assert math.isclose(last.bearingDeg, math.degrees(499 / 50), rel_tol=1e-6)
+
+  def test_reproducible(self):
+    assert run_sensors(1000) == run_sensors(1000)
+
+  def test_answer_tied_to_step(self, mocker):
+    socks = {s: FakeSock() for s in ANSWER}
+    mocked = mocker.patch.object(lockstep, "messaging")
+    mocked.sub_sock.side_effect = lambda service, timeout: socks[service]
+    mocked.drain_sock.side_effect = FakeSock.drain
+    mocked.recv_one.side_effect = FakeSock.recv
+    sync = OpenpilotSync(ANSWER, timeout=0.05)
+
+    def publish(*times):
+      for service, t in zip(ANSWER, times, strict=False):
+        socks[service].publish(service, t)
+
+    def answer(sent):
+      msgs = sync.wait_answer(ANSWER, sent)
+      return None if msgs is None else [msg.logMonoTime for msg in msgs]
+
+    # openpilot starting up: nothing to wait on
+    assert answer(100) is None and not sync.synced
+    publish(90, 95, 98)
+    publish(110, 120, 130)
+    assert answer(100) == [110, 120, 130] and sync.synced
+
+    # an answer from before the step's CAN is never taken for it
+    publish(150, 160, 170)
+    publish(210, 220, 230)
+    assert answer(200) == [210, 220, 230]
+
+    # a step without a carControl times out
+    publish(310, 320)
+    assert answer(300) is None
+    assert sync.timeouts == {'carState': 0, 'selfdriveState': 0, 'carControl': 1}
+
+    # its late carControl arrives during the next step, which still gets its own answer
+    socks['carControl'].publish('carControl', 330)
+    publish(410, 420, 430)
+    assert answer(400) == [410, 420, 430]
+    assert all(not sock.msgs for sock in socks.values())
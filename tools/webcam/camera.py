@@ -1,39 +1,110 @@
-import av
+import itertools
+import time
+from collections.abc import Iterator
 import cv2 as cv
+import numpy as np
+
+from openpilot.tools.webcam.sources import FrameSource
+
+OUTPUT_FPS = 20
+
+
+class NV12Converter:
+  """Converts BGR frames to NV12 in reused buffers, rotating them by 180 degrees if rotate is set.
+
+  The (rotated) frame is converted to I420 straight into the NV12 buffer, where the Y plane already is
+  in place, then the chroma planes are interleaved in place through a half-size scratch copy.
+  """
+
+  def __init__(self, width: int, height: int, rotate: bool = True):
+    assert width % 2 == 0 and height % 2 == 0, "NV12 needs even dimensions"
+    self.width, self.height = width, height
+    self._rotated = np.empty((height, width, 3), dtype=np.uint8) if rotate else None
+    self._chroma = np.empty(width * height // 2, dtype=np.uint8)
+    self.nv12 = np.empty(width * height * 3 // 2, dtype=np.uint8)
+    self._i420_out = self.nv12.reshape(height * 3 // 2, width)
+    self._uv_out = self.nv12[width * height:].reshape(height // 2, width // 2, 2)
+
+  def convert(self, bgr: np.ndarray) -> np.ndarray:
+    """Returns the NV12 buffer, which is overwritten by the next call."""
+    w, h = self.width, self.height
+    assert bgr.shape == (h, w, 3), f"expected a {w}x{h} BGR frame, got {bgr.shape}"
+    if self._rotated is not None:
+      bgr = cv.flip(bgr, -1, dst=self._rotated)
+    cv.cvtColor(bgr, cv.COLOR_BGR2YUV_I420, dst=self._i420_out)
+    np.copyto(self._chroma, self.nv12[w * h:])
+    u = self._chroma[:w * h // 4].reshape(h // 2, w // 2)
+    v = self._chroma[w * h // 4:].reshape(h // 2, w // 2)
+    cv.merge((u, v), dst=self._uv_out)
+    return self.nv12
+
 
 class Camera:
-  def __init__(self, cam_type_state, stream_type, camera_id):
-    try:
-      camera_id = int(camera_id)
-    except ValueError: # allow strings, ex: /dev/video0
-      pass
+  """Turns the frames of a source into a 20Hz NV12 stream, with real monotonic timestamps.
+
+  Frames of live sources are published as they're captured, skipping the ones that come sooner than
+  the output rate allows. The other sources are resampled to the output rate by frame index, skipping
+  or repeating frames. Either way, dropped and duplicated counts the source frames that weren't
+  published once.
+  """
+
+  def __init__(self, cam_type_state, stream_type, source: FrameSource):
     self.cam_type_state = cam_type_state
     self.stream_type = stream_type
     self.cur_frame_id = 0
+    self.source = source
+    self.dropped = 0
+    self.duplicated = 0
+
+    print(f"Opening {cam_type_state}: {type(source).__name__} {source.width}x{source.height} at {source.fps:.1f}fps")
 
-    print(f"Opening {cam_type_state} at {camera_id}")
+    self.W = source.width
+    self.H = source.height
+    self.converter = None if source.nv12 else NV12Converter(self.W, self.H, rotate=source.upside_down)
 
-    self.cap = cv.VideoCapture(camera_id)
+  def _convert(self, frame: np.ndarray) -> np.ndarray:
+    # Convert to NV12, rotating upside down sources by 180 degrees (flip both axes)
+    return frame if self.converter is None else self.converter.convert(frame)
 
-    self.cap.set(cv.CAP_PROP_FRAME_WIDTH, 1280.0)
-    self.cap.set(cv.CAP_PROP_FRAME_HEIGHT, 720.0)
-    self.cap.set(cv.CAP_PROP_FPS, 25.0)
+  def read_frames(self) -> Iterator[tuple[np.ndarray, int]]:
+    """Yields (NV12 frame, monotonic timestamp in ns). The frames are converted into the same buffer every
+    time, consume each one before the next. Only live sources block, the caller paces the others at OUTPUT_FPS."""
+    try:
+      yield from (self._read_live() if self.source.live else self._read_recorded())
+    finally:
+      self.source.close()
 
-    self.W = self.cap.get(cv.CAP_PROP_FRAME_WIDTH)
-    self.H = self.cap.get(cv.CAP_PROP_FRAME_HEIGHT)
+  def _read_live(self) -> Iterator[tuple[np.ndarray, int]]:
+    period = int(1e9 / OUTPUT_FPS)
+    source_period = 1e9 / self.source.fps
+    last_t: int | None = None
+    next_due: int | None = None
+    while self.source.grab():
+      t = time.monotonic_ns()
+      if last_t is not None:
+        # frames the source should have delivered in between, but didn't
+        self.dropped += max(round((t - last_t) / source_period) - 1, 0)
+      last_t = t
 
-  @classmethod
-  def bgr2nv12(self, bgr):
-    frame = av.VideoFrame.from_ndarray(bgr, format='bgr24')
-    return frame.reformat(format='nv12').to_ndarray()
+      if next_due is not None and t < next_due - period // 2:
+        self.dropped += 1
+        continue
+      next_due = t + period if next_due is None or t - next_due > period else next_due + period
+      yield self._convert(self.source.retrieve()), t
 
-  def read_frames(self):
-    while True:
-      ret, frame = self.cap.read()
-      if not ret:
-        break
-      # Rotate the frame 180 degrees (flip both axes)
-      frame = cv.flip(frame, -1)
-      yuv = Camera.bgr2nv12(frame)
-      yield yuv.data.tobytes()
-    self.cap.release()
+  def _read_recorded(self) -> Iterator[tuple[np.ndarray, int]]:
+    index = -1
+    frame: np.ndarray | None = None
+    for tick in itertools.count():
+      wanted = int(tick * self.source.fps / OUTPUT_FPS)
+      if wanted == index:
+        self.duplicated += 1
+      else:
+        while index < wanted:
+          if not self.source.grab():
+            return
+          index += 1
+          self.dropped += index < wanted
+        frame = self._convert(self.source.retrieve())
+      assert frame is not None
+      yield frame, time.monotonic_ns()
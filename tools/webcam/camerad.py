@@ -1,18 +1,24 @@
 #!/usr/bin/env python3
 import threading
 import os
-import platform
 from collections import namedtuple
 
 from msgq.visionipc import VisionIpcServer, VisionStreamType
 from cereal import messaging
 
-from openpilot.tools.webcam.camera import Camera
+from openpilot.tools.webcam.camera import OUTPUT_FPS, Camera
+from openpilot.tools.webcam.sources import open_source, route_camera_sources
 from openpilot.common.realtime import Ratekeeper
+from openpilot.common.swaglog import cloudlog
 
 ROAD_CAM = os.getenv("ROAD_CAM", "0")
 WIDE_CAM = os.getenv("WIDE_CAM")
 DRIVER_CAM = os.getenv("DRIVER_CAM")
+# drive all cameras from the camera files of a recorded route instead, in lockstep
+CAMERA_ROUTE = os.getenv("CAMERA_ROUTE")
+CAMERA_ROUTE_DIR = os.getenv("CAMERA_ROUTE_DIR")
+
+STATS_INTERVAL = 10 * OUTPUT_FPS  # frames
 
 CameraType = namedtuple("CameraType", ["msg_name", "stream_type", "cam_id"])
 
@@ -24,26 +30,40 @@ if WIDE_CAM:
 if DRIVER_CAM:
   CAMERAS.append(CameraType("driverCameraState", VisionStreamType.VISION_STREAM_DRIVER, DRIVER_CAM))
 
+ROUTE_CAMERAS = [
+  CameraType("roadCameraState", VisionStreamType.VISION_STREAM_ROAD, None),
+  CameraType("wideRoadCameraState", VisionStreamType.VISION_STREAM_WIDE_ROAD, None),
+  CameraType("driverCameraState", VisionStreamType.VISION_STREAM_DRIVER, None),
+]
+
 class Camerad:
-  def __init__(self):
-    self.pm = messaging.PubMaster([c.msg_name for c in CAMERAS])
+  def __init__(self, route: str | None = CAMERA_ROUTE, route_dir: str | None = CAMERA_ROUTE_DIR):
+    self.lockstep = route is not None
+    if route is not None:
+      sources = route_camera_sources(route, route_dir)
+      cameras = [c for c in ROUTE_CAMERAS if c.msg_name in sources]
+    else:
+      sources = {c.msg_name: open_source(c.cam_id) for c in CAMERAS}
+      cameras = CAMERAS
+
+    self.pm = messaging.PubMaster([c.msg_name for c in cameras])
     self.vipc_server = VisionIpcServer("camerad")
 
     self.cameras = []
-    for c in CAMERAS:
-      cam_device = f"/dev/video{c.cam_id}" if platform.system() != "Darwin" else c.cam_id
-      cam = Camera(c.msg_name, c.stream_type, cam_device)
+    for c in cameras:
+      cam = Camera(c.msg_name, c.stream_type, sources[c.msg_name])
       self.cameras.append(cam)
       self.vipc_server.create_buffers(c.stream_type, 20, cam.W, cam.H)
 
     self.vipc_server.start_listener()
 
-  def _send_yuv(self, yuv, frame_id, pub_type, yuv_type):
-    eof = int(frame_id * 0.05 * 1e9)
-    self.vipc_server.send(yuv_type, yuv, frame_id, eof, eof)
+  def _send_yuv(self, yuv, frame_id, pub_type, yuv_type, timestamp):
+    self.vipc_server.send(yuv_type, yuv, frame_id, timestamp, timestamp)
     dat = messaging.new_message(pub_type, valid=True)
     msg = {
       "frameId": frame_id,
+      "timestampSof": timestamp,
+      "timestampEof": timestamp,
       "transform": [1.0, 0.0, 0.0,
                     0.0, 1.0, 0.0,
                     0.0, 0.0, 1.0]
@@ -51,14 +71,42 @@ class Camerad:
     setattr(dat, pub_type, msg)
     self.pm.send(pub_type, dat)
 
+  def _log_stats(self, cam, last):
+    if cam.cur_frame_id % STATS_INTERVAL == 0:
+      dropped, duplicated = cam.dropped - last[0], cam.duplicated - last[1]
+      if dropped or duplicated:
+        cloudlog.warning(f"{cam.cam_type_state}: {dropped} frames dropped, {duplicated} duplicated in the last {STATS_INTERVAL} frames")
+      return cam.dropped, cam.duplicated
+    return last
+
   def camera_runner(self, cam):
-    rk = Ratekeeper(20, None)
-    for yuv in cam.read_frames():
-      self._send_yuv(yuv, cam.cur_frame_id, cam.cam_type_state, cam.stream_type)
+    # live cameras are paced by the capture, everything else at OUTPUT_FPS
+    rk = None if cam.source.live else Ratekeeper(OUTPUT_FPS, None)
+    stats = (0, 0)
+    for yuv, timestamp in cam.read_frames():
+      self._send_yuv(yuv, cam.cur_frame_id, cam.cam_type_state, cam.stream_type, timestamp)
       cam.cur_frame_id += 1
+      stats = self._log_stats(cam, stats)
+      if rk is not None:
+        rk.keep_time()
+
+  def lockstep_runner(self):
+    # one frame of every camera per tick, with the same frame id and timestamp
+    rk = Ratekeeper(OUTPUT_FPS, None)
+    stats = [(0, 0)] * len(self.cameras)
+    for frames in zip(*(cam.read_frames() for cam in self.cameras), strict=False):
+      timestamp = frames[0][1]
+      for i, (cam, (yuv, _)) in enumerate(zip(self.cameras, frames, strict=True)):
+        self._send_yuv(yuv, cam.cur_frame_id, cam.cam_type_state, cam.stream_type, timestamp)
+        cam.cur_frame_id += 1
+        stats[i] = self._log_stats(cam, stats[i])
       rk.keep_time()
 
   def run(self):
+    if self.lockstep:
+      self.lockstep_runner()
+      return
+
     threads = []
     for cam in self.cameras:
       cam_thread = threading.Thread(target=self.camera_runner, args=(cam,))
@@ -0,0 +1,191 @@
+import glob
+import os
+import platform
+import cv2 as cv
+import numpy as np
+
+from openpilot.tools.lib.framereader import FfmpegDecoder
+
+DEFAULT_FPS = 20.
+ROUTE_CAMERA_FPS = 20.
+
+
+class FrameSource:
+  """A stream of frames, read like cv.VideoCapture: grab() moves to the next frame, retrieve() returns it.
+
+  A live source produces frames in real time and grab() blocks until the next one is captured. The
+  others can be read as fast as needed, their frames are meant to be shown at fps. Frames are BGR
+  unless the source is nv12, in which case they are NV12 as recorded by a device and already upright.
+  Frames of an upside_down source, i.e. the webcam as it's mounted, are rotated by 180 degrees.
+  """
+  live = False
+  nv12 = False
+  upside_down = False
+  width: int
+  height: int
+  fps: float
+
+  def grab(self) -> bool:
+    raise NotImplementedError
+
+  def retrieve(self) -> np.ndarray:
+    raise NotImplementedError
+
+  def close(self) -> None:
+    pass
+
+
+class CaptureSource(FrameSource):
+  """A webcam (V4L2 device) or a video file, through cv.VideoCapture."""
+
+  def __init__(self, target: int | str, live: bool):
+    self.live = self.upside_down = live
+    self.cap = cv.VideoCapture(target)
+    if not self.cap.isOpened():
+      raise OSError(f"failed to open {target}")
+    if live:
+      self.cap.set(cv.CAP_PROP_FRAME_WIDTH, 1280.0)
+      self.cap.set(cv.CAP_PROP_FRAME_HEIGHT, 720.0)
+      self.cap.set(cv.CAP_PROP_FPS, 25.0)
+
+    self.width = int(self.cap.get(cv.CAP_PROP_FRAME_WIDTH))
+    self.height = int(self.cap.get(cv.CAP_PROP_FRAME_HEIGHT))
+    self.fps = self.cap.get(cv.CAP_PROP_FPS) or DEFAULT_FPS
+    self._frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+  def grab(self) -> bool:
+    return self.cap.grab()
+
+  def retrieve(self) -> np.ndarray:
+    ret, self._frame = self.cap.retrieve(self._frame)
+    if not ret:
+      raise OSError("failed to decode frame")
+    return self._frame
+
+  def close(self) -> None:
+    self.cap.release()
+
+
+class ImageSequenceSource(FrameSource):
+  """Image files matching a glob pattern, in sorted order."""
+
+  def __init__(self, pattern: str, fps: float = DEFAULT_FPS):
+    self.paths = sorted(glob.glob(pattern))
+    if not self.paths:
+      raise FileNotFoundError(f"no images match {pattern}")
+    self.fps = fps
+    self.height, self.width = self._read(self.paths[0]).shape[:2]
+    self._index = -1
+
+  @staticmethod
+  def _read(path: str) -> np.ndarray:
+    img = cv.imread(path, cv.IMREAD_COLOR)
+    if img is None:
+      raise OSError(f"failed to read {path}")
+    return img
+
+  def grab(self) -> bool:
+    self._index += 1
+    return self._index < len(self.paths)
+
+  def retrieve(self) -> np.ndarray:
+    img = self._read(self.paths[self._index])
+    if img.shape[:2] != (self.height, self.width):
+      img = cv.resize(img, (self.width, self.height))
+    return img
+
+
+class PatternSource(FrameSource):
+  """A synthetic test pattern: color bars with a moving bar and the frame number."""
+
+  def __init__(self, width: int = 1280, height: int = 720, fps: float = DEFAULT_FPS, frames: int | None = None):
+    self.width, self.height, self.fps = width, height, fps
+    self.frames = frames
+    self._index = -1
+    bars = np.array([(255, 255, 255), (0, 255, 255), (255, 255, 0), (0, 255, 0), (255, 0, 255), (0, 0, 255), (255, 0, 0)], dtype=np.uint8)
+    self._background = np.repeat(bars, -(-width // len(bars)), axis=0)[:width][None].repeat(height, axis=0)
+    self._frame = np.empty_like(self._background)
+
+  def grab(self) -> bool:
+    self._index += 1
+    return self.frames is None or self._index < self.frames
+
+  def retrieve(self) -> np.ndarray:
+    np.copyto(self._frame, self._background)
+    x = int(self._index * self.width / (2 * self.fps)) % self.width
+    self._frame[:, x:x + max(self.width // 64, 1)] = 0
+    cv.putText(self._frame, str(self._index), (self.width // 20, self.height // 5), cv.FONT_HERSHEY_SIMPLEX, self.height / 240, (0, 0, 0), 3)
+    return self._frame
+
+
+class RouteCameraSource(FrameSource):
+  """One camera of a recorded route, e.g. its fcamera.hevc files, decoded to NV12 one segment after the other."""
+  nv12 = True
+
+  def __init__(self, paths: list[str]):
+    assert paths, "no camera files"
+    self.paths = paths
+    self.fps = ROUTE_CAMERA_FPS
+    decoder = FfmpegDecoder(paths[0], pix_fmt="nv12")
+    self.width, self.height = decoder.w, decoder.h
+    self._decoders = (FfmpegDecoder(p, pix_fmt="nv12") if i else decoder for i, p in enumerate(paths))
+    self._frames = self._iter_frames()
+    self._frame: np.ndarray | None = None
+
+  def _iter_frames(self):
+    for decoder in self._decoders:
+      assert (decoder.w, decoder.h) == (self.width, self.height), f"{decoder.fn} is {decoder.w}x{decoder.h}"
+      for _, frame in decoder.get_iterator():
+        yield frame
+
+  def grab(self) -> bool:
+    self._frame = next(self._frames, None)
+    return self._frame is not None
+
+  def retrieve(self) -> np.ndarray:
+    assert self._frame is not None
+    return self._frame
+
+
+def route_camera_sources(route_name: str, data_dir: str | None = None) -> dict[str, RouteCameraSource]:
+  """Sources for the road, wide road and driver cameras of a route, keyed by the camera state name.
+
+  Only segments that have a file for every camera in the route are used, so the cameras stay in lockstep.
+  """
+  from openpilot.tools.lib.route import Route
+  route = Route(route_name, data_dir=data_dir)
+  paths = {
+    "roadCameraState": route.camera_paths(),
+    "wideRoadCameraState": route.ecamera_paths(),
+    "driverCameraState": route.dcamera_paths(),
+  }
+  paths = {name: p for name, p in paths.items() if any(p)}
+  if "roadCameraState" not in paths:
+    raise FileNotFoundError(f"no road camera files in {route_name}")
+  segments = [i for i in range(route.max_seg_number + 1) if all(p[i] is not None for p in paths.values())]
+  return {name: RouteCameraSource([p[i] for i in segments]) for name, p in paths.items()}
+
+
+def open_source(spec: str) -> FrameSource:
+  """Opens a source from its description:
+    0, /dev/video0       a webcam, by index or device
+    path/to/video.mp4    a video file
+    frames/*.png         an image sequence
+    pattern[:WxH]        a synthetic test pattern
+  """
+  spec = os.path.expanduser(spec)
+  if spec.startswith("pattern"):
+    size = spec.partition(":")[2]
+    if size:
+      width, height = (int(x) for x in size.split("x"))
+      return PatternSource(width, height)
+    return PatternSource()
+  if spec.isdigit():
+    return CaptureSource(f"/dev/video{spec}" if platform.system() != "Darwin" else int(spec), live=True)
+  if spec.startswith("/dev/"):
+    return CaptureSource(spec, live=True)
+  if any(c in spec for c in "*?["):
+    return ImageSequenceSource(spec)
+  if os.path.isfile(spec):
+    return CaptureSource(spec, live=False)
+  raise FileNotFoundError(f"unknown camera source {spec}")
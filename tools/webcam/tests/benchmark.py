@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import argparse
+import time
+import cv2 as cv
+import numpy as np
+
+from openpilot.tools.webcam.camera import NV12Converter
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080)}
+
+
+def _av_path(bgr):
+  # the previous conversion: flip, reformat through PyAV, then copy out to bytes
+  import av
+  frame = av.VideoFrame.from_ndarray(cv.flip(bgr, -1), format='bgr24')
+  return frame.reformat(format='nv12').to_ndarray().data.tobytes()
+
+
+def _time(fn, frames) -> float:
+  fn(frames[0])
+  t = time.perf_counter()
+  for f in frames:
+    fn(f)
+  return (time.perf_counter() - t) / len(frames)
+
+
+def _benchmark(n: int, compare_av: bool) -> None:
+  rng = np.random.default_rng(0)
+  for name, (w, h) in RESOLUTIONS.items():
+    frames = [rng.integers(0, 256, (h, w, 3), dtype=np.uint8) for _ in range(4)] * (n // 4)
+    converter = NV12Converter(w, h)
+    dt = _time(converter.convert, frames)
+    line = f"{name:>6}: {dt * 1e3:6.2f}ms/frame, {1 / dt:5.0f} fps per camera"
+    if compare_av:
+      line += f" (PyAV path {_time(_av_path, frames) * 1e3:.2f}ms/frame)"
+    print(line)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Time the webcam BGR to NV12 conversion of one camera")
+  parser.add_argument("-n", type=int, default=200, help="frames per resolution")
+  parser.add_argument("--av", action="store_true", help="also time the previous PyAV conversion")
+  args = parser.parse_args()
+
+  _benchmark(args.n, args.av)
@@ -0,0 +1,50 @@
+import cv2 as cv
+import numpy as np
+import pytest
+
+from openpilot.tools.webcam.camera import NV12Converter
+
+
+def reference_nv12(bgr):
+  # rotate, convert to I420, then interleave the chroma planes
+  h, w = bgr.shape[:2]
+  i420 = cv.cvtColor(cv.flip(bgr, -1), cv.COLOR_BGR2YUV_I420).reshape(-1)
+  u = i420[w * h:w * h * 5 // 4]
+  v = i420[w * h * 5 // 4:]
+  return np.concatenate((i420[:w * h], np.stack((u, v), axis=-1).reshape(-1)))
+
+
+class TestNV12Converter:
+  @pytest.mark.parametrize("width,height", [(1280, 720), (1928, 1208), (64, 2)])
+  def test_matches_reference(self, width, height):
+    rng = np.random.default_rng(0)
+    converter = NV12Converter(width, height)
+    for _ in range(2):
+      bgr = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+      nv12 = converter.convert(bgr)
+      assert nv12.shape == (width * height * 3 // 2,)
+      np.testing.assert_array_equal(nv12, reference_nv12(bgr))
+
+  def test_rotation(self):
+    bgr = np.zeros((4, 6, 3), dtype=np.uint8)
+    bgr[:2, :2] = (0, 0, 255)  # red top left
+    nv12 = NV12Converter(6, 4).convert(bgr)
+    y, uv = nv12[:24].reshape(4, 6), nv12[24:].reshape(2, 3, 2)
+    # ends up bottom right, limited range luma and a red chroma block
+    assert (y[2:, 4:] == 82).all() and (y[:2] == 16).all()
+    assert uv[1, 2, 1] > 200 and (uv[0] == 128).all()
+
+  def test_no_rotation(self):
+    bgr = np.random.default_rng(0).integers(0, 256, (32, 64, 3), dtype=np.uint8)
+    nv12 = NV12Converter(64, 32, rotate=False).convert(bgr)
+    np.testing.assert_array_equal(nv12, reference_nv12(cv.flip(bgr, -1)))
+
+  def test_buffer_reused(self):
+    converter = NV12Converter(64, 32)
+    first = converter.convert(np.zeros((32, 64, 3), dtype=np.uint8))
+    second = converter.convert(np.full((32, 64, 3), 255, dtype=np.uint8))
+    assert first is second
+
+  def test_wrong_size(self):
+    with pytest.raises(AssertionError):
+      NV12Converter(64, 32).convert(np.zeros((32, 32, 3), dtype=np.uint8))
@@ -0,0 +1,161 @@
+import cv2 as cv
+import numpy as np
+import pytest
+
+from openpilot.tools.webcam import camera
+from openpilot.tools.webcam.camera import Camera
+from openpilot.tools.webcam import sources
+from openpilot.tools.webcam.sources import FrameSource, ImageSequenceSource, PatternSource, open_source, route_camera_sources
+
+
+class FakeDecoder:
+  w, h = 8, 4
+
+  def __init__(self, fn, pix_fmt):
+    self.fn = fn
+
+  def get_iterator(self):
+    for i in range(3):
+      yield i, np.full(8 * 4 * 3 // 2, i, dtype=np.uint8)
+
+
+class FakeLiveSource(FrameSource):
+  live = True
+
+  def __init__(self, intervals_ms, clock):
+    self.width, self.height, self.fps = 64, 32, 25.
+    self.intervals = list(intervals_ms)
+    self.clock = clock
+    self.frame = np.zeros((32, 64, 3), dtype=np.uint8)
+
+  def grab(self):
+    if not self.intervals:
+      return False
+    self.clock[0] += int(self.intervals.pop(0) * 1e6)
+    return True
+
+  def retrieve(self):
+    return self.frame
+
+
+class StillSource(FrameSource):
+  def __init__(self, frame):
+    self.height, self.width = frame.shape[:2]
+    self.fps = 20.
+    self.frame = frame
+    self.frames = 1
+
+  def grab(self):
+    self.frames -= 1
+    return self.frames >= 0
+
+  def retrieve(self):
+    return self.frame
+
+
+def read_all(cam):
+  return [(frame.copy(), t) for frame, t in cam.read_frames()]
+
+
+class TestSources:
+  def test_pattern(self):
+    source = open_source("pattern:64x32")
+    assert isinstance(source, PatternSource) and (source.width, source.height) == (64, 32)
+    assert source.grab()
+    first = source.retrieve().copy()
+    assert first.shape == (32, 64, 3)
+    assert source.grab()
+    assert not np.array_equal(first, source.retrieve())
+
+  def test_image_sequence(self, tmp_path):
+    for i in range(3):
+      cv.imwrite(str(tmp_path / f"{i:03d}.png"), np.full((32, 64, 3), i * 50, dtype=np.uint8))
+    source = open_source(str(tmp_path / "*.png"))
+    assert isinstance(source, ImageSequenceSource)
+    frames = []
+    while source.grab():
+      frames.append(source.retrieve()[0, 0, 0])
+    assert frames == [0, 50, 100]
+
+    with pytest.raises(FileNotFoundError):
+      open_source(str(tmp_path / "*.jpg"))
+
+  def test_video_file(self, tmp_path):
+    path = str(tmp_path / "video.avi")
+    writer = cv.VideoWriter(path, cv.VideoWriter_fourcc(*"MJPG"), 40, (64, 32))
+    for i in range(8):
+      writer.write(np.full((32, 64, 3), i * 30, dtype=np.uint8))
+    writer.release()
+
+    source = open_source(path)
+    assert not source.live and not source.upside_down
+    cam = Camera("roadCameraState", 0, source)
+    frames = read_all(cam)
+    # 40fps resampled to 20fps, every other frame
+    assert len(frames) == 4
+    assert [int(f[0]) for f, _ in frames] == pytest.approx([16 + i * 60 * 219 / 255 for i in range(4)], abs=3)
+    assert (cam.dropped, cam.duplicated) == (4, 0)
+    assert all(t1 >= t0 for (_, t0), (_, t1) in zip(frames, frames[1:], strict=False))
+
+  def test_route(self, mocker):
+    mocker.patch.object(sources, "FfmpegDecoder", FakeDecoder)
+    route = mocker.patch("openpilot.tools.lib.route.Route").return_value
+    route.max_seg_number = 3
+    route.camera_paths.return_value = ["f0", "f1", "f2", "f3"]
+    route.ecamera_paths.return_value = ["e0", None, "e2", "e3"]
+    route.dcamera_paths.return_value = [None] * 4
+
+    cams = route_camera_sources("route")
+    # no driver camera, and only the segments both cameras have
+    assert list(cams) == ["roadCameraState", "wideRoadCameraState"]
+    assert cams["roadCameraState"].paths == ["f0", "f2", "f3"]
+    assert cams["wideRoadCameraState"].paths == ["e0", "e2", "e3"]
+
+    cam = Camera("roadCameraState", 0, cams["roadCameraState"])
+    frames = read_all(cam)
+    assert [int(f[0]) for f, _ in frames] == [0, 1, 2] * 3
+
+  def test_unknown(self):
+    with pytest.raises(FileNotFoundError):
+      open_source("/nonexistent/video.mp4")
+
+
+class TestCamera:
+  def test_duplicates(self):
+    cam = Camera("roadCameraState", 0, PatternSource(64, 32, fps=10, frames=4))
+    frames = read_all(cam)
+    assert len(frames) == 8
+    assert all(np.array_equal(frames[i][0], frames[i + 1][0]) for i in range(0, 8, 2))
+    assert not np.array_equal(frames[0][0], frames[2][0])
+    assert (cam.dropped, cam.duplicated) == (0, 4)
+
+  def test_orientation(self):
+    bgr = np.zeros((32, 64, 3), dtype=np.uint8)
+    bgr[:16, :32] = 255  # white top left
+    upright = read_all(Camera("roadCameraState", 0, StillSource(bgr)))[0][0][:64 * 32].reshape(32, 64)
+    assert (upright[:16, :32] == 235).all() and (upright[16:] == 16).all()
+
+    # only the live webcam is mounted upside down
+    source = StillSource(bgr)
+    source.upside_down = True
+    rotated = read_all(Camera("roadCameraState", 0, source))[0][0][:64 * 32].reshape(32, 64)
+    np.testing.assert_array_equal(rotated, upright[::-1, ::-1])
+
+  def test_nv12_shape(self):
+    frames = read_all(Camera("roadCameraState", 0, PatternSource(64, 32, frames=2)))
+    assert [f.shape for f, _ in frames] == [(64 * 32 * 3 // 2,)] * 2
+
+  def test_live(self, mocker):
+    clock = [0]
+    mocker.patch.object(camera.time, "monotonic_ns", side_effect=lambda: clock[0])
+    # 25fps, with one frame missing
+    intervals = [40] * 25 + [80] + [40] * 4
+    cam = Camera("roadCameraState", 0, FakeLiveSource(intervals, clock))
+    timestamps = [t for _, t in read_all(cam)]
+    # a frame every 50ms on average
+    assert len(timestamps) == 25
+    assert timestamps[:5] == [40e6, 80e6, 120e6, 200e6, 240e6]
+    assert min(np.diff(timestamps)) >= 40e6
+    # the decimated frames and the missing one
+    assert cam.dropped == 30 - 25 + 1
+    assert cam.duplicated == 0